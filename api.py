@@ -1,37 +1,232 @@
+import json
 import re
-from datetime import datetime
-from flask import Flask, jsonify, request, g
+import threading
+import time
+import uuid
+from datetime import date
+from itertools import chain
+from flask import Flask, Response, jsonify, make_response, request, g, has_app_context, stream_with_context
+from werkzeug.http import is_resource_modified
 from http import HTTPStatus
 import mysql.connector
 import jwt
 from functools import wraps
-from conn import DB_CONFIG
+from conn import STORAGE_CONFIG, POOL_CONFIG, METRICS_CONFIG, PROFILER_CONFIG, JSON_CONFIG, COMPRESSION_CONFIG, CACHE_CONFIG, AUTH_CACHE_CONFIG, BULK_CONFIG, SEARCH_CONFIG, UTILIZATION_CONFIG, REPORT_CONFIG, IDEMPOTENCY_CONFIG
+from storage import make_storage
+from metrics import Metrics, MeteredConnection
+from profiler import QueryProfiler
+from pool import ConnectionPool, BorrowedConnection, PoolTimeout
+from pagination import TABLES, PaginationError, parse_page_args, fetch_page, page_response, encode_cursor
+from export import ExportError, FORMATS, parse_export_args, stream_export
+from availability import AvailabilityIndex, load_index
+from search import CustomerSearchIndex, tokenize, load_index as load_search_index
+from utilization import FleetArrays, UtilizationError, load_arrays
+from conflicts import booking_period_error, is_blocking_status, lock_vehicle, lock_booking, find_conflicts
+from reports import record_booking, move_vehicle, daily_report
+from history import parse_history_args, fetch_history, history_summary
+from include import IncludeError, parse_include, included_tables, with_foreign_keys, fetch_included
+from lookup import KeyListError, split_keys, parse_ids, lookup
+from idempotency import IdempotencyStore, DurableKeys, KeyReused, InProgress, digest
+from cache import MISSING, EntityCache, make_backend
+from versions import get_table_version, bump_table_version, list_etag
+from token_cache import TokenCache
+from fields import FieldsError, parse_fields, select_list, project
+from filters import FilterError
+from validation import is_valid_date, customer_error, vehicle_error, booking_error
+from bulk import MODES, bulk_insert, summarize
+from importer import ImporterError, Importer, read_records
+from json_provider import FastJSONProvider
+from compression import Compressor
 
 # JWT Secret Key (should be an environment variable in production)
 JWT_SECRET = "paeeel"
 
 app = Flask(__name__)
 
-# Function to establish the database connection
-# use this if can't connect in database 
-# ALTER USER 'root'@'localhost' IDENTIFIED WITH mysql_native_password BY 'your_password'; FLUSH PRIVILEGES;
+# Large list responses are mostly JSON encoding; the fast provider gives
+# the same bytes as Flask's
+if JSON_CONFIG["fast"]:
+    app.json = FastJSONProvider(app)
 
+# Function to establish the database connection, through the storage
+# backend selected by DB_BACKEND (MySQL unless configured otherwise)
+storage = make_storage(STORAGE_CONFIG["url"])
+
+# Request and database metrics, exposed at /metrics
+metrics = Metrics(METRICS_CONFIG["directory"], METRICS_CONFIG["flush_interval"], METRICS_CONFIG["enabled"])
+
+# Statement fingerprints, slow-query log and per-request query profiles
+profiler = QueryProfiler(
+    top_n=PROFILER_CONFIG["top_n"],
+    slow_threshold=PROFILER_CONFIG["slow_threshold"],
+    explain=PROFILER_CONFIG["explain"],
+    window=PROFILER_CONFIG["window"],
+) if PROFILER_CONFIG["enabled"] else None
+
+def connect_db():
+    return MeteredConnection(storage.connect(), metrics, profiler)
+
+db_pool = ConnectionPool(connect_db, **POOL_CONFIG)
+
+# Inside a request the connection is checked out once and kept on `g`;
+# handlers still call conn.close() but the connection only goes back to
+# the pool when the app context is torn down.
 def get_db_connection():
     try:
-        return mysql.connector.connect(
-            **DB_CONFIG,
-            auth_plugin='mysql_native_password'
-        )
-    except mysql.connector.Error as err:
+        if has_app_context():
+            if "db_conn" not in g:
+                g.db_conn = db_pool.acquire()
+            return BorrowedConnection(g.db_conn)
+        return db_pool.acquire()
+    except (mysql.connector.Error, PoolTimeout) as err:
         raise Exception(f"Database connection error: {err}")
 
-# Validate date format
-def is_valid_date(date_str):
+@app.teardown_appcontext
+def release_db_connection(exc):
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        db_pool.release(conn, discard=isinstance(exc, mysql.connector.Error))
+
+# Per-request latency, status and payload size. The request is timed until
+# its context is torn down, which for streamed responses is after the last
+# chunk has been sent.
+@app.before_request
+def start_request_metrics():
+    if metrics.enabled:
+        g.request_started = time.perf_counter()
+        metrics.inc("carhire_http_requests_in_flight")
+
+@app.after_request
+def record_response_metrics(response):
+    if "request_started" in g:
+        g.response_status = response.status_code
+        if response.content_length is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            metrics.observe("carhire_http_response_size_bytes", response.content_length, (request.method, route))
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    started = g.pop("request_started", None)
+    if started is None:
+        return
+    status = HTTPStatus.INTERNAL_SERVER_ERROR if exc else g.pop("response_status", HTTPStatus.INTERNAL_SERVER_ERROR)
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.observe("carhire_http_request_duration_seconds", time.perf_counter() - started, (request.method, route, str(int(status))))
+    metrics.inc("carhire_http_requests_in_flight", -1)
+    metrics.flush()
+
+# Per-request query profile. With the debug header enabled, a request
+# sent with X-Debug-Queries: 1 gets its query count and DB time in
+# Server-Timing and the per-statement breakdown in X-Query-Profile. Slow
+# statements queued for EXPLAIN are explained once the handler is done
+# with the connection.
+@app.before_request
+def start_query_profile():
+    if profiler is not None:
+        profiler.begin_request()
+
+@app.after_request
+def add_query_profile_headers(response):
+    if profiler is None or not PROFILER_CONFIG["debug_header"] or not request.headers.get("X-Debug-Queries"):
+        return response
+    profile = profiler.current()
+    if profile is not None:
+        summary = profile.summary()
+        response.headers["Server-Timing"] = (
+            f'db;dur={summary["db_time_ms"]};desc="{summary["queries"]} queries", app;dur={summary["total_time_ms"]}'
+        )
+        response.headers["X-Query-Profile"] = json.dumps(summary["statements"][:20])
+    return response
+
+@app.teardown_request
+def finish_query_profile(exc):
+    if profiler is None:
+        return
+    profile = profiler.end_request()
+    conn = g.get("db_conn")
+    if profile is None or not profile.pending_explains or conn is None or getattr(conn, "unread_result", False):
+        return
     try:
-        datetime.strptime(date_str, '%Y-%m-%d')
-        return True
-    except ValueError:
-        return False
+        profiler.run_explains(profile, conn)
+    except Exception:
+        app.logger.exception("Could not capture query plans")
+
+# Negotiated gzip / br / zstd for large and streamed responses. Registered
+# after the metrics hook so it runs first and response sizes are the
+# compressed ones.
+compressor = Compressor(
+    min_size=COMPRESSION_CONFIG["min_size"],
+    levels=COMPRESSION_CONFIG["levels"],
+    cache_bytes=COMPRESSION_CONFIG["cache_bytes"],
+) if COMPRESSION_CONFIG["enabled"] else None
+
+@app.after_request
+def compress_response(response):
+    if compressor is None:
+        return response
+    return compressor.compress_response(request, response)
+
+# Rebuild a stale in-process index with `load`. Until its first load every
+# request waits for it; after that one request rebuilds while the others
+# keep using the current copy instead of queueing behind the lock.
+def refreshed(index, lock, load):
+    if index.is_stale() and lock.acquire(blocking=not index.built):
+        try:
+            if index.is_stale():
+                load(index, get_db_connection())
+        finally:
+            lock.release()
+    return index
+
+# In-process vehicle availability index, built on first use and rebuilt
+# once stale. Booking and vehicle writes in this worker keep it current.
+availability_index = AvailabilityIndex()
+availability_refresh_lock = threading.Lock()
+
+def get_availability_index():
+    return refreshed(availability_index, availability_refresh_lock, load_index)
+
+# In-process customer search index, maintained the same way
+customer_index = CustomerSearchIndex()
+customer_index_refresh_lock = threading.Lock()
+
+def get_customer_index():
+    return refreshed(customer_index, customer_index_refresh_lock, load_search_index)
+
+# Columnar copy of vehicles and bookings for utilization analytics, also
+# maintained the same way
+fleet_arrays = FleetArrays()
+fleet_arrays_refresh_lock = threading.Lock()
+
+def get_fleet_arrays():
+    return refreshed(fleet_arrays, fleet_arrays_refresh_lock, load_arrays)
+
+# Read-through cache for single-entity GETs; PUT/DELETE handlers invalidate
+entity_cache = EntityCache(
+    CACHE_CONFIG["entities"],
+    max_entries=CACHE_CONFIG["max_entries"],
+    ttl=CACHE_CONFIG["ttl"],
+    backend=make_backend(CACHE_CONFIG["backend"]),
+    poll_interval=CACHE_CONFIG["poll_interval"],
+)
+
+# Verified JWT claims, so reused tokens skip signature verification.
+# Shares the entity cache's backend for cross-worker revocation.
+token_cache = TokenCache(
+    lambda token: jwt.decode(token, JWT_SECRET, algorithms=["HS256"]),
+    max_entries=AUTH_CACHE_CONFIG["max_entries"],
+    ttl=AUTH_CACHE_CONFIG["ttl"],
+    backend=entity_cache.backend,
+    poll_interval=CACHE_CONFIG["poll_interval"],
+)
+
+# Responses to requests sent with an Idempotency-Key, kept in this worker
+# and in the idempotency_key table. The table is written on the request's
+# own connection, so a request never holds two pooled connections.
+idempotency_store = IdempotencyStore(
+    durable=DurableKeys(lambda: get_db_connection()) if IDEMPOTENCY_CONFIG["durable"] else None,
+)
 
 # JWT Authentication Decorator
 def token_required(f):
@@ -42,7 +237,8 @@ def token_required(f):
             return jsonify({"success": False, "error": "Token is missing or malformed!"}), HTTPStatus.UNAUTHORIZED
         try:
             token = token.split(" ")[1] 
-            g.user = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+            g.user = token_cache.decode(token)
+            g.token = token
         except jwt.ExpiredSignatureError:
             return jsonify({"success": False, "error": "Token has expired!"}), HTTPStatus.UNAUTHORIZED
         except jwt.InvalidTokenError:
@@ -50,6 +246,62 @@ def token_required(f):
         return f(*args, **kwargs)
     return decorated
 
+# Conditional GET support. With a table, the ETag and Last-Modified come
+# from the table's version counter, and a request that still matches is
+# answered with 304 before the handler runs its query. `related`, given
+# the query args, names further tables the response is read from; their
+# versions are part of the ETag too. Without a table, the ETag is a hash
+# of the response body.
+def conditional(table=None, related=None):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag = None
+            last_modified = None
+            if table:
+                cursor = None
+                try:
+                    cursor = get_db_connection().cursor()
+                    tables = (table, *(related(request.args) if related else ()))
+                    versions = [get_table_version(cursor, name) for name in tables]
+                    version = ".".join(str(number) for number, _ in versions)
+                    last_modified = max((modified for _, modified in versions if modified), default=None)
+                    etag = list_etag(table, version, request.query_string)
+                except Exception:
+                    app.logger.exception("Could not read the %s table version", table)
+                finally:
+                    if cursor:
+                        cursor.close()
+                if etag and not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                    response = Response(status=HTTPStatus.NOT_MODIFIED)
+                    response.set_etag(etag)
+                    response.last_modified = last_modified
+                    return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != HTTPStatus.OK:
+                return response
+            if etag:
+                response.set_etag(etag)
+                response.last_modified = last_modified
+            else:
+                response.add_etag()
+            return response.make_conditional(request)
+        return decorated_function
+    return decorator
+
+# Bump a table's version after a committed write so list ETags change. A
+# failure here must not turn a successful write into an error response.
+def table_changed(conn, table):
+    try:
+        bump_table_version(conn, table)
+    except Exception:
+        app.logger.exception("Could not bump the %s table version", table)
+
+# Response for a booking that overlaps existing bookings of the vehicle
+def booking_conflict_response(conflicts):
+    return jsonify({"success": False, "error": "Vehicle is already booked for these dates", "conflicts": conflicts}), HTTPStatus.CONFLICT
+
 # Role-Based Access Control Decorator
 def requires_role(role):
     def decorator(f):
@@ -61,6 +313,40 @@ def requires_role(role):
         return decorated_function
     return decorator
 
+# Idempotency-Key support for create endpoints; goes below the auth
+# decorators, so a rejected request does not use up its key. Keys are
+# scoped to the route and the caller. A retry gets the first response,
+# with Idempotent-Replayed: true; the same key with a different body gets
+# 422, and a retry while the first request is still running waits for it,
+# or gets 409 after IDEMPOTENCY_WAIT_TIMEOUT seconds.
+def idempotent(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return f(*args, **kwargs)
+        if not 1 <= len(key) <= 255:
+            return jsonify({"success": False, "error": "Idempotency-Key must be 1 to 255 characters"}), HTTPStatus.BAD_REQUEST
+        user = g.get("user") or {}
+        scoped = digest(request.method, request.path, user.get("username", ""), key)
+        fingerprint = digest(request.query_string, request.get_data())
+
+        def handler():
+            response = make_response(f(*args, **kwargs))
+            return response.status_code, response.content_type, response.get_data()
+
+        try:
+            status, content_type, body, replayed = idempotency_store.execute(scoped, fingerprint, handler)
+        except KeyReused:
+            return jsonify({"success": False, "error": "Idempotency-Key was already used with a different request"}), HTTPStatus.UNPROCESSABLE_ENTITY
+        except InProgress:
+            return jsonify({"success": False, "error": "A request with this Idempotency-Key is still in progress"}), HTTPStatus.CONFLICT
+        response = Response(body, status=status, content_type=content_type)
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return response
+    return decorated
+
 
 # --------------------------------------------
 # Login
@@ -72,10 +358,184 @@ def login():
     password = data.get("password")
 
     if username == "admin" and password == "admin123":
-        token = jwt.encode({"username": username, "role": "admin"}, JWT_SECRET, algorithm="HS256")
+        # jti makes every login a new token, so logging out of one session
+        # does not revoke the next
+        now = int(time.time())
+        token = jwt.encode({
+            "username": username, "role": "admin", "jti": uuid.uuid4().hex,
+            "iat": now, "exp": now + AUTH_CACHE_CONFIG["token_lifetime"],
+        }, JWT_SECRET, algorithm="HS256")
         return jsonify({"success": True, "token": token})
     return jsonify({"success": False, "error": "Invalid credentials!"}), HTTPStatus.UNAUTHORIZED
 
+# Stream a table export as a chunked response. The first chunk is read
+# before responding so query errors still return a JSON error.
+def export_table(table):
+    try:
+        export = parse_export_args(request.args, table)
+    except (ExportError, FieldsError) as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+
+    try:
+        chunks = stream_export(get_db_connection(), export, app.json.dumps)
+        first = next(chunks, "")
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
+
+    return Response(
+        stream_with_context(chain([first], chunks)),
+        mimetype=FORMATS[export["format"]],
+        headers={"Content-Disposition": f"attachment; filename={table}.{export['format']}"}
+    )
+
+# Create many customers or vehicles from a JSON array. ?mode=partial
+# (default) keeps every record that can be created; ?mode=atomic creates
+# all records or none.
+def bulk_create(table):
+    records = request.get_json(silent=True)
+    mode = request.args.get("mode", "partial")
+    if not isinstance(records, list) or not records:
+        return jsonify({"success": False, "error": "Request body must be a non-empty JSON array"}), HTTPStatus.BAD_REQUEST
+    if len(records) > BULK_CONFIG["max_records"]:
+        return jsonify({"success": False, "error": f"At most {BULK_CONFIG['max_records']} records per request"}), HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    if mode not in MODES:
+        return jsonify({"success": False, "error": f"mode must be one of: {', '.join(MODES)}"}), HTTPStatus.BAD_REQUEST
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        results = bulk_insert(conn, table, records, atomic=mode == "atomic")
+        counts = summarize(results)
+        if counts["created"]:
+            table_changed(conn, table)
+            if table == "customer":
+                customer_index.invalidate()
+            if table == "vehicle":
+                for record, result in zip(records, results):
+                    if result["status"] == "created":
+                        availability_index.put_vehicle(record["reg_number"], record["vehicle_category_description"])
+                        fleet_arrays.put_vehicle(record["reg_number"], record["vehicle_category_description"])
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
+    finally:
+        if conn:
+            conn.close()
+
+    body = {"success": counts["created"] == len(records), "mode": mode, **counts, "results": results}
+    if body["success"]:
+        return jsonify(body), HTTPStatus.CREATED
+    if mode == "atomic":
+        return jsonify(body), HTTPStatus.CONFLICT if counts["duplicate"] else HTTPStatus.BAD_REQUEST
+    return jsonify(body), HTTPStatus.MULTI_STATUS
+
+# Import an uploaded CSV or NDJSON dump, sent either as the raw request
+# body or as the "file" field of a multipart form. The format comes from
+# ?format=, else from the content type. Uploads cannot be resumed; use
+# importer.py on the server for very large files.
+def import_table(table):
+    upload = request.files.get("file")
+    content_type = (upload.mimetype if upload else request.mimetype) or ""
+    fmt = request.args.get("format") or ("ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv")
+    stream = upload.stream if upload else request.stream
+
+    conn = None
+    importer = None
+    try:
+        conn = get_db_connection()
+        importer = Importer(conn, table)
+        report = importer.run(read_records(stream, fmt))
+    except ImporterError as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
+    finally:
+        # Chunks are committed as the import goes, so rows may have been
+        # added even when it failed part way
+        if importer is not None and importer.stats["inserted"]:
+            table_changed(conn, table)
+            if table in ("vehicle", "booking"):
+                availability_index.invalidate()
+                fleet_arrays.invalidate()
+            if table == "customer":
+                customer_index.invalidate()
+        if conn:
+            conn.close()
+    return jsonify({"success": True, "data": report}), HTTPStatus.OK
+
+# Rows of `table` for a list of primary keys, in the order given, and the
+# keys that matched nothing. Cached rows are served from the entity cache;
+# the rest cost one IN query per LOOKUP_CHUNK_SIZE keys.
+def lookup_entities(table, keys, fields, include=None):
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        rows, missing = lookup(cursor, entity_cache, table, TABLES[table]["pk"], keys)
+        body = {"success": True, "data": [project(row, fields) for row in rows], "missing": missing}
+        if include:
+            body["included"] = fetch_included(cursor, rows, include, entity_cache)
+        return jsonify(body), HTTPStatus.OK
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+# Prometheus scrape endpoint
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Slowest and most frequent statements, with captured plans
+@app.route("/api/admin/queries", methods=["GET"])
+@token_required
+@requires_role("admin")
+def get_query_stats():
+    if profiler is None:
+        return jsonify({"success": False, "error": "Query profiler is disabled"}), HTTPStatus.NOT_FOUND
+    return jsonify({"success": True, "data": profiler.top()}), HTTPStatus.OK
+
+# Entity cache stats
+@app.route("/api/admin/cache", methods=["GET"])
+@token_required
+@requires_role("admin")
+def get_cache_stats():
+    return jsonify({"success": True, "data": entity_cache.stats()}), HTTPStatus.OK
+
+# Token cache stats
+@app.route("/api/admin/auth", methods=["GET"])
+@token_required
+@requires_role("admin")
+def get_auth_cache_stats():
+    return jsonify({"success": True, "data": token_cache.stats()}), HTTPStatus.OK
+
+# Idempotency key store stats: entries and bytes held, replays and
+# collapsed duplicates
+@app.route("/api/admin/idempotency", methods=["GET"])
+@token_required
+@requires_role("admin")
+def get_idempotency_stats():
+    return jsonify({"success": True, "data": idempotency_store.stats()}), HTTPStatus.OK
+
+# Connection pool stats
+@app.route("/api/admin/pool", methods=["GET"])
+@token_required
+@requires_role("admin")
+def get_pool_stats():
+    return jsonify({"success": True, "data": db_pool.stats()}), HTTPStatus.OK
+
+# Logout: revoke the token used for this request
+@app.route("/api/logout", methods=["POST"])
+@token_required
+def logout():
+    token_cache.revoke(g.token, g.user)
+    return jsonify({"success": True, "message": "Logged out"}), HTTPStatus.OK
+
 # index
 @app.route("/")
 def hello_world():
@@ -95,15 +555,20 @@ def hello_world():
 @app.route("/api/customer", methods=["GET"])
 @token_required
 @requires_role("admin")
+@conditional("customer")
 def get_customers():
+    try:
+        page = parse_page_args(request.args, "customer")
+    except (PaginationError, FieldsError, FilterError) as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+
     conn = None
     cursor = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM customer")
-        customers = cursor.fetchall()
-        return jsonify({"success": True, "data": customers, "total": len(customers)}), HTTPStatus.OK
+        customers, next_token = fetch_page(cursor, page)
+        return jsonify(page_response(cursor, page, customers, next_token)), HTTPStatus.OK
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
     finally:
@@ -112,20 +577,104 @@ def get_customers():
         if conn:
             conn.close()
 
+@app.route("/api/customer/export", methods=["GET"])
+@token_required
+@requires_role("admin")
+def export_customers():
+    return export_table("customer")
+
+@app.route("/api/customer/import", methods=["POST"])
+@token_required
+@requires_role("admin")
+def import_customers():
+    return import_table("customer")
+
+# Ranked prefix and fuzzy search over customer names and email addresses,
+# answered from the in-process index: ?q=ann smi&k=10
+@app.route("/api/customer/search", methods=["GET"])
+@token_required
+@requires_role("admin")
+def search_customers():
+    query = request.args.get("q", "")
+    if not tokenize(query):
+        return jsonify({"success": False, "error": "q must contain at least one letter or digit"}), HTTPStatus.BAD_REQUEST
+    try:
+        k = int(request.args.get("k", 10))
+    except ValueError:
+        k = 0
+    if not 1 <= k <= SEARCH_CONFIG["max_results"]:
+        return jsonify({"success": False, "error": f"k must be an integer between 1 and {SEARCH_CONFIG['max_results']}"}), HTTPStatus.BAD_REQUEST
+
+    try:
+        results = get_customer_index().search(query, k)
+        customers = [
+            {"customer_id": customer_id, "customer_name": name, "email_address": email, "score": score}
+            for customer_id, name, email, score in results
+        ]
+        return jsonify({"success": True, "data": customers}), HTTPStatus.OK
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
+
 @app.route("/api/customer/<int:customer_id>", methods=["GET"])
 @token_required
 @requires_role("admin")
+@conditional()
 def get_customer(customer_id):
+    try:
+        fields = parse_fields(request.args, "customer")
+    except FieldsError as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+
     conn = None
     cursor = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM customer WHERE customer_id = %s", (customer_id,))
-        customer = cursor.fetchone()
+        customer = entity_cache.get("customer", customer_id)
+        if customer is MISSING:
+            generation = entity_cache.generation
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"SELECT {select_list(fields)} FROM customer WHERE customer_id = %s", (customer_id,))
+            customer = cursor.fetchone()
+            if customer and fields is None:
+                entity_cache.set("customer", customer_id, customer, generation)
         if not customer:
             return jsonify({"success": False, "error": "Customer not found"}), HTTPStatus.NOT_FOUND
-        return jsonify({"success": True, "data": customer}), HTTPStatus.OK
+        return jsonify({"success": True, "data": project(customer, fields)}), HTTPStatus.OK
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+# The customer's bookings, newest first, each with its vehicle and status
+# embedded; ?summary=true adds booking counts and total rental days
+@app.route("/api/customer/<int:customer_id>/bookings", methods=["GET"])
+@token_required
+@requires_role("admin")
+@conditional()
+def get_customer_bookings(customer_id):
+    try:
+        page = parse_history_args(request.args)
+    except PaginationError as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        bookings, next_token = fetch_history(cursor, customer_id, page)
+        # An empty history is told apart from an unknown customer
+        if not bookings and page["after"] is None and entity_cache.get("customer", customer_id) is MISSING:
+            cursor.execute("SELECT customer_id FROM customer WHERE customer_id = %s", (customer_id,))
+            if not cursor.fetchone():
+                return jsonify({"success": False, "error": "Customer not found"}), HTTPStatus.NOT_FOUND
+        body = {"success": True, "data": bookings, "limit": page["limit"], "next": next_token}
+        if page["summary"]:
+            body["summary"] = history_summary(cursor, customer_id)
+        return jsonify(body), HTTPStatus.OK
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
     finally:
@@ -137,10 +686,12 @@ def get_customer(customer_id):
 @app.route("/api/customer", methods=["POST"])
 @token_required
 @requires_role("admin")
+@idempotent
 def create_customer():
     data = request.get_json()
-    if not data or not data.get("customer_name") or not data.get("email_address"):
-        return jsonify({"success": False, "error": "customer_name and email_address are required"}), HTTPStatus.BAD_REQUEST
+    error = customer_error(data)
+    if error:
+        return jsonify({"success": False, "error": error}), HTTPStatus.BAD_REQUEST
 
     conn = None
     cursor = None
@@ -152,6 +703,8 @@ def create_customer():
             (data["customer_name"], data["email_address"], data.get("phone_number", ""), data.get("address", ""))
         )
         conn.commit()
+        table_changed(conn, "customer")
+        customer_index.put(cursor.lastrowid, data["customer_name"], data["email_address"])
         return jsonify({"success": True, "message": "Customer created successfully"}), HTTPStatus.CREATED
     except Exception as e:
         conn.rollback()
@@ -162,6 +715,13 @@ def create_customer():
         if conn:
             conn.close()
             
+@app.route("/api/customer/bulk", methods=["POST"])
+@token_required
+@requires_role("admin")
+@idempotent
+def bulk_create_customers():
+    return bulk_create("customer")
+
 @app.route("/api/customer/<int:customer_id>", methods=["PUT"])
 @token_required
 @requires_role("admin")
@@ -177,8 +737,9 @@ def update_customer(customer_id):
         cursor = conn.cursor()
 
         # Check if the customer exists
-        cursor.execute("SELECT * FROM customer WHERE customer_id = %s", (customer_id,))
-        if not cursor.fetchone():
+        cursor.execute("SELECT customer_name, email_address FROM customer WHERE customer_id = %s", (customer_id,))
+        current = cursor.fetchone()
+        if not current:
             return jsonify({"success": False, "error": "Customer not found"}), HTTPStatus.NOT_FOUND
 
         # Update the customer
@@ -205,6 +766,10 @@ def update_customer(customer_id):
         update_query = f"UPDATE customer SET {', '.join(update_fields)} WHERE customer_id = %s"
         cursor.execute(update_query, values)
         conn.commit()
+        table_changed(conn, "customer")
+        entity_cache.invalidate("customer", customer_id)
+        if "customer_name" in data or "email_address" in data:
+            customer_index.put(customer_id, data.get("customer_name", current[0]), data.get("email_address", current[1]))
 
         return jsonify({"success": True, "message": f"Customer with ID {customer_id} updated successfully"}), HTTPStatus.OK
     except Exception as e:
@@ -228,8 +793,11 @@ def delete_customer(customer_id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM customer WHERE customer_id = %s", (customer_id,))
         conn.commit()
+        table_changed(conn, "customer")
+        entity_cache.invalidate("customer", customer_id)
         if cursor.rowcount == 0:
             return jsonify({"success": False, "error": "Customer not found"}), HTTPStatus.NOT_FOUND
+        customer_index.remove(customer_id)
         return jsonify({"success": True, "message": f"Customer with ID {customer_id} has been deleted"}), HTTPStatus.OK
     except Exception as e:
         conn.rollback()
@@ -244,17 +812,29 @@ def delete_customer(customer_id):
 # Booking Routes with JWT Authentication
 # --------------------------------------------
 
+# ?include=customer,vehicle,status adds the records the page's bookings
+# refer to, each once, under "included"
 @app.route("/api/booking", methods=["GET"])
 @token_required
+@conditional("booking", related=included_tables)
 def get_bookings():
+    try:
+        page = parse_page_args(request.args, "booking")
+        include = parse_include(request.args)
+    except (PaginationError, FieldsError, FilterError, IncludeError) as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+    page["fields"] = with_foreign_keys(page["fields"], include)
+
     conn = None
     cursor = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM booking")
-        bookings = cursor.fetchall()
-        return jsonify({"success": True, "data": bookings, "total": len(bookings)}), HTTPStatus.OK
+        bookings, next_token = fetch_page(cursor, page)
+        body = page_response(cursor, page, bookings, next_token)
+        if include:
+            body["included"] = fetch_included(cursor, bookings, include, entity_cache)
+        return jsonify(body), HTTPStatus.OK
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
     finally:
@@ -263,20 +843,65 @@ def get_bookings():
         if conn:
             conn.close()
             
+@app.route("/api/booking/export", methods=["GET"])
+@token_required
+def export_bookings():
+    return export_table("booking")
+
+@app.route("/api/booking/import", methods=["POST"])
+@token_required
+@requires_role("admin")
+def import_bookings():
+    return import_table("booking")
+
+# Bookings for a JSON array of IDs, with ?fields= and ?include= as on
+# GET /api/booking/<id>
+@app.route("/api/booking/lookup", methods=["POST"])
+@token_required
+@requires_role("admin")
+def lookup_bookings():
+    ids = request.get_json(silent=True)
+    try:
+        fields = parse_fields(request.args, "booking")
+        include = parse_include(request.args)
+        ids = parse_ids(ids)
+    except (KeyListError, FieldsError, IncludeError) as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+    return lookup_entities("booking", ids, with_foreign_keys(fields, include), include)
+
 @app.route("/api/booking/<int:booking_id>", methods=["GET"])
 @token_required
 @requires_role("admin")
+@conditional()
 def get_booking(booking_id):
+    try:
+        fields = parse_fields(request.args, "booking")
+        include = parse_include(request.args)
+    except (FieldsError, IncludeError) as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+    fields = with_foreign_keys(fields, include)
+
     conn = None
     cursor = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM booking WHERE booking_id = %s", (booking_id,))
-        booking = cursor.fetchone()
+        booking = entity_cache.get("booking", booking_id)
+        if booking is MISSING:
+            generation = entity_cache.generation
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"SELECT {select_list(fields)} FROM booking WHERE booking_id = %s", (booking_id,))
+            booking = cursor.fetchone()
+            if booking and fields is None:
+                entity_cache.set("booking", booking_id, booking, generation)
         if not booking:
             return jsonify({"success": False, "error": "Booking not found"}), HTTPStatus.NOT_FOUND
-        return jsonify({"success": True, "data": booking}), HTTPStatus.OK
+        body = {"success": True, "data": project(booking, fields)}
+        if include:
+            if cursor is None:
+                conn = get_db_connection()
+                cursor = conn.cursor(dictionary=True)
+            body["included"] = fetch_included(cursor, [booking], include, entity_cache)
+        return jsonify(body), HTTPStatus.OK
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
     finally:
@@ -287,21 +912,35 @@ def get_booking(booking_id):
 
 @app.route("/api/booking", methods=["POST"])
 @token_required
+@idempotent
 def create_booking():
     data = request.get_json()
-    if not data or not data.get("Customer_customer_id") or not data.get("Vehicle_reg_number") or not is_valid_date(data.get("date_from")) or not is_valid_date(data.get("date_to")):
-        return jsonify({"success": False, "error": "Invalid booking data"}), HTTPStatus.BAD_REQUEST
+    error = booking_error(data)
+    if error:
+        return jsonify({"success": False, "error": error}), HTTPStatus.BAD_REQUEST
 
     conn = None
     cursor = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        if not lock_vehicle(cursor, data["Vehicle_reg_number"]):
+            return jsonify({"success": False, "error": "Vehicle not found"}), HTTPStatus.NOT_FOUND
+        if is_blocking_status(data.get("booking_status_code", "PENDING")):
+            conflicts = find_conflicts(cursor, data["Vehicle_reg_number"], data["date_from"], data["date_to"])
+            if conflicts:
+                conn.rollback()
+                return booking_conflict_response(conflicts)
         cursor.execute(
             "INSERT INTO booking (Customer_customer_id, Vehicle_reg_number, date_from, date_to, booking_status_code) VALUES (%s, %s, %s, %s, %s)",
             (data["Customer_customer_id"], data["Vehicle_reg_number"], data["date_from"], data["date_to"], data.get("booking_status_code", "PENDING"))
         )
+        booking_id = cursor.lastrowid
+        record_booking(cursor, data["Vehicle_reg_number"], new=(data["date_from"], data["date_to"], data.get("booking_status_code", "PENDING")))
         conn.commit()
+        table_changed(conn, "booking")
+        availability_index.put_booking(booking_id, data["Vehicle_reg_number"], data["date_from"], data["date_to"], data.get("booking_status_code", "PENDING"))
+        fleet_arrays.put_booking(booking_id, data["Vehicle_reg_number"], data["date_from"], data["date_to"], data.get("booking_status_code", "PENDING"))
         return jsonify({"success": True, "message": "Booking created successfully"}), HTTPStatus.CREATED
     except Exception as e:
         conn.rollback()
@@ -318,19 +957,36 @@ def update_booking(booking_id):
     data = request.get_json()
     if not data or not data.get("date_from") or not data.get("date_to") or not is_valid_date(data.get("date_from")) or not is_valid_date(data.get("date_to")):
         return jsonify({"success": False, "error": "Invalid booking data"}), HTTPStatus.BAD_REQUEST
+    period_error = booking_period_error(data["date_from"], data["date_to"])
+    if period_error:
+        return jsonify({"success": False, "error": period_error}), HTTPStatus.BAD_REQUEST
 
     conn = None
     cursor = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        # The current row is locked and read for the daily summary's delta
+        booking = lock_booking(cursor, booking_id)
+        if not booking:
+            return jsonify({"success": False, "error": "Booking not found"}), HTTPStatus.NOT_FOUND
+        if is_blocking_status(data.get("booking_status_code", "PENDING")):
+            conflicts = find_conflicts(cursor, booking[0], data["date_from"], data["date_to"], exclude=booking_id)
+            if conflicts:
+                conn.rollback()
+                return booking_conflict_response(conflicts)
         cursor.execute(
             "UPDATE booking SET date_from = %s, date_to = %s, booking_status_code = %s WHERE booking_id = %s",
             (data["date_from"], data["date_to"], data.get("booking_status_code", "PENDING"), booking_id)
         )
         if cursor.rowcount == 0:
             return jsonify({"success": False, "error": "Booking not found"}), HTTPStatus.NOT_FOUND
+        record_booking(cursor, booking[0], old=booking[1:4], new=(data["date_from"], data["date_to"], data.get("booking_status_code", "PENDING")))
         conn.commit()
+        table_changed(conn, "booking")
+        entity_cache.invalidate("booking", booking_id)
+        availability_index.put_booking(booking_id, booking[0], data["date_from"], data["date_to"], data.get("booking_status_code", "PENDING"))
+        fleet_arrays.put_booking(booking_id, booking[0], data["date_from"], data["date_to"], data.get("booking_status_code", "PENDING"))
         return jsonify({"success": True, "message": "Booking updated successfully"}), HTTPStatus.OK
     except Exception as e:
         conn.rollback()
@@ -349,10 +1005,18 @@ def delete_booking(booking_id):
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        booking = lock_booking(cursor, booking_id)
+        if not booking:
+            return jsonify({"success": False, "error": "Booking not found"}), HTTPStatus.NOT_FOUND
         cursor.execute("DELETE FROM booking WHERE booking_id = %s", (booking_id,))
         if cursor.rowcount == 0:
             return jsonify({"success": False, "error": "Booking not found"}), HTTPStatus.NOT_FOUND
+        record_booking(cursor, booking[0], old=booking[1:4])
         conn.commit()
+        table_changed(conn, "booking")
+        entity_cache.invalidate("booking", booking_id)
+        availability_index.remove_booking(booking_id)
+        fleet_arrays.remove_booking(booking_id)
         return jsonify({"success": True, "message": "Booking deleted successfully"}), HTTPStatus.OK
     except Exception as e:
         conn.rollback()
@@ -369,15 +1033,20 @@ def delete_booking(booking_id):
 
 @app.route("/api/booking_status", methods=["GET"])
 @token_required
+@conditional("booking_status")
 def get_booking_statuses():
+    try:
+        page = parse_page_args(request.args, "booking_status")
+    except (PaginationError, FieldsError) as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+
     conn = None
     cursor = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM booking_status")
-        statuses = cursor.fetchall()
-        return jsonify({"success": True, "data": statuses, "total": len(statuses)}), HTTPStatus.OK
+        statuses, next_token = fetch_page(cursor, page)
+        return jsonify(page_response(cursor, page, statuses, next_token)), HTTPStatus.OK
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
     finally:
@@ -386,20 +1055,31 @@ def get_booking_statuses():
         if conn: 
             conn.close()
             
-@app.route("/api/booking_status/<int:booking_status_code>", methods=["GET"])
+@app.route("/api/booking_status/<string:status_code>", methods=["GET"])
 @token_required
 @requires_role("admin")
-def get_booking_status(booking_status_code):
+@conditional()
+def get_booking_status(status_code):
+    try:
+        fields = parse_fields(request.args, "booking_status")
+    except FieldsError as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+
     conn = None
     cursor = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM booking_status WHERE booking_status_code = %s", (booking_status_code,))
-        status = cursor.fetchone()
+        status = entity_cache.get("booking_status", status_code)
+        if status is MISSING:
+            generation = entity_cache.generation
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"SELECT {select_list(fields)} FROM booking_status WHERE status_code = %s", (status_code,))
+            status = cursor.fetchone()
+            if status and fields is None:
+                entity_cache.set("booking_status", status_code, status, generation)
         if not status:
             return jsonify({"success": False, "error": "Booking status not found"}), HTTPStatus.NOT_FOUND
-        return jsonify({"success": True, "data": status}), HTTPStatus.OK
+        return jsonify({"success": True, "data": project(status, fields)}), HTTPStatus.OK
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
     finally:
@@ -411,6 +1091,7 @@ def get_booking_status(booking_status_code):
 
 @app.route("/api/booking_status", methods=["POST"])
 @token_required
+@idempotent
 def create_booking_status():
     data = request.get_json()
     if not data or not data.get("status_code") or not data.get("description"):
@@ -426,6 +1107,7 @@ def create_booking_status():
             (data["status_code"], data["description"])
         )
         conn.commit()
+        table_changed(conn, "booking_status")
         return jsonify({"success": True, "message": "Booking status created successfully"}), HTTPStatus.CREATED
     except Exception as e:
         conn.rollback()
@@ -455,6 +1137,8 @@ def update_booking_status(status_code):
         if cursor.rowcount == 0:
             return jsonify({"success": False, "error": "Booking status not found"}), HTTPStatus.NOT_FOUND
         conn.commit()
+        table_changed(conn, "booking_status")
+        entity_cache.invalidate("booking_status", status_code)
         return jsonify({"success": True, "message": "Booking status updated successfully"}), HTTPStatus.OK
     except Exception as e:
         conn.rollback()
@@ -477,6 +1161,8 @@ def delete_booking_status(status_code):
         if cursor.rowcount == 0:
             return jsonify({"success": False, "error": "Booking status not found"}), HTTPStatus.NOT_FOUND
         conn.commit()
+        table_changed(conn, "booking_status")
+        entity_cache.invalidate("booking_status", status_code)
         return jsonify({"success": True, "message": "Booking status deleted successfully"}), HTTPStatus.OK
     except Exception as e:
         conn.rollback()
@@ -492,15 +1178,136 @@ def delete_booking_status(status_code):
 # --------------------------------------------
 
 @app.route("/api/vehicle", methods=["GET"])
+@conditional("vehicle")
 def get_vehicles():
+    # ?reg_number=A,B,C fetches those vehicles instead of a page
+    if "reg_number" in request.args:
+        try:
+            keys = split_keys(request.args["reg_number"])
+            fields = parse_fields(request.args, "vehicle")
+        except (KeyListError, FieldsError) as e:
+            return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+        return lookup_entities("vehicle", keys, fields)
+
+    try:
+        page = parse_page_args(request.args, "vehicle")
+    except (PaginationError, FieldsError) as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+
     conn = None
     cursor = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM vehicle")
-        vehicles = cursor.fetchall()
-        return jsonify({"success": True, "data": vehicles, "total": len(vehicles)}), HTTPStatus.OK
+        vehicles, next_token = fetch_page(cursor, page)
+        return jsonify(page_response(cursor, page, vehicles, next_token)), HTTPStatus.OK
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+@app.route("/api/vehicle/export", methods=["GET"])
+def export_vehicles():
+    return export_table("vehicle")
+
+@app.route("/api/vehicle/import", methods=["POST"])
+@token_required
+@requires_role("admin")
+def import_vehicles():
+    return import_table("vehicle")
+
+@app.route("/api/vehicle/available", methods=["GET"])
+def get_available_vehicles():
+    date_from = request.args.get("from")
+    date_to = request.args.get("to")
+    if not date_from or not date_to or not is_valid_date(date_from) or not is_valid_date(date_to) or date_from > date_to:
+        return jsonify({"success": False, "error": "from and to must be dates in YYYY-MM-DD format with from <= to"}), HTTPStatus.BAD_REQUEST
+    try:
+        page = parse_page_args(request.args, "vehicle")
+        if page["sort"] != "reg_number":
+            raise PaginationError("available vehicles can only be sorted by reg_number")
+        fields = parse_fields(request.args, "vehicle", allowed=("reg_number", "vehicle_category_description"))
+    except (PaginationError, FieldsError) as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+
+    try:
+        index = get_availability_index()
+        after = page["after"][1] if page["after"] else None
+        found, has_more = index.available(date_from, date_to, request.args.get("category"), after, page["limit"])
+        vehicles = [project({"reg_number": reg_number, "vehicle_category_description": category}, fields) for reg_number, category in found]
+        next_token = encode_cursor("reg_number", [found[-1][0], found[-1][0]]) if has_more and found else None
+        return jsonify({"success": True, "data": vehicles, "limit": page["limit"], "next": next_token}), HTTPStatus.OK
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
+
+# Occupancy, idle gaps and peak concurrency of the fleet and of each
+# category over [from, to]; with ?by=vehicle, also a keyset-paged list of
+# per-vehicle figures in reg_number order
+@app.route("/api/analytics/utilization", methods=["GET"])
+@token_required
+@requires_role("admin")
+def get_utilization():
+    date_from = request.args.get("from")
+    date_to = request.args.get("to")
+    if not date_from or not date_to or not is_valid_date(date_from) or not is_valid_date(date_to) or date_from > date_to:
+        return jsonify({"success": False, "error": "from and to must be dates in YYYY-MM-DD format with from <= to"}), HTTPStatus.BAD_REQUEST
+    if (date.fromisoformat(date_to) - date.fromisoformat(date_from)).days >= UTILIZATION_CONFIG["max_days"]:
+        return jsonify({"success": False, "error": f"The window cannot be longer than {UTILIZATION_CONFIG['max_days']} days"}), HTTPStatus.BAD_REQUEST
+    by = request.args.get("by")
+    if by not in (None, "vehicle"):
+        return jsonify({"success": False, "error": "by must be: vehicle"}), HTTPStatus.BAD_REQUEST
+    page = None
+    if by == "vehicle":
+        try:
+            page = parse_page_args(request.args, "vehicle")
+            if page["sort"] != "reg_number":
+                raise PaginationError("vehicles can only be sorted by reg_number")
+        except (PaginationError, FieldsError, FilterError) as e:
+            return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+
+    category = request.args.get("category")
+    try:
+        fleet = get_fleet_arrays()
+        after = page["after"][1] if page and page["after"] else None
+        result = fleet.utilization(date_from, date_to, category, after, page["limit"] if page else None)
+        if result is None:
+            return jsonify({"success": False, "error": "Vehicle category not found"}), HTTPStatus.NOT_FOUND
+        body = {"success": True, "data": result}
+        if page:
+            vehicles = result.pop("vehicles")
+            has_more = result.pop("has_more")
+            body.update(vehicles=vehicles, limit=page["limit"],
+                        next=encode_cursor("reg_number", [vehicles[-1]["reg_number"]] * 2) if has_more and vehicles else None)
+        return jsonify(body), HTTPStatus.OK
+    except UtilizationError as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.NOT_IMPLEMENTED
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
+
+# Bookings picked up and dropped off per day, status and vehicle category
+# over [from, to], read from the daily summary that booking writes keep
+@app.route("/api/reports/daily", methods=["GET"])
+@token_required
+@requires_role("admin")
+def get_daily_report():
+    date_from = request.args.get("from")
+    date_to = request.args.get("to")
+    if not date_from or not date_to or not is_valid_date(date_from) or not is_valid_date(date_to) or date_from > date_to:
+        return jsonify({"success": False, "error": "from and to must be dates in YYYY-MM-DD format with from <= to"}), HTTPStatus.BAD_REQUEST
+    if (date.fromisoformat(date_to) - date.fromisoformat(date_from)).days >= REPORT_CONFIG["max_days"]:
+        return jsonify({"success": False, "error": f"The window cannot be longer than {REPORT_CONFIG['max_days']} days"}), HTTPStatus.BAD_REQUEST
+
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        rows = daily_report(cursor, date_from, date_to, request.args.get("status"), request.args.get("category"))
+        totals = {measure: sum(row[measure] for row in rows) for measure in ("pickups", "dropoffs", "rental_days")}
+        return jsonify({"success": True, "data": rows, "totals": totals}), HTTPStatus.OK
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
     finally:
@@ -510,17 +1317,28 @@ def get_vehicles():
             conn.close()
 
 @app.route("/api/vehicle/<string:reg_number>", methods=["GET"])
+@conditional()
 def get_vehicle(reg_number):
+    try:
+        fields = parse_fields(request.args, "vehicle")
+    except FieldsError as e:
+        return jsonify({"success": False, "error": str(e)}), HTTPStatus.BAD_REQUEST
+
     conn = None
     cursor = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM vehicle WHERE reg_number = %s", (reg_number,))
-        vehicle = cursor.fetchone()
+        vehicle = entity_cache.get("vehicle", reg_number)
+        if vehicle is MISSING:
+            generation = entity_cache.generation
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"SELECT {select_list(fields)} FROM vehicle WHERE reg_number = %s", (reg_number,))
+            vehicle = cursor.fetchone()
+            if vehicle and fields is None:
+                entity_cache.set("vehicle", reg_number, vehicle, generation)
         if not vehicle:
             return jsonify({"success": False, "error": "Vehicle not found"}), HTTPStatus.NOT_FOUND
-        return jsonify({"success": True, "data": vehicle}), HTTPStatus.OK
+        return jsonify({"success": True, "data": project(vehicle, fields)}), HTTPStatus.OK
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), HTTPStatus.INTERNAL_SERVER_ERROR
     finally:
@@ -530,11 +1348,13 @@ def get_vehicle(reg_number):
             conn.close()
 
 @app.route("/api/vehicle", methods=["POST"])
+@idempotent
 def create_vehicle():
     data = request.get_json()
 
-    if not data or not data.get("reg_number") or not data.get("model_code") or not data.get("vehicle_category_description"):
-        return jsonify({"success": False, "error": "reg_number, model_code, and vehicle_category_description are required"}), HTTPStatus.BAD_REQUEST
+    error = vehicle_error(data)
+    if error:
+        return jsonify({"success": False, "error": error}), HTTPStatus.BAD_REQUEST
 
     conn = None
     cursor = None
@@ -546,6 +1366,9 @@ def create_vehicle():
             (data["reg_number"], data["model_code"], data.get("current_mileage", 0), data.get("engine_size", 0), data["vehicle_category_description"])
         )
         conn.commit()
+        table_changed(conn, "vehicle")
+        availability_index.put_vehicle(data["reg_number"], data["vehicle_category_description"])
+        fleet_arrays.put_vehicle(data["reg_number"], data["vehicle_category_description"])
         return jsonify({"success": True, "data": data}), HTTPStatus.CREATED
     except Exception as e:
         conn.rollback()
@@ -557,6 +1380,11 @@ def create_vehicle():
             conn.close()
 
 
+@app.route("/api/vehicle/bulk", methods=["POST"])
+@idempotent
+def bulk_create_vehicles():
+    return bulk_create("vehicle")
+
 @app.route("/api/vehicle/<string:reg_number>", methods=["PUT"])
 def update_vehicle(reg_number):
     data = request.get_json()
@@ -569,13 +1397,18 @@ def update_vehicle(reg_number):
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        move_vehicle(cursor, reg_number, data["vehicle_category_description"])
         cursor.execute(
             "UPDATE vehicle SET model_code = %s, vehicle_category_description = %s, current_mileage = %s, engine_size = %s WHERE reg_number = %s",
             (data["model_code"], data["vehicle_category_description"], data["current_mileage"], data["engine_size"], reg_number)
         )
         conn.commit()
+        table_changed(conn, "vehicle")
+        entity_cache.invalidate("vehicle", reg_number)
         if cursor.rowcount == 0:
             return jsonify({"success": False, "error": "Vehicle not found"}), HTTPStatus.NOT_FOUND
+        availability_index.put_vehicle(reg_number, data["vehicle_category_description"])
+        fleet_arrays.put_vehicle(reg_number, data["vehicle_category_description"])
         return jsonify({"success": True, "message": "Vehicle updated successfully"}), HTTPStatus.OK
     except Exception as e:
         conn.rollback()
@@ -595,8 +1428,12 @@ def delete_vehicle(reg_number):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM vehicle WHERE reg_number = %s", (reg_number,))
         conn.commit()
+        table_changed(conn, "vehicle")
+        entity_cache.invalidate("vehicle", reg_number)
         if cursor.rowcount == 0:
             return jsonify({"success": False, "error": "Vehicle not found"}), HTTPStatus.NOT_FOUND
+        availability_index.remove_vehicle(reg_number)
+        fleet_arrays.remove_vehicle(reg_number)
         return jsonify({"success": True, "message": f"Vehicle with reg_number {reg_number} has been deleted"}), HTTPStatus.OK
     except Exception as e:
         conn.rollback()
@@ -1,7 +1,10 @@
+import io
+import jwt
 import pytest
+from datetime import datetime
 from unittest.mock import patch, MagicMock
 from flask import Flask
-from api import app
+from api import app, JWT_SECRET
 
 @pytest.fixture
 def client():
@@ -9,6 +12,45 @@ def client():
     with app.test_client() as client:
         yield client
 
+@pytest.fixture
+def auth_headers():
+    """Authorization header carrying an admin token."""
+    token = jwt.encode({"username": "admin", "role": "admin"}, JWT_SECRET, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+@patch("api.db_pool")
+def test_request_holds_single_pooled_connection(mock_pool, client):
+    """Test that a request checks out one connection and releases it on teardown."""
+    from api import get_db_connection
+    with app.app_context():
+        first = get_db_connection()
+        first.close()
+        second = get_db_connection()
+        assert first._pooled is second._pooled
+        mock_pool.acquire.assert_called_once()
+        mock_pool.release.assert_not_called()
+    mock_pool.release.assert_called_once()
+
+def test_logout_revokes_token(client):
+    """Test that a token stops working after logout."""
+    token = jwt.encode({"username": "logout-test", "role": "admin"}, JWT_SECRET, algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.post("/api/logout", headers=headers).status_code == 200
+    response = client.post("/api/logout", headers=headers)
+    assert response.status_code == 401
+    assert response.json["error"] == "Invalid token!"
+
+def test_login_after_logout(client):
+    """Test that logging in again after a logout gives a new, working token."""
+    credentials = {"username": "admin", "password": "admin123"}
+    first = client.post("/api/login", json=credentials).json["token"]
+    assert client.post("/api/logout", headers={"Authorization": f"Bearer {first}"}).status_code == 200
+    second = client.post("/api/login", json=credentials).json["token"]
+    assert second != first
+    assert client.post("/api/logout", headers={"Authorization": f"Bearer {second}"}).status_code == 200
+    claims = jwt.decode(second, JWT_SECRET, algorithms=["HS256"])
+    assert claims["exp"] > claims["iat"]
+
 @patch("api.get_db_connection")
 def test_get_customers_success(mock_db, client):
     """Test fetching all customers with a successful response."""
@@ -126,6 +168,111 @@ def test_get_vehicles_success(mock_db, client):
     assert response.json["success"]
     assert len(response.json["data"]) == 1
 
+@patch("api.get_db_connection")
+def test_get_vehicles_next_page(mock_db, client):
+    """Test that a full page returns a next cursor that seeks past the last row."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = [{"reg_number": "AAA111"}, {"reg_number": "BBB222"}]
+    mock_cursor.fetchone.return_value = {"total": 5}
+    mock_conn.cursor.return_value = mock_cursor
+    mock_db.return_value = mock_conn
+
+    response = client.get("/api/vehicle?limit=1")
+    assert response.status_code == 200
+    assert response.json["data"] == [{"reg_number": "AAA111"}]
+    assert response.json["total"] == 5
+    assert response.json["next"]
+
+    client.get(f"/api/vehicle?limit=1&after={response.json['next']}")
+    mock_cursor.execute.assert_any_call(
+        "SELECT * FROM vehicle WHERE reg_number > %s ORDER BY reg_number ASC LIMIT %s", ("AAA111", 2)
+    )
+
+def test_get_vehicles_invalid_cursor(client):
+    """Test that an invalid cursor is rejected before touching the database."""
+    response = client.get("/api/vehicle?after=garbage")
+    assert response.status_code == 400
+    assert not response.json["success"]
+
+@patch("api.get_db_connection")
+def test_get_vehicles_not_modified(mock_db, client):
+    """Test that a matching If-None-Match returns 304 without reading the vehicle table."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = (4, datetime(2023, 1, 1, 12, 0))
+    mock_cursor.fetchall.return_value = [{"reg_number": "ABC123"}]
+    mock_conn.cursor.return_value = mock_cursor
+    mock_db.return_value = mock_conn
+
+    response = client.get("/api/vehicle")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"vehicle-4-all"'
+    assert response.headers["Last-Modified"] == "Sun, 01 Jan 2023 12:00:00 GMT"
+
+    mock_cursor.execute.reset_mock()
+    response = client.get("/api/vehicle", headers={"If-None-Match": '"vehicle-4-all"'})
+    assert response.status_code == 304
+    assert not any("FROM vehicle" in c.args[0] for c in mock_cursor.execute.call_args_list)
+
+@patch("api.get_db_connection")
+def test_get_vehicle_etag(mock_db, client):
+    """Test that a single vehicle is revalidated against a hash of its body."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = {"reg_number": "ETAG1", "model_code": "SUV2023"}
+    mock_conn.cursor.return_value = mock_cursor
+    mock_db.return_value = mock_conn
+
+    etag = client.get("/api/vehicle/ETAG1").headers["ETag"]
+    response = client.get("/api/vehicle/ETAG1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+@patch("api.get_db_connection")
+def test_export_vehicles_csv(mock_db, client):
+    """Test streaming a CSV export of vehicles."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.column_names = ("reg_number", "model_code")
+    mock_cursor.fetchmany.side_effect = [[("ABC123", "SUV2023")], []]
+    mock_conn.cursor.return_value = mock_cursor
+    mock_db.return_value = mock_conn
+
+    response = client.get("/api/vehicle/export?format=csv")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert response.get_data(as_text=True) == "reg_number,model_code\r\nABC123,SUV2023\r\n"
+
+@patch("api.get_availability_index")
+def test_get_available_vehicles(mock_index, client):
+    """Test searching for vehicles free over a date range."""
+    mock_index.return_value.available.return_value = ([("ABC123", "SUV")], True)
+
+    response = client.get("/api/vehicle/available?from=2023-01-01&to=2023-01-05&category=SUV&limit=1")
+    assert response.status_code == 200
+    assert response.json["data"] == [{"reg_number": "ABC123", "vehicle_category_description": "SUV"}]
+    assert response.json["next"]
+    mock_index.return_value.available.assert_called_once_with("2023-01-01", "2023-01-05", "SUV", None, 1)
+
+@patch("api.get_db_connection")
+def test_stale_index_served_during_rebuild(mock_db):
+    """Test that only the first load of an index makes requests wait."""
+    import threading
+    from api import refreshed
+    index, lock, load = MagicMock(), threading.Lock(), MagicMock()
+    index.is_stale.return_value = True
+    index.built = True
+    with lock:
+        assert refreshed(index, lock, load) is index
+    load.assert_not_called()
+    refreshed(index, lock, load)
+    load.assert_called_once_with(index, mock_db.return_value)
+
+def test_get_available_vehicles_invalid_range(client):
+    """Test that a missing or inverted date range is rejected."""
+    assert client.get("/api/vehicle/available?from=2023-01-05").status_code == 400
+    assert client.get("/api/vehicle/available?from=2023-01-05&to=2023-01-01").status_code == 400
+
 @patch("api.get_db_connection")
 def test_get_vehicle_not_found(mock_db, client):
     """Test fetching a specific vehicle that does not exist."""
@@ -140,6 +287,29 @@ def test_get_vehicle_not_found(mock_db, client):
     assert not response.json["success"]
     assert "Vehicle not found" in response.json["error"]
 
+@patch("api.get_db_connection")
+def test_get_vehicle_cached_until_update(mock_db, client):
+    """Test that a vehicle is served from cache until it is updated."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = {"reg_number": "CACHE1", "model_code": "SUV2023"}
+    mock_cursor.rowcount = 1
+    mock_conn.cursor.return_value = mock_cursor
+    mock_db.return_value = mock_conn
+
+    assert client.get("/api/vehicle/CACHE1").json["data"]["model_code"] == "SUV2023"
+    assert client.get("/api/vehicle/CACHE1").json["data"]["model_code"] == "SUV2023"
+    assert mock_db.call_count == 1
+
+    client.put("/api/vehicle/CACHE1", json={
+        "model_code": "SUV2024",
+        "current_mileage": 15000,
+        "engine_size": 2500,
+        "vehicle_category_description": "SUV"
+    })
+    mock_cursor.fetchone.return_value = {"reg_number": "CACHE1", "model_code": "SUV2024"}
+    assert client.get("/api/vehicle/CACHE1").json["data"]["model_code"] == "SUV2024"
+
 @patch("api.get_db_connection")
 def test_create_vehicle_success(mock_db, client):
     """Test successful creation of a vehicle."""
@@ -158,6 +328,42 @@ def test_create_vehicle_success(mock_db, client):
     assert response.status_code == 201
     assert response.json["success"]
 
+@patch("api.get_db_connection")
+def test_bulk_create_vehicles_partial(mock_db, client):
+    """Test that a bulk vehicle create reports a result per record."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = [("DUP001",)]
+    mock_conn.cursor.return_value = mock_cursor
+    mock_db.return_value = mock_conn
+
+    response = client.post("/api/vehicle/bulk", json=[
+        {"reg_number": "NEW001", "model_code": "SEDAN2023", "vehicle_category_description": "Sedan"},
+        {"reg_number": "DUP001", "model_code": "SEDAN2023", "vehicle_category_description": "Sedan"},
+        {"reg_number": "BAD001"},
+    ])
+    assert response.status_code == 207
+    assert (response.json["created"], response.json["duplicate"], response.json["invalid"]) == (1, 1, 1)
+    assert [r["status"] for r in response.json["results"]] == ["created", "duplicate", "invalid"]
+
+def test_bulk_create_vehicles_rejects_non_array(client):
+    """Test that a bulk create needs a JSON array and a known mode."""
+    assert client.post("/api/vehicle/bulk", json={"reg_number": "X"}).status_code == 400
+    assert client.post("/api/vehicle/bulk?mode=some", json=[{}]).status_code == 400
+
+@patch("api.get_db_connection")
+def test_import_vehicles_upload(mock_db, client, auth_headers):
+    """Test importing an uploaded CSV file."""
+    mock_conn = MagicMock()
+    mock_db.return_value = mock_conn
+
+    data = b"reg_number,model_code,vehicle_category_description\nIMP001,SEDAN2023,Sedan\nIMP002,,Sedan\n"
+    response = client.post("/api/vehicle/import", headers=auth_headers,
+                           data={"file": (io.BytesIO(data), "vehicles.csv")}, content_type="multipart/form-data")
+    assert response.status_code == 200
+    assert (response.json["data"]["inserted"], response.json["data"]["invalid"]) == (1, 1)
+    mock_conn.cursor.return_value.executemany.assert_called_once()
+
 @patch("api.get_db_connection")
 def test_update_vehicle_not_found(mock_db, client):
     """Test updating a non-existent vehicle."""
@@ -242,6 +448,57 @@ def test_create_booking_success(mock_db, client):
     assert response.status_code == 201
     assert response.json["success"]
 
+@patch("api.get_db_connection")
+def test_create_booking_conflict(mock_db, client, auth_headers):
+    """Test that an overlapping booking is rejected with the clashing IDs."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = ("ABC123",)
+    mock_cursor.fetchall.return_value = [(7,), (9,)]
+    mock_conn.cursor.return_value = mock_cursor
+    mock_db.return_value = mock_conn
+
+    response = client.post("/api/booking", headers=auth_headers, json={
+        "Customer_customer_id": 1,
+        "Vehicle_reg_number": "ABC123",
+        "date_from": "2023-01-01",
+        "date_to": "2023-01-10"
+    })
+    assert response.status_code == 409
+    assert response.json["conflicts"] == [7, 9]
+    mock_cursor.execute.assert_any_call("SELECT reg_number FROM vehicle WHERE reg_number = %s FOR UPDATE", ("ABC123",))
+    assert not any("INSERT" in c.args[0] for c in mock_cursor.execute.call_args_list)
+
+@patch("api.get_db_connection")
+def test_update_booking_conflict_excludes_itself(mock_db, client, auth_headers):
+    """Test that moving a booking checks overlaps against the other bookings only."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = ("ABC123",)
+    mock_cursor.fetchall.return_value = [(3,)]
+    mock_conn.cursor.return_value = mock_cursor
+    mock_db.return_value = mock_conn
+
+    response = client.put("/api/booking/1", headers=auth_headers, json={
+        "date_from": "2023-02-01",
+        "date_to": "2023-02-10"
+    })
+    assert response.status_code == 409
+    assert response.json["conflicts"] == [3]
+    conflict_query = mock_cursor.execute.call_args_list[-1]
+    assert "booking_id <> %s" in conflict_query.args[0]
+    assert conflict_query.args[1][-1] == 1
+
+def test_create_booking_inverted_dates(client, auth_headers):
+    """Test that a booking ending before it starts is rejected."""
+    response = client.post("/api/booking", headers=auth_headers, json={
+        "Customer_customer_id": 1,
+        "Vehicle_reg_number": "ABC123",
+        "date_from": "2023-01-10",
+        "date_to": "2023-01-01"
+    })
+    assert response.status_code == 400
+
 @patch("api.get_db_connection")
 def test_get_booking_not_found(mock_db, client):
     """Test fetching a specific booking that does not exist."""
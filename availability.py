@@ -0,0 +1,275 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime
+from conn import AVAILABILITY_CONFIG
+
+
+def to_day(value):
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return datetime.strptime(value, '%Y-%m-%d').date().toordinal()
+
+
+# Bookings of one vehicle as parallel arrays sorted by start day. max_end[i]
+# is the latest end among the first i + 1 bookings, so an overlap test is a
+# single bisect even if the schedule already contains overlapping bookings.
+class VehicleSchedule:
+    __slots__ = ("starts", "ends", "ids", "max_end")
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        self.max_end = []
+
+    def add(self, booking_id, start, end):
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, booking_id)
+        self._refresh_max_end(i)
+
+    def remove(self, booking_id, start):
+        i = bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start:
+            if self.ids[i] == booking_id:
+                del self.starts[i], self.ends[i], self.ids[i]
+                self._refresh_max_end(i)
+                return True
+            i += 1
+        return False
+
+    def _refresh_max_end(self, i):
+        del self.max_end[i:]
+        current = self.max_end[-1] if self.max_end else None
+        for end in self.ends[i:]:
+            current = end if current is None or end > current else current
+            self.max_end.append(current)
+
+    # Both ends are inclusive days
+    def is_free(self, start, end):
+        i = bisect_right(self.starts, end)
+        return i == 0 or self.max_end[i - 1] < start
+
+    def overlapping(self, start, end):
+        i = bisect_right(self.starts, end)
+        if i == 0 or self.max_end[i - 1] < start:
+            return []
+        return [self.ids[j] for j in range(i) if self.ends[j] >= start]
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class AvailabilityIndex:
+    """In-process index of vehicle bookings for availability search.
+
+    Holds every vehicle (reg_number order, overall and per category) and a
+    VehicleSchedule per vehicle. Bookings whose status is listed in
+    AVAILABILITY_CONFIG["inactive_statuses"] do not block a vehicle.
+    """
+
+    def __init__(self, inactive_statuses=None):
+        self.inactive_statuses = set(AVAILABILITY_CONFIG["inactive_statuses"] if inactive_statuses is None else inactive_statuses)
+        self.lock = threading.RLock()
+        self.loaded_at = None
+        self.built = False
+        self._loading = False
+        self._pending = []
+        self._reset()
+
+    def _reset(self):
+        self.categories = {}
+        self.order = []
+        self.by_category = {}
+        self.schedules = {}
+        self.bookings = {}
+
+    # Rebuild from (reg_number, category) and (booking_id, reg_number,
+    # date_from, date_to, status) rows. The new structures are built aside
+    # and swapped in, so the current index can still be searched during a
+    # rebuild; writes that land meanwhile are applied to the current index
+    # and replayed onto the new one.
+    def load(self, vehicles, bookings):
+        self.begin_load()
+        fresh = AvailabilityIndex(self.inactive_statuses)
+        try:
+            for reg_number, category in vehicles:
+                fresh.categories[reg_number] = category
+                fresh.by_category.setdefault(category, []).append(reg_number)
+            fresh.order = sorted(fresh.categories)
+            for regs in fresh.by_category.values():
+                regs.sort()
+            # Collect each vehicle's bookings, then sort once per vehicle
+            # rather than inserting one booking at a time.
+            collected = {}
+            for booking_id, reg_number, date_from, date_to, status in bookings:
+                if status in fresh.inactive_statuses:
+                    continue
+                start = to_day(date_from)
+                collected.setdefault(reg_number, []).append((start, to_day(date_to), booking_id))
+                fresh.bookings[booking_id] = (reg_number, start)
+            for reg_number, entries in collected.items():
+                entries.sort()
+                schedule = VehicleSchedule()
+                schedule.starts, schedule.ends, schedule.ids = (list(column) for column in zip(*entries))
+                schedule._refresh_max_end(0)
+                fresh.schedules[reg_number] = schedule
+        except Exception:
+            self.abort_load()
+            raise
+        with self.lock:
+            self.categories = fresh.categories
+            self.order = fresh.order
+            self.by_category = fresh.by_category
+            self.schedules = fresh.schedules
+            self.bookings = fresh.bookings
+            self.built = True
+            self.loaded_at = time.monotonic()
+            self._replay()
+
+    # Start recording writes for load() to replay. load_index calls it
+    # before reading the tables, so a write committed after the read is not
+    # lost; replaying one the read already saw is harmless, as every write
+    # is an upsert or a removal.
+    def begin_load(self):
+        with self.lock:
+            if not self._loading:
+                self._loading = True
+                self._pending = []
+
+    def abort_load(self):
+        with self.lock:
+            self._loading = False
+            self._pending = []
+
+    def _replay(self):
+        self._loading = False
+        pending, self._pending = self._pending, []
+        for name, args in pending:
+            getattr(self, name)(*args)
+
+    def _written(self, name, *args):
+        if self._loading:
+            self._pending.append((name, args))
+
+    def is_stale(self, max_age=None):
+        max_age = AVAILABILITY_CONFIG["max_age"] if max_age is None else max_age
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > max_age
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+
+    def put_vehicle(self, reg_number, category):
+        with self.lock:
+            self._written("put_vehicle", reg_number, category)
+            old = self.categories.get(reg_number)
+            if old == category:
+                return
+            if old is None:
+                insort(self.order, reg_number)
+            else:
+                self._discard(self.by_category[old], reg_number)
+            self.categories[reg_number] = category
+            insort(self.by_category.setdefault(category, []), reg_number)
+
+    def remove_vehicle(self, reg_number):
+        with self.lock:
+            self._written("remove_vehicle", reg_number)
+            category = self.categories.pop(reg_number, None)
+            if category is None:
+                return
+            self._discard(self.order, reg_number)
+            self._discard(self.by_category[category], reg_number)
+            schedule = self.schedules.pop(reg_number, None)
+            for booking_id in schedule.ids if schedule else ():
+                self.bookings.pop(booking_id, None)
+
+    @staticmethod
+    def _discard(regs, reg_number):
+        i = bisect_left(regs, reg_number)
+        if i < len(regs) and regs[i] == reg_number:
+            del regs[i]
+
+    # Insert or replace a booking. `reg_number` may be None on updates that
+    # do not move the booking to another vehicle.
+    def put_booking(self, booking_id, reg_number, date_from, date_to, status=None):
+        with self.lock:
+            self._written("put_booking", booking_id, reg_number, date_from, date_to, status)
+            previous = self._remove_booking(booking_id)
+            if reg_number is None:
+                if previous is None:
+                    # Unknown booking: the index cannot place it, rebuild.
+                    self.loaded_at = None
+                    return
+                reg_number = previous[0]
+            if status in self.inactive_statuses:
+                return
+            start, end = to_day(date_from), to_day(date_to)
+            self.schedules.setdefault(reg_number, VehicleSchedule()).add(booking_id, start, end)
+            self.bookings[booking_id] = (reg_number, start)
+
+    def remove_booking(self, booking_id):
+        with self.lock:
+            self._written("remove_booking", booking_id)
+            return self._remove_booking(booking_id)
+
+    def _remove_booking(self, booking_id):
+        entry = self.bookings.pop(booking_id, None)
+        if entry is not None:
+            self.schedules[entry[0]].remove(booking_id, entry[1])
+        return entry
+
+    # Vehicles (optionally of one category) with no booking overlapping
+    # [date_from, date_to], in reg_number order after `after`. Stops after
+    # `limit` matches, so cost depends on the page size, not the fleet size.
+    def available(self, date_from, date_to, category=None, after=None, limit=100):
+        start, end = to_day(date_from), to_day(date_to)
+        with self.lock:
+            regs = self.order if category is None else self.by_category.get(category, [])
+            categories = self.categories
+            get_schedule = self.schedules.get
+            i = bisect_right(regs, after) if after is not None else 0
+            n = len(regs)
+            found = []
+            # VehicleSchedule.is_free inlined; this loop is the hot path
+            while i < n and len(found) < limit:
+                reg_number = regs[i]
+                i += 1
+                schedule = get_schedule(reg_number)
+                if schedule is not None:
+                    j = bisect_right(schedule.starts, end)
+                    if j and schedule.max_end[j - 1] >= start:
+                        continue
+                found.append((reg_number, categories[reg_number]))
+            has_more = i < n
+        return found, has_more
+
+
+# Rows of the cursor's result set, fetched chunk_size at a time, so an
+# index can be built without holding the whole result twice
+def stream_rows(cursor, chunk_size):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield from rows
+
+# Build `index` from the vehicle and booking tables
+def load_index(index, conn, chunk_size=10000):
+    cursor = conn.cursor()
+    index.begin_load()
+    try:
+        cursor.execute("SELECT reg_number, vehicle_category_description FROM vehicle")
+        vehicles = cursor.fetchall()
+        cursor.execute("SELECT booking_id, Vehicle_reg_number, date_from, date_to, booking_status_code FROM booking")
+        index.load(vehicles, stream_rows(cursor, chunk_size))
+    except Exception:
+        index.abort_load()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,117 @@
+import pytest
+from datetime import date
+from unittest.mock import MagicMock
+from availability import AvailabilityIndex, VehicleSchedule, load_index, to_day
+
+VEHICLES = [("CAR1", "Sedan"), ("CAR2", "Sedan"), ("CAR3", "SUV"), ("CAR4", "Sedan")]
+BOOKINGS = [
+    (1, "CAR1", date(2023, 1, 1), date(2023, 1, 10), "CONFIRMED"),
+    (2, "CAR2", date(2023, 1, 5), date(2023, 1, 6), "CANCELLED"),
+    (3, "CAR3", date(2023, 1, 8), date(2023, 1, 12), "PENDING"),
+]
+
+@pytest.fixture
+def index():
+    index = AvailabilityIndex(inactive_statuses=["CANCELLED"])
+    index.load(VEHICLES, BOOKINGS)
+    return index
+
+def booked(index, reg_number, date_from, date_to):
+    """IDs of the vehicle's active bookings overlapping the range."""
+    schedule = index.schedules.get(reg_number)
+    return schedule.overlapping(to_day(date_from), to_day(date_to)) if schedule else []
+
+def test_schedule_overlap_with_nested_bookings():
+    """Test that a long booking is still found behind shorter, later ones."""
+    schedule = VehicleSchedule()
+    schedule.add(1, 1, 30)
+    schedule.add(2, 5, 6)
+    schedule.add(3, 10, 11)
+    assert not schedule.is_free(20, 21)
+    assert schedule.overlapping(20, 21) == [1]
+    assert schedule.is_free(31, 40)
+    schedule.remove(1, 1)
+    assert schedule.is_free(20, 21)
+
+def test_available_skips_overlapping_bookings(index):
+    """Test that vehicles with an overlapping active booking are excluded."""
+    found, has_more = index.available("2023-01-09", "2023-01-09")
+    assert [reg for reg, _ in found] == ["CAR2", "CAR4"]
+    assert not has_more
+
+def test_inclusive_boundaries(index):
+    """Test that a booking blocks both its first and last day."""
+    assert ("CAR1", "Sedan") not in index.available("2023-01-10", "2023-01-15")[0]
+    assert ("CAR1", "Sedan") in index.available("2023-01-11", "2023-01-15")[0]
+
+def test_available_by_category_and_page(index):
+    """Test that category filtering and after/limit paging work together."""
+    found, has_more = index.available("2023-02-01", "2023-02-02", category="Sedan", limit=2)
+    assert found == [("CAR1", "Sedan"), ("CAR2", "Sedan")]
+    assert has_more
+    found, has_more = index.available("2023-02-01", "2023-02-02", category="Sedan", after="CAR2", limit=2)
+    assert found == [("CAR4", "Sedan")]
+    assert not has_more
+
+def test_booking_writes_update_index(index):
+    """Test that create, update and delete keep the index current."""
+    index.put_booking(4, "CAR4", "2023-03-01", "2023-03-05", "PENDING")
+    assert booked(index, "CAR4", "2023-03-05", "2023-03-06") == [4]
+
+    index.put_booking(4, None, "2023-04-01", "2023-04-05", "PENDING")
+    assert booked(index, "CAR4", "2023-03-05", "2023-03-06") == []
+    assert booked(index, "CAR4", "2023-04-01", "2023-04-01") == [4]
+
+    index.put_booking(4, None, "2023-04-01", "2023-04-05", "CANCELLED")
+    assert booked(index, "CAR4", "2023-04-01", "2023-04-01") == []
+
+    index.put_booking(1, None, "2023-01-01", "2023-01-10", "CONFIRMED")
+    index.remove_booking(1)
+    assert ("CAR1", "Sedan") in index.available("2023-01-05", "2023-01-05")[0]
+
+def test_writes_during_load_are_kept(index):
+    """Test that writes made while the tables are read are replayed onto the new index."""
+    def bookings():
+        yield BOOKINGS[0]
+        index.put_booking(4, "CAR4", "2023-03-01", "2023-03-05", "PENDING")
+        index.remove_booking(3)
+        yield from BOOKINGS[1:]
+    index.load(VEHICLES, bookings())
+    assert booked(index, "CAR4", "2023-03-02", "2023-03-02") == [4]
+    assert booked(index, "CAR3", "2023-01-09", "2023-01-09") == []
+    assert not index.is_stale()
+
+def test_update_of_unknown_booking_marks_stale(index):
+    """Test that an update the index cannot place forces a rebuild."""
+    assert not index.is_stale()
+    index.put_booking(99, None, "2023-01-01", "2023-01-02", "PENDING")
+    assert index.is_stale()
+
+def test_vehicle_writes_update_index(index):
+    """Test that vehicles can be added, recategorised and removed."""
+    index.put_vehicle("CAR0", "SUV")
+    index.put_vehicle("CAR4", "SUV")
+    index.remove_vehicle("CAR3")
+    found, _ = index.available("2023-01-01", "2023-01-01", category="SUV")
+    assert found == [("CAR0", "SUV"), ("CAR4", "SUV")]
+
+def test_load_index_from_connection():
+    """Test building the index from vehicle and booking queries."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = VEHICLES
+    mock_cursor.fetchmany.side_effect = [BOOKINGS, []]
+    mock_conn.cursor.return_value = mock_cursor
+
+    index = AvailabilityIndex(inactive_statuses=["CANCELLED"])
+    load_index(index, mock_conn)
+    assert booked(index, "CAR1", "2023-01-02", "2023-01-02") == [1]
+    assert not index.is_stale()
+    mock_cursor.close.assert_called_once()
+
+def test_to_day_accepts_strings_and_dates():
+    """Test that dates and YYYY-MM-DD strings map to the same day number."""
+    assert to_day("2023-01-01") == to_day(date(2023, 1, 1))
+
+if __name__ == "__main__":
+    pytest.main()
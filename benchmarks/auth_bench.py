@@ -0,0 +1,48 @@
+"""token_required with and without the verified-claims cache.
+
+Times the decorator on a no-op view inside a request context, so the
+numbers are the per-request auth overhead for a client reusing one token.
+
+    python benchmarks/auth_bench.py --requests 50000
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import jwt
+import api
+from token_cache import TokenCache
+
+
+def run(view, headers, requests):
+    with api.app.test_request_context("/", headers=headers):
+        start = time.perf_counter()
+        for _ in range(requests):
+            view()
+        return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50000)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    token = jwt.encode({"username": "bench", "role": "admin", "exp": int(time.time()) + 3600},
+                       api.JWT_SECRET, algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    view = api.token_required(lambda: None)
+    decode = lambda t: jwt.decode(t, api.JWT_SECRET, algorithms=["HS256"])
+
+    for name, cache in (("no cache", TokenCache(decode, max_entries=0)), ("cache", TokenCache(decode))):
+        api.token_cache = cache
+        per_request = run(view, headers, args.requests)
+        print(f"{name:>9}: {per_request * 1e6:.1f} us/request  {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Availability search: in-process index vs. SQL anti-join.
+
+Generates a synthetic fleet and booking history, then times the same
+"which vehicles are free from X to Y" query against AvailabilityIndex and
+against a NOT EXISTS anti-join on an indexed in-memory SQLite database.
+
+    python benchmarks/availability_bench.py --vehicles 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from availability import AvailabilityIndex
+
+CATEGORIES = ["Sedan", "SUV", "Hatchback", "Van", "Luxury"]
+START = date(2023, 1, 1)
+
+ANTI_JOIN = """
+    SELECT v.reg_number, v.vehicle_category_description FROM vehicle v
+    WHERE v.vehicle_category_description = ?
+      AND NOT EXISTS (
+        SELECT 1 FROM booking b
+        WHERE b.Vehicle_reg_number = v.reg_number AND b.date_from <= ? AND b.date_to >= ?
+      )
+    ORDER BY v.reg_number LIMIT ?
+"""
+
+
+def generate(vehicles, bookings_per_vehicle, seed):
+    rng = random.Random(seed)
+    fleet = [(f"REG{i:07d}", rng.choice(CATEGORIES)) for i in range(vehicles)]
+    bookings = []
+    booking_id = 0
+    for reg_number, _ in fleet:
+        day = rng.randint(0, 10)
+        for _ in range(bookings_per_vehicle):
+            day += rng.randint(0, 20)
+            length = rng.randint(1, 14)
+            booking_id += 1
+            bookings.append((booking_id, reg_number, START + timedelta(days=day),
+                             START + timedelta(days=day + length), "CONFIRMED"))
+            day += length + 1
+    return fleet, bookings
+
+
+def build_sqlite(fleet, bookings):
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE vehicle (reg_number TEXT PRIMARY KEY, vehicle_category_description TEXT)")
+    db.execute("CREATE TABLE booking (booking_id INTEGER PRIMARY KEY, Vehicle_reg_number TEXT, "
+               "date_from TEXT, date_to TEXT, booking_status_code TEXT)")
+    db.executemany("INSERT INTO vehicle VALUES (?, ?)", fleet)
+    db.executemany("INSERT INTO booking VALUES (?, ?, ?, ?, ?)",
+                   [(b, r, f.isoformat(), t.isoformat(), s) for b, r, f, t, s in bookings])
+    db.execute("CREATE INDEX idx_vehicle_category ON vehicle (vehicle_category_description, reg_number)")
+    db.execute("CREATE INDEX idx_booking_vehicle_dates ON booking (Vehicle_reg_number, date_from, date_to)")
+    db.commit()
+    return db
+
+
+def time_queries(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(*query)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vehicles", type=int, default=100000)
+    parser.add_argument("--bookings-per-vehicle", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    fleet, bookings = generate(args.vehicles, args.bookings_per_vehicle, args.seed)
+    print(f"{len(fleet)} vehicles, {len(bookings)} bookings")
+
+    start = time.perf_counter()
+    index = AvailabilityIndex(inactive_statuses=[])
+    index.load(fleet, bookings)
+    print(f"index build: {time.perf_counter() - start:.2f}s")
+    db = build_sqlite(fleet, bookings)
+
+    rng = random.Random(args.seed + 1)
+    queries = []
+    for _ in range(args.queries):
+        date_from = START + timedelta(days=rng.randint(0, 150))
+        queries.append((date_from, date_from + timedelta(days=rng.randint(1, 14)), rng.choice(CATEGORIES)))
+
+    def via_index(date_from, date_to, category):
+        return index.available(date_from, date_to, category, limit=args.limit)
+
+    def via_sql(date_from, date_to, category):
+        return db.execute(ANTI_JOIN, (category, date_to.isoformat(), date_from.isoformat(), args.limit)).fetchall()
+
+    for name, fn in (("interval index", via_index), ("sqlite anti-join", via_sql)):
+        p50, p99 = time_queries(fn, queries)
+        print(f"{name:>18}: p50 {p50 * 1000:.3f} ms  p99 {p99 * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
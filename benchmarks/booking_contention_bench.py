@@ -0,0 +1,93 @@
+"""Concurrent booking writers contending for the same vehicles.
+
+Runs --threads writers through the Flask app against the database
+configured in conn.py (DB_BACKEND; a SQLite file works offline). Each writer books random short periods on one of
+--vehicles vehicles (existing reg_numbers passed with --reg-number), so
+most attempts collide. Reports throughput and the created/conflict split,
+then checks that no two active bookings of a vehicle overlap and deletes
+the bookings it created.
+
+    python benchmarks/booking_contention_bench.py --customer-id 1 \\
+        --reg-number ABC123 --reg-number XYZ789 --threads 16 --attempts 200
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import jwt
+from api import app, JWT_SECRET, db_pool
+
+START = date(2030, 1, 1)
+
+
+def writer(args, headers, seed, results):
+    rng = random.Random(seed)
+    client = app.test_client()
+    for _ in range(args.attempts):
+        day = rng.randint(0, args.days)
+        response = client.post("/api/booking", headers=headers, json={
+            "Customer_customer_id": args.customer_id,
+            "Vehicle_reg_number": rng.choice(args.reg_number),
+            "date_from": (START + timedelta(days=day)).isoformat(),
+            "date_to": (START + timedelta(days=day + rng.randint(0, 3))).isoformat(),
+        })
+        results.append(response.status_code)
+
+
+def check_and_clean(reg_numbers):
+    conn = db_pool.acquire()
+    cursor = conn.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(reg_numbers))
+        cursor.execute(
+            "SELECT COUNT(*) FROM booking a JOIN booking b ON a.Vehicle_reg_number = b.Vehicle_reg_number"
+            " AND a.booking_id < b.booking_id AND a.date_from <= b.date_to AND b.date_from <= a.date_to"
+            f" WHERE a.Vehicle_reg_number IN ({placeholders}) AND a.date_from >= %s",
+            (*reg_numbers, START)
+        )
+        overlaps = cursor.fetchone()[0]
+        cursor.execute(f"DELETE FROM booking WHERE Vehicle_reg_number IN ({placeholders}) AND date_from >= %s",
+                       (*reg_numbers, START))
+        conn.commit()
+        return overlaps
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customer-id", type=int, required=True)
+    parser.add_argument("--reg-number", action="append", required=True)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    token = jwt.encode({"username": "bench", "role": "admin"}, JWT_SECRET, algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    results = []
+    threads = [threading.Thread(target=writer, args=(args, headers, i, results)) for i in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    counts = {status: results.count(status) for status in sorted(set(results))}
+    print(f"{len(results)} writes in {elapsed:.2f}s ({len(results) / elapsed:.0f}/s), status counts: {counts}")
+    print(f"pool: {db_pool.stats()}")
+    overlaps = check_and_clean(args.reg_number)
+    print(f"overlapping booking pairs: {overlaps}")
+    sys.exit(1 if overlaps else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Vehicle onboarding: POST /api/vehicle per record vs. POST /api/vehicle/bulk.
+
+Creates --records vehicles through each path against the database
+configured in conn.py, reports records per second, then deletes them.
+
+    python benchmarks/bulk_bench.py --records 5000
+    DB_BACKEND=sqlite:////tmp/carhire.db python benchmarks/bulk_bench.py
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from api import app, db_pool
+
+
+def records(prefix, count):
+    return [{"reg_number": f"{prefix}{i:06d}", "model_code": "BENCH", "current_mileage": i,
+             "engine_size": 1600, "vehicle_category_description": "Bench"} for i in range(count)]
+
+
+def single_rows(client, batch):
+    for record in batch:
+        assert client.post("/api/vehicle", json=record).status_code == 201
+
+
+def bulk(client, batch):
+    response = client.post("/api/vehicle/bulk", json=batch)
+    assert response.status_code == 201, response.json
+
+
+def cleanup(prefix):
+    conn = db_pool.acquire()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM vehicle WHERE reg_number LIKE %s", (prefix + "%",))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=5000)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    for name, fn in (("single-row", single_rows), ("bulk", bulk)):
+        prefix = f"B{uuid.uuid4().hex[:5].upper()}"
+        batch = records(prefix, args.records)
+        try:
+            start = time.perf_counter()
+            fn(client, batch)
+            elapsed = time.perf_counter() - start
+        finally:
+            cleanup(prefix)
+        print(f"{name:>10}: {args.records / elapsed:,.0f} records/s ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
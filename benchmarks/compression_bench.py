@@ -0,0 +1,60 @@
+"""CPU cost against bytes saved for each response encoding and level.
+
+Encodes --bookings booking rows as the /api/booking response would, then
+compresses the body with every available encoding at a few levels and
+reports the compressed size, the time taken (best of --repeats) and the
+time to serve the same body from the variant cache instead.
+
+    python benchmarks/compression_bench.py --bookings 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flask import Flask, jsonify
+from compression import Compressor
+from json_provider import FastJSONProvider
+from json_bench import bookings
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 9), "zstd": (1, 3, 9)}
+
+
+def best(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask("bench")
+    app.json = FastJSONProvider(app)
+    with app.app_context():
+        body = jsonify({"success": True, "data": bookings(args.bookings), "next_cursor": None}).get_data()
+    print(f"identity {len(body) / 1024:10.1f} KiB")
+
+    compressor = Compressor()
+    for encoding in compressor.encodings:
+        for level in LEVELS[encoding]:
+            compressor.levels[encoding] = level
+            elapsed, compressed = best(lambda: compressor.compress(body, encoding), args.repeats)
+            print(f"{encoding:<5} {level:2d} {len(compressed) / 1024:10.1f} KiB  {len(compressed) / len(body):6.1%}"
+                  f"  {elapsed * 1000:8.2f} ms  {len(body) / elapsed / 1e6:7.1f} MB/s")
+
+    compressor.variants.set('"bench"', "gzip", body, compressed)
+    elapsed, _ = best(lambda: compressor.variants.get('"bench"', "gzip", body), args.repeats)
+    print(f"cached variant lookup {elapsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Customer booking history: one JOIN endpoint vs. N+1 client requests.
+
+Creates a customer with --bookings bookings spread over --vehicles
+vehicles in the database configured in conn.py, then times building the
+customer's history page the way the portal did (GET the customer, GET
+their bookings, GET each booking's vehicle) and with one GET of
+/api/customer/{id}/bookings, through the Flask test client. The rows are
+deleted afterwards.
+
+    python benchmarks/history_bench.py --bookings 50
+    DB_BACKEND=sqlite:////tmp/carhire.db python benchmarks/history_bench.py
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+import warnings
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import jwt
+from api import app, db_pool, JWT_SECRET
+
+
+def setup(prefix, vehicles, bookings):
+    conn = db_pool.acquire()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT INTO customer (customer_name, email_address) VALUES (%s, %s)",
+                       ("History Bench", f"{prefix.lower()}@example.com"))
+        customer_id = cursor.lastrowid
+        regs = [f"{prefix}{i:03d}" for i in range(vehicles)]
+        cursor.executemany(
+            "INSERT INTO vehicle (reg_number, model_code, vehicle_category_description) VALUES (%s, 'BENCH', 'Bench')",
+            [(reg,) for reg in regs]
+        )
+        start = date(2030, 1, 1)
+        cursor.executemany(
+            "INSERT INTO booking (Customer_customer_id, Vehicle_reg_number, date_from, date_to, booking_status_code)"
+            " VALUES (%s, %s, %s, %s, 'PENDING')",
+            [(customer_id, regs[i % vehicles], start + timedelta(days=3 * i), start + timedelta(days=3 * i + 1))
+             for i in range(bookings)]
+        )
+        conn.commit()
+        return customer_id
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def cleanup(prefix, customer_id):
+    conn = db_pool.acquire()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM booking WHERE Customer_customer_id = %s", (customer_id,))
+        cursor.execute("DELETE FROM vehicle WHERE reg_number LIKE %s", (prefix + "%",))
+        cursor.execute("DELETE FROM customer WHERE customer_id = %s", (customer_id,))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def n_plus_one(client, headers, customer_id, limit):
+    assert client.get(f"/api/customer/{customer_id}", headers=headers).status_code == 200
+    bookings = client.get(f"/api/booking?Customer_customer_id={customer_id}&limit={limit}&total=none", headers=headers).json["data"]
+    for booking in bookings:
+        assert client.get(f"/api/vehicle/{booking['Vehicle_reg_number']}").status_code == 200
+    return len(bookings)
+
+
+def joined(client, headers, customer_id, limit):
+    return len(client.get(f"/api/customer/{customer_id}/bookings?limit={limit}&summary=true", headers=headers).json["data"])
+
+
+def time_requests(fn, repeat, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=50)
+    parser.add_argument("--vehicles", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    token = jwt.encode({"username": "bench", "role": "admin"}, JWT_SECRET, algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    client = app.test_client()
+    prefix = f"H{uuid.uuid4().hex[:4].upper()}"
+    customer_id = setup(prefix, args.vehicles, args.bookings)
+    try:
+        assert n_plus_one(client, headers, customer_id, args.bookings) == joined(client, headers, customer_id, args.bookings)
+        for name, fn in (("N+1 requests", n_plus_one), ("one JOIN", joined)):
+            p50, p99 = time_requests(fn, args.repeat, client, headers, customer_id, args.bookings)
+            print(f"{name:>14}: p50 {p50 * 1000:.2f} ms  p99 {p99 * 1000:.2f} ms")
+    finally:
+        cleanup(prefix, customer_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Encoding time of a large booking list, Flask's provider vs the fast one.
+
+Builds --bookings booking rows shaped like the /api/booking response
+(dict rows with dates, as the dictionary cursor returns them), encodes
+them with jsonify() under both providers, checks the bytes are
+identical, and reports the best of --repeats runs.
+
+    python benchmarks/json_bench.py --bookings 100000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flask import Flask, jsonify
+from json_provider import FastJSONProvider
+import json_provider
+
+
+def bookings(count):
+    start = date(2024, 1, 1)
+    return [{
+        "booking_id": i,
+        "date_from": start + timedelta(days=i % 365),
+        "date_to": start + timedelta(days=i % 365 + 3),
+        "Vehicle_reg_number": f"V{i % 5000:06d}",
+        "booking_status_code": "C",
+        "Customer_customer_id": i % 20000,
+    } for i in range(count)]
+
+
+def run(app, body, repeats):
+    timings = []
+    with app.app_context():
+        for _ in range(repeats):
+            start = time.perf_counter()
+            data = jsonify(body).get_data()
+            timings.append(time.perf_counter() - start)
+    return min(timings), data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    body = {"success": True, "data": bookings(args.bookings), "next_cursor": None}
+    default, fast = Flask("default"), Flask("fast")
+    fast.json = FastJSONProvider(fast)
+
+    flask_time, flask_data = run(default, body, args.repeats)
+    fast_time, fast_data = run(fast, body, args.repeats)
+    assert fast_data == flask_data, "outputs differ"
+    print(f"orjson installed: {json_provider.orjson is not None}, {len(flask_data) / 1e6:.1f} MB")
+    print(f"flask {flask_time * 1000:8.1f} ms")
+    print(f"fast  {fast_time * 1000:8.1f} ms  ({flask_time / fast_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Per-request cost of the metrics middleware and the metered cursors.
+
+Runs the same requests through the Flask app with metrics off (plain
+connections, hooks disabled) and on, against an in-memory SQLite database
+holding --vehicles vehicles, and reports the mean time per request (best
+of --repeats alternating runs).
+
+    python benchmarks/metrics_bench.py --requests 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import api
+from api import app
+from pool import ConnectionPool
+from storage import SQLiteStorage
+
+PATHS = ("/", "/api/vehicle?limit=100", "/api/vehicle/V000042")
+
+
+def seed(storage, count):
+    conn = storage.connect()
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO vehicle (reg_number, model_code, vehicle_category_description) VALUES (%s, %s, %s)",
+        [(f"V{i:06d}", "M1", "SUV") for i in range(count)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def run(client, path, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        assert client.get(path).status_code == 200
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--vehicles", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    storage = SQLiteStorage()
+    seed(storage, args.vehicles)
+    api.entity_cache.entities.clear()
+    client = app.test_client()
+    pools = {
+        "off": ConnectionPool(storage.connect),
+        "on": ConnectionPool(lambda: api.MeteredConnection(storage.connect(), api.metrics)),
+    }
+
+    for path in PATHS:
+        timings = {}
+        for mode in ("off", "on") * args.repeats:
+            api.db_pool = pools[mode]
+            api.metrics.enabled = mode == "on"
+            run(client, path, args.requests // 10)
+            timings.setdefault(mode, []).append(run(client, path, args.requests))
+        off, on = min(timings["off"]), min(timings["on"])
+        print(f"{path:<26} off {off:8.1f} us  on {on:8.1f} us  overhead {on - off:6.1f} us ({(on - off) / off:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Daily report: booking_daily summary vs. GROUP BY over the booking table.
+
+Loads a growing booking history into an embedded SQLite database with the
+app's schema, fills booking_daily with the migration's backfill, then
+times a 30-day daily report read from the summary and computed with a
+GROUP BY over booking JOIN vehicle, at each history size.
+
+    python benchmarks/report_bench.py --sizes 100000,1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from reports import backfill, daily_report
+from storage import SQLiteStorage
+
+CATEGORIES = ["Sedan", "SUV", "Hatchback", "Van", "Luxury"]
+STATUSES = ["PENDING", "CANCELLED"]
+START = date(2020, 1, 1)
+
+GROUP_BY = """
+    SELECT b.date_from, b.booking_status_code, v.vehicle_category_description, COUNT(*),
+           SUM(CAST(julianday(b.date_to) - julianday(b.date_from) AS INTEGER) + 1)
+    FROM booking b JOIN vehicle v ON v.reg_number = b.Vehicle_reg_number
+    WHERE b.date_from BETWEEN ? AND ?
+    GROUP BY b.date_from, b.booking_status_code, v.vehicle_category_description
+"""
+
+
+def load(db, rng, vehicles, first_id, count, days):
+    rows = []
+    for booking_id in range(first_id, first_id + count):
+        date_from = START + timedelta(days=rng.randrange(days))
+        rows.append((booking_id, 1, f"REG{rng.randrange(vehicles):07d}", date_from.isoformat(),
+                     (date_from + timedelta(days=rng.randint(0, 13))).isoformat(), rng.choice(STATUSES)))
+    db.executemany("INSERT INTO booking (booking_id, Customer_customer_id, Vehicle_reg_number, date_from, date_to,"
+                   " booking_status_code) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+
+def time_queries(fn, windows):
+    timings = []
+    for window in windows:
+        start = time.perf_counter()
+        fn(*window)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100000,1000000", help="comma-separated booking counts")
+    parser.add_argument("--vehicles", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=3650, help="days of history the bookings spread over")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    storage = SQLiteStorage()
+    conn = storage.connect()
+    db = conn._db
+    db.execute("INSERT INTO customer (customer_id, customer_name, email_address) VALUES (1, 'Bench', 'bench@example.com')")
+    db.executemany("INSERT INTO vehicle (reg_number, model_code, vehicle_category_description) VALUES (?, 'M1', ?)",
+                   [(f"REG{i:07d}", CATEGORIES[i % len(CATEGORIES)]) for i in range(args.vehicles)])
+    db.commit()
+
+    windows = []
+    for _ in range(args.queries):
+        first = START + timedelta(days=rng.randrange(args.days - 30))
+        windows.append((first.isoformat(), (first + timedelta(days=29)).isoformat()))
+
+    cursor = conn.cursor()
+    loaded = 0
+    for size in sorted(int(size) for size in args.sizes.split(",")):
+        load(db, rng, args.vehicles, loaded + 1, size - loaded, args.days)
+        loaded = size
+        db.execute("DELETE FROM booking_daily")
+        backfill(cursor)
+        conn.commit()
+
+        def via_summary(date_from, date_to):
+            return daily_report(cursor, date_from, date_to)
+
+        def via_group_by(date_from, date_to):
+            return db.execute(GROUP_BY, (date_from, date_to)).fetchall()
+
+        print(f"{size:,} bookings")
+        for name, fn in (("booking_daily", via_summary), ("GROUP BY booking", via_group_by)):
+            p50, p99 = time_queries(fn, windows)
+            print(f"{name:>22}: p50 {p50 * 1000:.3f} ms  p99 {p99 * 1000:.3f} ms")
+
+    conn.close()
+    storage.close()
+
+
+if __name__ == "__main__":
+    main()
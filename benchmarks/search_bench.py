@@ -0,0 +1,145 @@
+"""Customer search: in-process prefix/trigram index vs. SQL LIKE.
+
+Generates customers with realistic names and email addresses, then times
+a mix of search queries (name prefixes, full names, email prefixes and
+misspelt surnames) against CustomerSearchIndex and against LIKE prefix
+matches on an indexed in-memory SQLite database.
+
+    python benchmarks/search_bench.py --customers 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from search import CustomerSearchIndex
+
+FIRST = ("James Mary John Patricia Robert Jennifer Michael Linda William Elizabeth David Barbara Richard Susan "
+         "Joseph Jessica Thomas Sarah Charles Karen Christopher Nancy Daniel Lisa Matthew Betty Anthony Margaret "
+         "Mark Sandra Donald Ashley Steven Kimberly Paul Emily Andrew Donna Joshua Michelle Kenneth Carol Kevin "
+         "Amanda Brian Dorothy George Melissa Timothy Deborah Ronald Stephanie Edward Rebecca Jason Sharon Jeffrey "
+         "Laura Ryan Cynthia Jacob Kathleen Gary Amy Nicholas Angela Eric Shirley Jonathan Anna Stephen Brenda "
+         "Larry Pamela Justin Emma Scott Nicole Brandon Helen Benjamin Samantha Samuel Katherine Gregory Christine "
+         "Alexander Debra Frank Rachel Patrick Carolyn Raymond Janet Jack Catherine Dennis Maria Jerry Heather").split()
+LAST = ("Smith Johnson Williams Brown Jones Garcia Miller Davis Rodriguez Martinez Hernandez Lopez Gonzalez Wilson "
+        "Anderson Thomas Taylor Moore Jackson Martin Lee Perez Thompson White Harris Sanchez Clark Ramirez Lewis "
+        "Robinson Walker Young Allen King Wright Scott Torres Nguyen Hill Flores Green Adams Nelson Baker Hall "
+        "Rivera Campbell Mitchell Carter Roberts Gomez Phillips Evans Turner Diaz Parker Cruz Edwards Collins "
+        "Reyes Stewart Morris Morales Murphy Cook Rogers Gutierrez Ortiz Morgan Cooper Peterson Bailey Reed Kelly "
+        "Howard Ramos Kim Cox Ward Richardson Watson Brooks Chavez Wood James Bennett Gray Mendoza Ruiz Hughes "
+        "Price Alvarez Castillo Sanders Patel Myers Long Ross Foster Jimenez Powell Jenkins Perry Russell Sullivan "
+        "Bell Coleman Butler Henderson Barnes Gonzales Fisher Vasquez Simmons Romero Jordan Patterson Alexander "
+        "Hamilton Graham Reynolds Griffin Wallace Moreno West Cole Hayes Bryant Herrera Gibson Ellis Tran Medina "
+        "Aguilar Stevens Murray Ford Castro Marshall Owens Harrison Fernandez Mcdonald Woods Washington Kennedy").split()
+
+
+def generate(customers, seed):
+    rng = random.Random(seed)
+    rows = []
+    for customer_id in range(1, customers + 1):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        # A synthetic surname now and then keeps the vocabulary from being
+        # only the two lists above
+        if customer_id % 20 == 0:
+            last += "".join(rng.choice("aeiou" + "lmnrst") for _ in range(rng.randint(2, 4)))
+        email = f"{first[0].lower()}.{last.lower()}{rng.randint(1, 9999)}@example.com"
+        rows.append((customer_id, f"{first} {last}", email))
+    return rows
+
+
+def misspell(rng, word):
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + rng.choice("aeiou") + word[i + 1:]
+
+
+def make_queries(rng, rows, count):
+    queries = []
+    for i in range(count):
+        first, last = rng.choice(FIRST).lower(), rng.choice(LAST).lower()
+        kind = i % 4
+        if kind == 0:
+            queries.append(first[:rng.randint(1, 4)])
+        elif kind == 1:
+            queries.append(f"{first} {last[:rng.randint(2, len(last))]}")
+        elif kind == 2:
+            queries.append(rng.choice(rows)[2].partition("@")[0])
+        else:
+            queries.append(misspell(rng, last))
+    return queries
+
+
+def build_sqlite(rows):
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE customer (customer_id INTEGER PRIMARY KEY, customer_name TEXT COLLATE NOCASE, "
+               "email_address TEXT COLLATE NOCASE)")
+    db.executemany("INSERT INTO customer VALUES (?, ?, ?)", rows)
+    db.execute("CREATE INDEX idx_customer_name ON customer (customer_name)")
+    db.execute("CREATE INDEX idx_customer_email ON customer (email_address)")
+    db.commit()
+    return db
+
+
+def time_queries(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-sql", action="store_true", help="skip the SQLite comparison")
+    args = parser.parse_args()
+
+    rows = generate(args.customers, args.seed)
+    print(f"{len(rows)} customers")
+
+    start = time.perf_counter()
+    index = CustomerSearchIndex()
+    index.load(rows)
+    print(f"index build: {time.perf_counter() - start:.2f}s, {len(index.vocabulary)} distinct tokens")
+
+    queries = make_queries(random.Random(args.seed + 1), rows, args.queries)
+
+    def via_index(query):
+        return index.search(query, args.k)
+
+    # Prefix of the name or the email address; no ranking and no typo
+    # tolerance, so this is a lower bound on what SQL would have to do
+    def via_sql(query):
+        pattern = query + "%"
+        return db.execute(
+            "SELECT customer_id, customer_name, email_address FROM customer "
+            "WHERE customer_name LIKE ? OR email_address LIKE ? LIMIT ?",
+            (pattern, pattern, args.k)
+        ).fetchall()
+
+    timings = [("prefix/trigram index", via_index)]
+    if not args.no_sql:
+        db = build_sqlite(rows)
+        timings.append(("sqlite LIKE prefix", via_sql))
+    for name, fn in timings:
+        p50, p99 = time_queries(fn, queries)
+        print(f"{name:>20}: p50 {p50 * 1000:.3f} ms  p99 {p99 * 1000:.3f} ms")
+
+    writes = random.Random(args.seed + 2)
+    start = time.perf_counter()
+    for customer_id in range(args.customers + 1, args.customers + 1001):
+        first, last = writes.choice(FIRST), writes.choice(LAST) + "x" * writes.randint(0, 1)
+        index.put(customer_id, f"{first} {last}", f"{first.lower()}{customer_id}@example.com")
+    print(f"{'put':>20}: {(time.perf_counter() - start):.3f} ms per write")
+
+
+if __name__ == "__main__":
+    main()
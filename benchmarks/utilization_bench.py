@@ -0,0 +1,144 @@
+"""Fleet utilization: vectorized NumPy arrays vs. a row-by-row Python loop.
+
+Generates a fleet and a booking history (10M bookings by default), loads
+it into FleetArrays, then times utilization over random windows, the same
+windows after a stream of booking writes, and a plain Python loop over the
+booking rows that computes the same figures for one window.
+
+    python benchmarks/utilization_bench.py --vehicles 100000 --bookings-per-vehicle 100
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utilization import FleetArrays
+
+CATEGORIES = ["Sedan", "SUV", "Hatchback", "Van", "Luxury"]
+START = date(2020, 1, 1).toordinal()
+
+
+# Back-to-back bookings per vehicle with random gaps, generated a vehicle
+# column at a time so ten million of them fit in a few hundred megabytes
+def generate(vehicles, bookings_per_vehicle, seed):
+    rng = np.random.default_rng(seed)
+    fleet = [(f"REG{i:07d}", CATEGORIES[i % len(CATEGORIES)]) for i in range(vehicles)]
+    gaps = rng.integers(0, 10, size=(bookings_per_vehicle, vehicles), dtype=np.int32)
+    lengths = rng.integers(1, 14, size=(bookings_per_vehicle, vehicles), dtype=np.int32)
+    ends = START + np.cumsum(gaps + lengths, axis=0, dtype=np.int32)
+    starts = ends - lengths + 1
+    return fleet, starts.T.ravel(), ends.T.ravel()
+
+
+def rows(fleet, starts, ends, bookings_per_vehicle):
+    days = {}
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        date_from = days.get(start) or days.setdefault(start, date.fromordinal(start))
+        date_to = days.get(end) or days.setdefault(end, date.fromordinal(end))
+        yield i + 1, fleet[i // bookings_per_vehicle][0], date_from, date_to, "CONFIRMED"
+
+
+# The same figures, one booking at a time
+def row_by_row(fleet, bookings, first, last):
+    covered = {reg_number: set() for reg_number, _ in fleet}
+    for _, reg_number, date_from, date_to, _ in bookings:
+        start, end = max(date_from.toordinal(), first), min(date_to.toordinal(), last)
+        if start <= end:
+            covered[reg_number].update(range(start, end + 1))
+    daily = [0] * (last - first + 1)
+    gaps = longest = 0
+    for days in covered.values():
+        run = 0
+        for day in range(first, last + 2):
+            if day in days:
+                daily[day - first] += 1
+            if day in days or day > last:
+                if run:
+                    gaps += 1
+                    longest = max(longest, run)
+                run = 0
+            else:
+                run += 1
+    return sum(map(len, covered.values())), gaps, longest, max(daily)
+
+
+def time_queries(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(*query)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vehicles", type=int, default=100000)
+    parser.add_argument("--bookings-per-vehicle", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--writes", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-baseline", action="store_true", help="skip the row-by-row comparison")
+    args = parser.parse_args()
+
+    fleet, starts, ends = generate(args.vehicles, args.bookings_per_vehicle, args.seed)
+    print(f"{len(fleet)} vehicles, {len(starts)} bookings")
+
+    start = time.perf_counter()
+    arrays = FleetArrays(inactive_statuses=[])
+    arrays.load(fleet, rows(fleet, starts, ends, args.bookings_per_vehicle))
+    print(f"arrays build: {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(args.seed + 1)
+    span = int(ends.max()) - START
+    queries = []
+    for i in range(args.queries):
+        first = START + rng.randint(0, span - 30)
+        length = (7, 30, 90, 365)[i % 4]
+        queries.append((date.fromordinal(first), date.fromordinal(min(first + length - 1, START + span)),
+                        rng.choice(CATEGORIES) if i % 2 else None))
+
+    def via_arrays(date_from, date_to, category):
+        return arrays.utilization(date_from, date_to, category)
+
+    p50, p99 = time_queries(via_arrays, queries)
+    print(f"{'numpy':>22}: p50 {p50 * 1000:.3f} ms  p99 {p99 * 1000:.3f} ms")
+
+    # Moves and new bookings land in the unsorted tail, which queries sort
+    start = time.perf_counter()
+    booking_id = len(starts)
+    for _ in range(args.writes):
+        day = START + rng.randint(0, span)
+        if rng.random() < 0.5:
+            booking_id += 1
+            target, reg_number = booking_id, rng.choice(fleet)[0]
+        else:
+            target, reg_number = rng.randint(1, len(starts)), None
+        arrays.put_booking(target, reg_number, date.fromordinal(day), date.fromordinal(day + rng.randint(0, 13)))
+    print(f"{'put_booking':>22}: {(time.perf_counter() - start) * 1e6 / args.writes:.1f} us per write, "
+          f"{len(arrays.tail)} in the tail")
+    p50, p99 = time_queries(via_arrays, queries)
+    print(f"{'numpy after writes':>22}: p50 {p50 * 1000:.3f} ms  p99 {p99 * 1000:.3f} ms")
+
+    if not args.no_baseline:
+        date_from, date_to, _ = queries[1]
+        start = time.perf_counter()
+        booked, gaps, longest, peak = row_by_row(fleet, rows(fleet, starts, ends, args.bookings_per_vehicle),
+                                                 date_from.toordinal(), date_to.toordinal())
+        elapsed = time.perf_counter() - start
+        arrays.load(fleet, rows(fleet, starts, ends, args.bookings_per_vehicle))
+        expected = arrays.utilization(date_from, date_to)["fleet"]
+        assert (booked, gaps, longest, peak) == (expected["booked_days"], expected["idle_gaps"],
+                                                 expected["longest_idle_gap"], expected["peak_concurrent"])
+        print(f"{'row-by-row python':>22}: {elapsed * 1000:.0f} ms for one {(date_to - date_from).days + 1}-day window")
+
+
+if __name__ == "__main__":
+    main()
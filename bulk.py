@@ -0,0 +1,142 @@
+from mysql.connector import errorcode
+from mysql.connector.errors import IntegrityError
+from conn import BULK_CONFIG
+from validation import customer_error, vehicle_error
+
+# Bulk creation of customers and vehicles.
+#
+# Records are validated with the single-row rules, checked for duplicates
+# (within the request and against the table, by the primary key), then
+# inserted chunk by chunk with executemany, which mysql.connector sends as
+# one multi-row INSERT per chunk. In partial mode each chunk is committed
+# on its own; in atomic mode nothing is written unless every record can be.
+
+BULK_TABLES = {
+    # Customers get an AUTO_INCREMENT key on insert, so there is nothing
+    # to check duplicates against; like POST /api/customer, every valid
+    # record is created.
+    "customer": {
+        "key": None,
+        "validate": customer_error,
+        "insert": "INSERT INTO customer (customer_name, email_address, phone_number, address) VALUES (%s, %s, %s, %s)",
+        "values": lambda d: (d["customer_name"], d["email_address"], d.get("phone_number", ""), d.get("address", "")),
+    },
+    "vehicle": {
+        "key": "reg_number",
+        "validate": vehicle_error,
+        "insert": "INSERT INTO vehicle (reg_number, model_code, current_mileage, engine_size, vehicle_category_description) VALUES (%s, %s, %s, %s, %s)",
+        "values": lambda d: (d["reg_number"], d["model_code"], d.get("current_mileage", 0), d.get("engine_size", 0), d["vehicle_category_description"]),
+    },
+}
+
+MODES = ("partial", "atomic")
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _existing_keys(cursor, table, key, values):
+    cursor.execute(
+        f"SELECT {key} FROM {table} WHERE {key} IN ({', '.join(['%s'] * len(values))})",
+        tuple(values)
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+def _result(index, key, status, error=None):
+    result = {"index": index, "key": key, "status": status}
+    if error:
+        result["error"] = error
+    return result
+
+# Insert rows one at a time after a chunk insert failed, so the failure is
+# pinned to the records that caused it.
+def _insert_one_by_one(conn, cursor, spec, rows, results):
+    for index, key, values in rows:
+        try:
+            cursor.execute(spec["insert"], values)
+            conn.commit()
+            results[index] = _result(index, key, "created")
+        except IntegrityError as e:
+            conn.rollback()
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                results[index] = _result(index, key, "duplicate")
+            else:
+                results[index] = _result(index, key, "invalid", e.msg)
+
+# Returns the per-record results, in request order. Every record ends up
+# created, duplicate, invalid, or (atomic mode only) skipped because
+# another record failed.
+def bulk_insert(conn, table, records, atomic=False, chunk_size=None):
+    spec = BULK_TABLES[table]
+    chunk_size = chunk_size or BULK_CONFIG["chunk_size"]
+    results = [None] * len(records)
+
+    candidates = []
+    seen = set()
+    for index, record in enumerate(records):
+        error = spec["validate"](record) if isinstance(record, dict) else "Record must be an object"
+        key = record.get(spec["key"]) if isinstance(record, dict) and spec["key"] else None
+        if error:
+            results[index] = _result(index, key, "invalid", error)
+        elif key is not None and key in seen:
+            results[index] = _result(index, key, "duplicate")
+        else:
+            seen.add(key)
+            candidates.append((index, key, spec["values"](record)))
+
+    def abort():
+        conn.rollback()
+        for index, key, _ in candidates:
+            if results[index] is None or results[index]["status"] == "created":
+                results[index] = _result(index, key, "skipped")
+        return results
+
+    if atomic and len(candidates) < len(records):
+        return abort()
+
+    cursor = conn.cursor()
+    try:
+        for chunk in _chunks(candidates, chunk_size):
+            existing = _existing_keys(cursor, table, spec["key"], [key for _, key, _ in chunk]) if spec["key"] else set()
+            rows = []
+            for index, key, values in chunk:
+                if key in existing:
+                    results[index] = _result(index, key, "duplicate")
+                else:
+                    rows.append((index, key, values))
+            if atomic and len(rows) < len(chunk):
+                return abort()
+            if not rows:
+                continue
+
+            try:
+                cursor.executemany(spec["insert"], [values for _, _, values in rows])
+            except IntegrityError:
+                # A concurrent writer created one of the keys after the check
+                if atomic:
+                    conn.rollback()
+                    existing = _existing_keys(cursor, table, spec["key"], [key for _, key, _ in rows]) if spec["key"] else set()
+                    for index, key, _ in rows:
+                        if key in existing:
+                            results[index] = _result(index, key, "duplicate")
+                    return abort()
+                conn.rollback()
+                _insert_one_by_one(conn, cursor, spec, rows, results)
+                continue
+
+            for index, key, _ in rows:
+                results[index] = _result(index, key, "created")
+            if not atomic:
+                conn.commit()
+        if atomic:
+            conn.commit()
+    finally:
+        cursor.close()
+    return results
+
+def summarize(results):
+    counts = {"created": 0, "duplicate": 0, "invalid": 0, "skipped": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return counts
@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import MagicMock
+from mysql.connector import errorcode
+from mysql.connector.errors import IntegrityError
+from bulk import bulk_insert, summarize
+
+VEHICLES = [
+    {"reg_number": "A1", "model_code": "M", "vehicle_category_description": "SUV"},
+    {"reg_number": "A2", "model_code": "M", "vehicle_category_description": "SUV"},
+    {"reg_number": "A1", "model_code": "M", "vehicle_category_description": "SUV"},
+    {"reg_number": "A3"},
+    {"reg_number": "A4", "model_code": "M", "vehicle_category_description": "SUV"},
+]
+
+def make_conn(existing=()):
+    """Connection whose key lookup reports `existing` as already stored."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.fetchall.return_value = [(key,) for key in existing]
+    return conn, cursor
+
+def statuses(results):
+    return [result["status"] for result in results]
+
+def test_partial_mode_reports_each_record():
+    """Test that partial mode creates what it can and explains the rest."""
+    conn, cursor = make_conn(existing=["A4"])
+    results = bulk_insert(conn, "vehicle", VEHICLES)
+    assert statuses(results) == ["created", "created", "duplicate", "invalid", "duplicate"]
+    assert "required" in results[3]["error"]
+    rows = cursor.executemany.call_args.args[1]
+    assert rows == [("A1", "M", 0, 0, "SUV"), ("A2", "M", 0, 0, "SUV")]
+    conn.commit.assert_called_once()
+
+def test_chunks_are_committed_separately():
+    """Test that each chunk is one executemany and one commit in partial mode."""
+    conn, cursor = make_conn()
+    records = [{"reg_number": f"R{i}", "model_code": "M", "vehicle_category_description": "SUV"} for i in range(5)]
+    results = bulk_insert(conn, "vehicle", records, chunk_size=2)
+    assert summarize(results)["created"] == 5
+    assert cursor.executemany.call_count == 3
+    assert conn.commit.call_count == 3
+
+def test_atomic_mode_writes_nothing_on_failure():
+    """Test that atomic mode rejects the whole batch if one record is bad."""
+    conn, cursor = make_conn()
+    results = bulk_insert(conn, "vehicle", VEHICLES, atomic=True)
+    assert statuses(results) == ["skipped", "skipped", "duplicate", "invalid", "skipped"]
+    cursor.executemany.assert_not_called()
+    conn.commit.assert_not_called()
+
+def test_atomic_mode_single_commit():
+    """Test that a clean atomic batch is committed once after all chunks."""
+    conn, cursor = make_conn()
+    records = [{"customer_name": f"C{i}", "email_address": f"c{i}@example.com"} for i in range(3)]
+    results = bulk_insert(conn, "customer", records, atomic=True, chunk_size=2)
+    assert statuses(results) == ["created"] * 3
+    assert cursor.executemany.call_count == 2
+    conn.commit.assert_called_once()
+
+def test_customers_are_not_deduplicated_by_email():
+    """Test that customers sharing an email address are all created, as by POST /api/customer."""
+    conn, cursor = make_conn()
+    records = [{"customer_name": f"C{i}", "email_address": "same@example.com"} for i in range(2)]
+    assert statuses(bulk_insert(conn, "customer", records)) == ["created", "created"]
+    cursor.execute.assert_not_called()
+
+def test_concurrent_duplicate_falls_back_to_single_rows():
+    """Test that a chunk failing on a racing duplicate is retried row by row."""
+    conn, cursor = make_conn()
+    cursor.executemany.side_effect = IntegrityError(msg="Duplicate entry", errno=errorcode.ER_DUP_ENTRY)
+    cursor.execute.side_effect = [None, None, IntegrityError(msg="Duplicate entry", errno=errorcode.ER_DUP_ENTRY)]
+    records = [{"reg_number": f"R{i}", "model_code": "M", "vehicle_category_description": "SUV"} for i in range(2)]
+    results = bulk_insert(conn, "vehicle", records)
+    assert statuses(results) == ["created", "duplicate"]
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,312 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+MISSING = object()
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU map whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries=10000, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared backends hold entries for all worker processes and carry an
+# invalidation log every worker polls to drop its own stale local entries.
+# Values are pickled, so a backend must only be reachable by this app.
+
+class SQLiteBackend:
+    """Shared cache in a local SQLite file, for workers on one host.
+
+    A stand-in for Redis when developing or benchmarking locally.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS cache_entry (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS cache_invalidation (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, at REAL)")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def get(self, key):
+        row = self._db().execute("SELECT value, expires FROM cache_entry WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return MISSING
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        self._db().execute(
+            "INSERT OR REPLACE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value), time.time() + ttl)
+        )
+
+    def delete(self, key):
+        self._db().execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+
+    def publish(self, key):
+        db = self._db()
+        now = time.time()
+        db.execute("INSERT INTO cache_invalidation (key, at) VALUES (?, ?)", (key, now))
+        db.execute("DELETE FROM cache_invalidation WHERE at < ?", (now - 3600,))
+
+    # Returns (position, keys invalidated after `position`). A position of
+    # None starts from the end of the log.
+    def poll(self, position):
+        db = self._db()
+        if position is None:
+            return db.execute("SELECT COALESCE(MAX(id), 0) FROM cache_invalidation").fetchone()[0], []
+        rows = db.execute("SELECT id, key FROM cache_invalidation WHERE id > ? ORDER BY id", (position,)).fetchall()
+        if not rows:
+            return position, []
+        return rows[-1][0], [key for _, key in rows]
+
+
+class RedisBackend:
+    """Shared cache in Redis. Invalidations go through a capped stream."""
+
+    STREAM = "carhire:cache:invalidations"
+
+    def __init__(self, url):
+        if redis is None:
+            raise Exception("The redis package is required for a redis:// cache backend")
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._redis.get(key)
+        return MISSING if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl):
+        self._redis.set(key, pickle.dumps(value), px=int(ttl * 1000))
+
+    def delete(self, key):
+        self._redis.delete(key)
+
+    def publish(self, key):
+        self._redis.xadd(self.STREAM, {"key": key}, maxlen=100000, approximate=True)
+
+    def poll(self, position):
+        if position is None:
+            return self._last_id(), []
+        entries = self._redis.xread({self.STREAM: position}, count=10000)
+        if not entries:
+            return position, []
+        messages = entries[0][1]
+        return messages[-1][0], [fields[b"key"].decode() for _, fields in messages]
+
+    def _last_id(self):
+        last = self._redis.xrevrange(self.STREAM, count=1)
+        return last[0][0] if last else "0"
+
+
+def make_backend(url):
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise Exception(f"Unsupported cache backend: {url}")
+
+
+class InvalidationFeed:
+    """Reads a shared backend's invalidation log on behalf of one process.
+
+    poll() returns (reset, keys): the keys published by any worker since
+    the previous call, checked at most every `poll_interval` seconds.
+    `reset` is True in a freshly forked worker, whose local state was
+    copied from its parent and cannot be trusted.
+    """
+
+    def __init__(self, backend, poll_interval=1.0):
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._position = None
+        self._polled_at = 0.0
+        self._pid = os.getpid()
+
+    def poll(self):
+        now = time.monotonic()
+        reset = False
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._position = None
+                reset = True
+            if now - self._polled_at < self.poll_interval:
+                return reset, []
+            self._polled_at = now
+            position = self._position
+        position, keys = self.backend.poll(position)
+        with self._lock:
+            self._position = position
+        return reset, keys
+
+
+class EntityCache:
+    """Read-through cache for single-entity lookups.
+
+    Entries live in a per-process LRU and, when a shared backend is
+    configured, in the backend too. invalidate() removes an entry from both
+    and publishes it so other workers drop their local copy; each worker
+    applies published invalidations at most `poll_interval` seconds late.
+    """
+
+    def __init__(self, entities, max_entries=10000, ttl=60.0, backend=None, poll_interval=1.0):
+        self.entities = set(entities)
+        self.ttl = ttl
+        self.local = LRUCache(max_entries, ttl)
+        self.backend = backend
+        self.feed = InvalidationFeed(backend, poll_interval) if backend is not None else None
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.counters = {"hits": 0, "shared_hits": 0, "misses": 0, "invalidations": 0, "backend_errors": 0}
+
+    def enabled(self, entity):
+        return entity in self.entities
+
+    @staticmethod
+    def key(entity, key):
+        return f"{entity}:{key}"
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _sync(self):
+        if self.feed is None:
+            return
+        try:
+            reset, keys = self.feed.poll()
+        except Exception:
+            self._count("backend_errors")
+            return
+        if reset or keys:
+            with self._lock:
+                self.generation += 1
+        if reset:
+            self.local.clear()
+        for key in keys:
+            self.local.delete(key)
+
+    def get(self, entity, key):
+        if not self.enabled(entity):
+            return MISSING
+        self._sync()
+        key = self.key(entity, key)
+        value = self.local.get(key)
+        if value is not MISSING:
+            self._count("hits")
+            return value
+        if self.backend is not None:
+            try:
+                value = self.backend.get(key)
+            except Exception:
+                self._count("backend_errors")
+                value = MISSING
+            if value is not MISSING:
+                self._count("shared_hits")
+                self.local.set(key, value)
+                return value
+        self._count("misses")
+        return MISSING
+
+    # Pass the `generation` read before loading `value` from the database:
+    # if an invalidation happened since, the value may be stale and is not
+    # cached.
+    def set(self, entity, key, value, generation=None):
+        if not self.enabled(entity):
+            return
+        if generation is not None and generation != self.generation:
+            return
+        key = self.key(entity, key)
+        self.local.set(key, value)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, self.ttl)
+            except Exception:
+                self._count("backend_errors")
+
+    def invalidate(self, entity, key):
+        if not self.enabled(entity):
+            return
+        key = self.key(entity, key)
+        with self._lock:
+            self.generation += 1
+        self.local.delete(key)
+        self._count("invalidations")
+        if self.backend is not None:
+            try:
+                self.backend.delete(key)
+                self.backend.publish(key)
+            except Exception:
+                self._count("backend_errors")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats.update({
+            "entities": sorted(self.entities),
+            "size": len(self.local),
+            "max_entries": self.local.max_entries,
+            "evictions": self.local.evictions,
+            "expirations": self.local.expirations,
+            "backend": type(self.backend).__name__ if self.backend else None,
+        })
+        lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+        return stats
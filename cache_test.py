@@ -0,0 +1,71 @@
+import pytest
+from unittest.mock import patch
+from cache import MISSING, LRUCache, SQLiteBackend, EntityCache, make_backend
+
+def test_lru_evicts_least_recently_used():
+    """Test that the oldest untouched entry is evicted when full."""
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.evictions == 1
+
+def test_lru_entries_expire():
+    """Test that entries are dropped once their TTL has passed."""
+    cache = LRUCache(max_entries=2, ttl=10)
+    with patch("cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("cache.time.monotonic", return_value=111.0):
+        assert cache.get("a") is MISSING
+    assert cache.expirations == 1
+
+def test_entity_cache_counts_hits_and_misses():
+    """Test read-through counters and the hit rate."""
+    cache = EntityCache(["vehicle"])
+    assert cache.get("vehicle", "ABC123") is MISSING
+    cache.set("vehicle", "ABC123", {"reg_number": "ABC123"})
+    assert cache.get("vehicle", "ABC123") == {"reg_number": "ABC123"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+def test_entity_cache_disabled_entity():
+    """Test that entity types not switched on are never cached."""
+    cache = EntityCache(["vehicle"])
+    cache.set("customer", 1, {"customer_id": 1})
+    assert cache.get("customer", 1) is MISSING
+    assert cache.stats()["misses"] == 0
+
+def test_stale_load_is_not_cached():
+    """Test that a value read before an invalidation is not stored."""
+    cache = EntityCache(["booking"])
+    generation = cache.generation
+    cache.invalidate("booking", 1)
+    cache.set("booking", 1, {"booking_id": 1}, generation)
+    assert cache.get("booking", 1) is MISSING
+
+def test_invalidation_reaches_other_workers(tmp_path):
+    """Test that an invalidation in one worker evicts the entry in another."""
+    path = str(tmp_path / "cache.db")
+    worker_a = EntityCache(["customer"], backend=SQLiteBackend(path), poll_interval=0)
+    worker_b = EntityCache(["customer"], backend=SQLiteBackend(path), poll_interval=0)
+    worker_b.get("customer", 1)
+
+    worker_a.set("customer", 1, {"customer_id": 1, "customer_name": "Old"})
+    assert worker_b.get("customer", 1) == {"customer_id": 1, "customer_name": "Old"}
+    assert worker_b.stats()["shared_hits"] == 1
+
+    worker_a.invalidate("customer", 1)
+    assert worker_b.get("customer", 1) is MISSING
+
+def test_make_backend():
+    """Test backend selection from the configured URL."""
+    assert make_backend("") is None
+    assert isinstance(make_backend("sqlite:////tmp/cache.db"), SQLiteBackend)
+    with pytest.raises(Exception):
+        make_backend("memcached://localhost")
+
+if __name__ == "__main__":
+    pytest.main()
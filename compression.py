@@ -0,0 +1,181 @@
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content-Encoding negotiation for responses (see compress_response).
+#
+# gzip is always available; br and zstd are offered when the optional
+# brotli / zstandard packages are installed. Buffered responses smaller
+# than `min_size` are sent as they are, since the headers and CPU cost
+# outweigh the saving. Streamed responses (exports) are compressed chunk
+# by chunk as they are sent.
+#
+# Responses that carry an ETag are cacheable, so their compressed bodies
+# are kept in a size-bounded LRU and reused while the body is unchanged.
+# A compressed response gets a weak ETag, as it is a different byte
+# representation of the same resource; If-None-Match still matches it.
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+# Encoding name -> compressor class, in order of preference when the
+# client accepts several with the same quality
+def available_encodings():
+    encodings = {}
+    if brotli is not None:
+        encodings["br"] = _Brotli
+    if zstandard is not None:
+        encodings["zstd"] = _Zstd
+    encodings["gzip"] = _Gzip
+    return encodings
+
+
+class VariantCache:
+    """Size-bounded LRU of compressed bodies, keyed by ETag and encoding.
+
+    Each entry remembers the length and CRC32 of the body it was made
+    from, so a reused ETag (another database, a reset version counter)
+    never serves a stale variant.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag, encoding, body):
+        with self._lock:
+            entry = self._entries.get((etag, encoding))
+            if entry is not None:
+                self._entries.move_to_end((etag, encoding))
+        if entry is not None and entry[0] == len(body) and entry[1] == zlib.crc32(body):
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        return None
+
+    def set(self, etag, encoding, body, compressed):
+        if len(compressed) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop((etag, encoding), None)
+            if old is not None:
+                self._size -= len(old[2])
+            self._entries[(etag, encoding)] = (len(body), zlib.crc32(body), compressed)
+            self._size += len(compressed)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted[2])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+def _stream(chunks, compressor):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+class Compressor:
+    """Compresses Flask responses according to the request's Accept-Encoding."""
+
+    def __init__(self, min_size=1024, levels=None, cache_bytes=32 * 1024 * 1024):
+        self.min_size = min_size
+        self.levels = {"gzip": 6, "br": 4, "zstd": 3, **(levels or {})}
+        self.encodings = available_encodings()
+        self.variants = VariantCache(cache_bytes)
+
+    def _compressible(self, response):
+        if response.status_code != 200 or "Content-Encoding" in response.headers:
+            return False
+        if "no-transform" in response.headers.get("Cache-Control", ""):
+            return False
+        return response.mimetype.startswith(COMPRESSIBLE_TYPES)
+
+    def compress(self, data, encoding):
+        compressor = self.encodings[encoding](self.levels[encoding])
+        return compressor.compress(data) + compressor.flush()
+
+    def compress_response(self, request, response):
+        if not self._compressible(response):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = request.accept_encodings.best_match(list(self.encodings))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = _stream(response.response, self.encodings[encoding](self.levels[encoding]))
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            etag, weak = response.get_etag()
+            compressed = self.variants.get(etag, encoding, body) if etag else None
+            if compressed is None:
+                compressed = self.compress(body, encoding)
+                if etag:
+                    self.variants.set(etag, encoding, body, compressed)
+            response.set_data(compressed)
+            if etag and not weak:
+                response.set_etag(etag, weak=True)
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,74 @@
+import gzip
+import pytest
+import api
+from api import app
+from cache import EntityCache
+from compression import Compressor, VariantCache
+from pool import ConnectionPool
+from storage import SQLiteStorage
+
+@pytest.fixture
+def client(monkeypatch):
+    """Test client against an embedded database holding 200 vehicles."""
+    storage = SQLiteStorage()
+    conn = storage.connect()
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO vehicle (reg_number, model_code, vehicle_category_description) VALUES (%s, %s, %s)",
+        [(f"V{i:05d}", "M1", "SUV") for i in range(200)]
+    )
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(api, "db_pool", ConnectionPool(storage.connect, max_size=2))
+    monkeypatch.setattr(api, "entity_cache", EntityCache(["customer", "vehicle", "booking", "booking_status"]))
+    monkeypatch.setattr(api, "compressor", Compressor(min_size=1024))
+    with app.test_client() as client:
+        yield client
+    api.db_pool.close_all()
+    storage.close()
+
+def test_list_is_gzipped_and_revalidates(client):
+    """Test a large list response: gzip, Vary, weak ETag that still gives 304."""
+    plain = client.get("/api/vehicle?limit=100")
+    response = client.get("/api/vehicle?limit=100", headers={"Accept-Encoding": "br;q=0.5, gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+    assert response.content_length < len(plain.get_data()) / 4
+
+    etag = response.headers["ETag"]
+    assert etag == "W/" + plain.headers["ETag"]
+    revalidated = client.get("/api/vehicle?limit=100", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert revalidated.status_code == 304
+
+def test_threshold_and_refused_encodings(client):
+    """Test that small bodies and clients that refuse gzip get identity."""
+    small = client.get("/api/vehicle/V00001", headers={"Accept-Encoding": "gzip"})
+    assert small.status_code == 200 and "Content-Encoding" not in small.headers
+    refused = client.get("/api/vehicle?limit=100", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "Content-Encoding" not in refused.headers
+
+def test_streamed_export_is_compressed(client):
+    """Test that a chunked export is compressed as it streams."""
+    plain = client.get("/api/vehicle/export?format=csv").get_data()
+    response = client.get("/api/vehicle/export?format=csv", headers={"Accept-Encoding": "gzip"})
+    assert response.is_streamed
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.get_data()) == plain
+
+def test_variants_are_reused_until_the_body_changes(client):
+    """Test that a cached compressed body is served again, but never for a different body."""
+    for _ in range(3):
+        client.get("/api/vehicle?limit=100", headers={"Accept-Encoding": "gzip"})
+    variants = api.compressor.variants
+    assert (variants.misses, variants.hits) == (1, 2)
+
+    cache = VariantCache(max_bytes=10)
+    cache.set('"v1"', "gzip", b"body one", b"12345")
+    assert cache.get('"v1"', "gzip", b"body one") == b"12345"
+    assert cache.get('"v1"', "gzip", b"body two") is None
+    cache.set('"v2"', "gzip", b"other", b"6789012")
+    assert cache.get('"v1"', "gzip", b"body one") is None
+
+if __name__ == "__main__":
+    pytest.main()
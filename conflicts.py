@@ -0,0 +1,66 @@
+from datetime import datetime
+from conn import AVAILABILITY_CONFIG, BOOKING_CONFIG
+
+# Double-booking checks for booking writes.
+#
+# Writers for the same vehicle are serialised by a row lock on the vehicle
+# (SELECT ... FOR UPDATE), so two requests cannot both pass the overlap
+# check and then insert. Bookings are capped at BOOKING_CONFIG["max_days"],
+# which lets the overlap query bound date_from on both sides and stay a
+# short range scan of the (Vehicle_reg_number, date_from, date_to) index
+# instead of reading the vehicle's whole history.
+
+
+def booking_period_error(date_from, date_to):
+    days = (datetime.strptime(date_to, '%Y-%m-%d') - datetime.strptime(date_from, '%Y-%m-%d')).days
+    if days < 0:
+        return "date_to must not be before date_from"
+    if days > BOOKING_CONFIG["max_days"]:
+        return f"Bookings cannot be longer than {BOOKING_CONFIG['max_days']} days"
+    return None
+
+def is_blocking_status(status):
+    return status not in AVAILABILITY_CONFIG["inactive_statuses"]
+
+# Lock the vehicle row until the transaction ends. Returns False if the
+# vehicle does not exist.
+def lock_vehicle(cursor, reg_number):
+    cursor.execute("SELECT reg_number FROM vehicle WHERE reg_number = %s FOR UPDATE", (reg_number,))
+    return cursor.fetchone() is not None
+
+# Lock a booking and its vehicle, vehicle first as create_booking does, so
+# writers on the same vehicle always take the locks in one order. Returns
+# the booking's (Vehicle_reg_number, date_from, date_to,
+# booking_status_code), or None if it does not exist.
+def lock_booking(cursor, booking_id):
+    cursor.execute("SELECT Vehicle_reg_number FROM booking WHERE booking_id = %s", (booking_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    lock_vehicle(cursor, row[0])
+    cursor.execute(
+        "SELECT Vehicle_reg_number, date_from, date_to, booking_status_code FROM booking WHERE booking_id = %s FOR UPDATE",
+        (booking_id,)
+    )
+    return cursor.fetchone()
+
+# IDs of active bookings of `reg_number` overlapping [date_from, date_to]
+# (inclusive). A locking read, so it sees bookings committed after this
+# transaction's snapshot was taken.
+def find_conflicts(cursor, reg_number, date_from, date_to, exclude=None):
+    inactive = AVAILABILITY_CONFIG["inactive_statuses"]
+    query = (
+        "SELECT booking_id FROM booking"
+        " WHERE Vehicle_reg_number = %s"
+        " AND date_from BETWEEN DATE_SUB(%s, INTERVAL %s DAY) AND %s"
+        " AND date_to >= %s"
+    )
+    params = [reg_number, date_from, BOOKING_CONFIG["max_days"], date_to, date_from]
+    if inactive:
+        query += f" AND booking_status_code NOT IN ({', '.join(['%s'] * len(inactive))})"
+        params.extend(inactive)
+    if exclude is not None:
+        query += " AND booking_id <> %s"
+        params.append(exclude)
+    cursor.execute(query + " LOCK IN SHARE MODE", tuple(params))
+    return [row["booking_id"] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
@@ -0,0 +1,42 @@
+import pytest
+from unittest.mock import MagicMock
+from conflicts import booking_period_error, find_conflicts, lock_vehicle, lock_booking
+
+def test_booking_period_error():
+    """Test that inverted and over-long booking periods are rejected."""
+    assert booking_period_error("2023-01-01", "2023-01-01") is None
+    assert "before" in booking_period_error("2023-01-02", "2023-01-01")
+    assert "longer" in booking_period_error("2023-01-01", "2025-01-01")
+
+def test_find_conflicts_bounded_range_query():
+    """Test that the overlap query bounds date_from on both sides and skips inactive bookings."""
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [(4,)]
+
+    assert find_conflicts(cursor, "ABC123", "2023-01-01", "2023-01-10", exclude=2) == [4]
+
+    query, params = cursor.execute.call_args.args
+    assert query == (
+        "SELECT booking_id FROM booking WHERE Vehicle_reg_number = %s"
+        " AND date_from BETWEEN DATE_SUB(%s, INTERVAL %s DAY) AND %s AND date_to >= %s"
+        " AND booking_status_code NOT IN (%s) AND booking_id <> %s LOCK IN SHARE MODE"
+    )
+    assert params == ("ABC123", "2023-01-01", 365, "2023-01-10", "2023-01-01", "CANCELLED", 2)
+
+def test_lock_vehicle_missing():
+    """Test that locking a vehicle that does not exist reports False."""
+    cursor = MagicMock()
+    cursor.fetchone.return_value = None
+    assert not lock_vehicle(cursor, "NOPE")
+
+def test_lock_booking_locks_vehicle_first():
+    """Test that the vehicle row is locked before the booking row, as on create."""
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = [("ABC123",), ("ABC123",), ("ABC123", "2030-01-01", "2030-01-02", "PENDING")]
+    assert lock_booking(cursor, 7)[3] == "PENDING"
+    queries = [c.args[0] for c in cursor.execute.call_args_list]
+    assert "FOR UPDATE" not in queries[0]
+    assert queries[1].startswith("SELECT reg_number FROM vehicle") and queries[2].endswith("FOR UPDATE")
+
+if __name__ == "__main__":
+    pytest.main()
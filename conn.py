@@ -6,3 +6,174 @@ DB_CONFIG = {
     "password": os.environ.get("DB_PASSWORD", "pael"),
     "database": os.environ.get("DB_DATABASE", "carhire"),
 }
+
+# Storage backend (see storage.py): "mysql" for the server in DB_CONFIG,
+# or sqlite:///path/to/carhire.db / sqlite:///:memory: for an embedded
+# database with the same schema, for local benchmarks and tests.
+STORAGE_CONFIG = {
+    "url": os.environ.get("DB_BACKEND", "mysql"),
+}
+
+# Connection pool settings (see pool.ConnectionPool)
+POOL_CONFIG = {
+    "max_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+    "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 5)),
+    "max_uses": int(os.environ.get("DB_POOL_MAX_USES", 1000)),
+    "max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800)),
+    "ping_after": float(os.environ.get("DB_POOL_PING_AFTER", 30)),
+}
+
+# List endpoint paging (see pagination.py). API_PAGE_TOTAL is the default
+# for ?total= and is one of exact, estimate or none.
+PAGE_CONFIG = {
+    "default_limit": int(os.environ.get("API_PAGE_SIZE", 100)),
+    "max_limit": int(os.environ.get("API_PAGE_MAX_SIZE", 1000)),
+    "total": os.environ.get("API_PAGE_TOTAL", "estimate"),
+}
+
+# Lookups by a list of keys (see lookup.py) run one IN query per
+# chunk_size keys. A multi-get request may name at most max_keys keys.
+LOOKUP_CONFIG = {
+    "chunk_size": int(os.environ.get("LOOKUP_CHUNK_SIZE", 500)),
+    "max_keys": int(os.environ.get("LOOKUP_MAX_KEYS", 1000)),
+}
+
+# Idempotency-Key on create endpoints (see idempotency.py). Responses are
+# kept for ttl seconds, in each worker up to max_entries of them and
+# max_bytes in total, and in the idempotency_key table unless
+# IDEMPOTENCY_DURABLE=0. A retry waits up to wait_timeout seconds for the
+# first request; a claim on the table expires after lease seconds, so a
+# worker that died mid-request does not block the key for the full ttl.
+IDEMPOTENCY_CONFIG = {
+    "ttl": float(os.environ.get("IDEMPOTENCY_TTL", 86400)),
+    "max_entries": int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", 10000)),
+    "max_bytes": int(os.environ.get("IDEMPOTENCY_MAX_BYTES", 8 * 1024 * 1024)),
+    "wait_timeout": float(os.environ.get("IDEMPOTENCY_WAIT_TIMEOUT", 10)),
+    "lease": float(os.environ.get("IDEMPOTENCY_LEASE", 60)),
+    "durable": os.environ.get("IDEMPOTENCY_DURABLE", "1") == "1",
+}
+
+# Streaming exports (see export.py). MySQL drops a result stream that has
+# not been read for net_write_timeout seconds, so exports raise it.
+EXPORT_CONFIG = {
+    "chunk_size": int(os.environ.get("API_EXPORT_CHUNK_SIZE", 1000)),
+    "net_write_timeout": int(os.environ.get("API_EXPORT_NET_WRITE_TIMEOUT", 3600)),
+}
+
+# Vehicle availability index (see availability.py). Bookings in one of the
+# inactive statuses never block a vehicle. Each worker rebuilds its index
+# after max_age seconds to pick up writes made by other workers.
+AVAILABILITY_CONFIG = {
+    "inactive_statuses": os.environ.get("BOOKING_INACTIVE_STATUSES", "CANCELLED").split(","),
+    "max_age": float(os.environ.get("AVAILABILITY_MAX_AGE", 300)),
+}
+
+# Customer search index (see search.py). A query gathers at most
+# max_candidates customers for a term that is not an exact word match, and
+# k is capped at max_results. Like the availability index, each worker
+# rebuilds it after max_age seconds.
+SEARCH_CONFIG = {
+    "max_age": float(os.environ.get("SEARCH_MAX_AGE", 300)),
+    "max_candidates": int(os.environ.get("SEARCH_MAX_CANDIDATES", 10000)),
+    "max_results": int(os.environ.get("SEARCH_MAX_RESULTS", 50)),
+    "fuzzy_threshold": float(os.environ.get("SEARCH_FUZZY_THRESHOLD", 0.6)),
+}
+
+# Fleet utilization analytics (see utilization.py); needs numpy. Windows
+# are limited to max_days, and each worker rebuilds its arrays after
+# max_age seconds, as with the availability index.
+UTILIZATION_CONFIG = {
+    "max_days": int(os.environ.get("UTILIZATION_MAX_DAYS", 3660)),
+    "max_age": float(os.environ.get("UTILIZATION_MAX_AGE", 300)),
+}
+
+# Daily booking report (see reports.py). Windows are limited to max_days.
+REPORT_CONFIG = {
+    "max_days": int(os.environ.get("REPORT_MAX_DAYS", 3660)),
+}
+
+# Booking rules (see conflicts.py). Capping the rental length keeps the
+# double-booking check a bounded index range scan.
+BOOKING_CONFIG = {
+    "max_days": int(os.environ.get("BOOKING_MAX_DAYS", 365)),
+}
+
+# Entity cache for single-entity GETs (see cache.py). CACHE_ENTITIES lists
+# the entity types cached; CACHE_BACKEND optionally adds a shared tier,
+# e.g. redis://localhost:6379/0 or sqlite:////tmp/carhire-cache.db.
+CACHE_CONFIG = {
+    "entities": [e for e in os.environ.get("CACHE_ENTITIES", "customer,vehicle,booking,booking_status").split(",") if e],
+    "max_entries": int(os.environ.get("CACHE_MAX_ENTRIES", 10000)),
+    "ttl": float(os.environ.get("CACHE_TTL", 60)),
+    "backend": os.environ.get("CACHE_BACKEND", ""),
+    "poll_interval": float(os.environ.get("CACHE_POLL_INTERVAL", 1)),
+}
+
+# Verified JWT claims cache used by token_required (see token_cache.py).
+# AUTH_CACHE_SIZE=0 verifies every request from scratch. Tokens from
+# /api/login expire after token_lifetime seconds; a logout is remembered
+# until the token expires.
+AUTH_CACHE_CONFIG = {
+    "max_entries": int(os.environ.get("AUTH_CACHE_SIZE", 10000)),
+    "ttl": float(os.environ.get("AUTH_CACHE_TTL", 300)),
+    "token_lifetime": int(os.environ.get("AUTH_TOKEN_LIFETIME", 3600)),
+}
+
+# Bulk create endpoints (see bulk.py)
+BULK_CONFIG = {
+    "chunk_size": int(os.environ.get("BULK_CHUNK_SIZE", 500)),
+    "max_records": int(os.environ.get("BULK_MAX_RECORDS", 10000)),
+}
+
+# Streaming CSV / NDJSON imports (see importer.py). Rows are inserted
+# chunk_size at a time and committed, with a checkpoint, every
+# commit_every rows.
+IMPORT_CONFIG = {
+    "chunk_size": int(os.environ.get("IMPORT_CHUNK_SIZE", 1000)),
+    "commit_every": int(os.environ.get("IMPORT_COMMIT_EVERY", 10000)),
+    "max_errors": int(os.environ.get("IMPORT_MAX_ERRORS", 100)),
+}
+
+# Request and database metrics served at /metrics (see metrics.py). With
+# several worker processes, point METRICS_DIR at a directory they share
+# (emptied on deploy) so any worker can report the totals of all of them.
+METRICS_CONFIG = {
+    "enabled": os.environ.get("METRICS_ENABLED", "1") == "1",
+    "directory": os.environ.get("METRICS_DIR", ""),
+    "flush_interval": float(os.environ.get("METRICS_FLUSH_INTERVAL", 1)),
+}
+
+# Statement profiler and slow-query log (see profiler.py). Statements
+# slower than QUERY_SLOW_MS are logged, and with QUERY_EXPLAIN=1 their
+# plan is captured for /api/admin/queries. QUERY_DEBUG_HEADER=1 lets any
+# client ask for a request's query breakdown with X-Debug-Queries: 1, so
+# keep it off in production.
+PROFILER_CONFIG = {
+    "enabled": os.environ.get("QUERY_PROFILER", "1") == "1",
+    "slow_threshold": float(os.environ.get("QUERY_SLOW_MS", 100)) / 1000,
+    "explain": os.environ.get("QUERY_EXPLAIN", "0") == "1",
+    "top_n": int(os.environ.get("QUERY_TOP_N", 20)),
+    "window": float(os.environ.get("QUERY_WINDOW", 300)),
+    "debug_header": os.environ.get("QUERY_DEBUG_HEADER", "0") == "1",
+}
+
+# JSON responses are encoded with orjson, when installed, unless
+# FAST_JSON=0 (see json_provider.py). The output is the same either way.
+JSON_CONFIG = {
+    "fast": os.environ.get("FAST_JSON", "1") == "1",
+}
+
+# Response compression (see compression.py). gzip is always offered, br
+# and zstd when the brotli / zstandard packages are installed. Bodies
+# under COMPRESS_MIN_SIZE bytes are sent uncompressed; compressed bodies
+# of responses with an ETag are cached up to COMPRESS_CACHE_BYTES.
+COMPRESSION_CONFIG = {
+    "enabled": os.environ.get("COMPRESSION", "1") == "1",
+    "min_size": int(os.environ.get("COMPRESS_MIN_SIZE", 1024)),
+    "levels": {
+        "gzip": int(os.environ.get("GZIP_LEVEL", 6)),
+        "br": int(os.environ.get("BROTLI_LEVEL", 4)),
+        "zstd": int(os.environ.get("ZSTD_LEVEL", 3)),
+    },
+    "cache_bytes": int(os.environ.get("COMPRESS_CACHE_BYTES", 32 * 1024 * 1024)),
+}
@@ -0,0 +1,106 @@
+import csv
+import io
+from datetime import datetime
+from conn import EXPORT_CONFIG
+from fields import parse_fields, select_list
+
+# Tables that can be exported and whether they accept a date range filter
+EXPORTS = {
+    "customer": {"pk": "customer_id", "dates": False},
+    "vehicle": {"pk": "reg_number", "dates": False},
+    "booking": {"pk": "booking_id", "dates": True},
+}
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ExportError(f"{name} must be a date in YYYY-MM-DD format")
+
+# Parse ?format=&date_from=&date_to=&fields= for an export endpoint. A bad
+# fields value raises FieldsError.
+def parse_export_args(args, table):
+    fmt = args.get("format", "ndjson")
+    if fmt not in FORMATS:
+        raise ExportError(f"format must be one of: {', '.join(FORMATS)}")
+
+    date_from = args.get("date_from")
+    date_to = args.get("date_to")
+    if (date_from or date_to) and not EXPORTS[table]["dates"]:
+        raise ExportError(f"{table} export does not support date filters")
+    if date_from:
+        date_from = _parse_date(date_from, "date_from")
+    if date_to:
+        date_to = _parse_date(date_to, "date_to")
+    if date_from and date_to and date_from > date_to:
+        raise ExportError("date_from must not be after date_to")
+
+    return {"table": table, "format": fmt, "date_from": date_from, "date_to": date_to,
+            "fields": parse_fields(args, table)}
+
+def build_export_query(export):
+    where = []
+    params = []
+    # A booking is exported when its rental period overlaps the range
+    if export["date_from"]:
+        where.append("date_to >= %s")
+        params.append(export["date_from"])
+    if export["date_to"]:
+        where.append("date_from <= %s")
+        params.append(export["date_to"])
+    query = f"SELECT {select_list(export.get('fields'))} FROM {export['table']}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += f" ORDER BY {EXPORTS[export['table']]['pk']}"
+    return query, tuple(params)
+
+def _csv_chunk(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def _ndjson_chunk(columns, rows, dumps):
+    return "".join(dumps(dict(zip(columns, row))) + "\n" for row in rows)
+
+# Yield the export body chunk by chunk from an unbuffered cursor, so only
+# `chunk_size` rows are held in memory at a time. MySQL aborts a result
+# stream the client has not read for net_write_timeout seconds, so the
+# session timeout is raised for slow readers and reset afterwards.
+def stream_export(conn, export, dumps, chunk_size=None):
+    chunk_size = chunk_size or EXPORT_CONFIG["chunk_size"]
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET SESSION net_write_timeout = %s", (EXPORT_CONFIG["net_write_timeout"],))
+        query, params = build_export_query(export)
+        cursor.execute(query, params)
+        columns = cursor.column_names
+
+        if export["format"] == "csv":
+            yield _csv_chunk([columns])
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if export["format"] == "csv":
+                yield _csv_chunk(rows)
+            else:
+                yield _ndjson_chunk(columns, rows, dumps)
+
+        cursor.execute("SET SESSION net_write_timeout = DEFAULT")
+    finally:
+        # An abandoned stream leaves unread rows; the pool discards such
+        # connections rather than draining them.
+        try:
+            cursor.close()
+        except Exception:
+            pass
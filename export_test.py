@@ -0,0 +1,66 @@
+import json
+import pytest
+from datetime import date
+from unittest.mock import MagicMock
+from export import ExportError, parse_export_args, build_export_query, stream_export
+
+def make_conn(columns, chunks):
+    """Connection whose cursor returns `chunks` from successive fetchmany calls."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.column_names = columns
+    mock_cursor.fetchmany.side_effect = chunks + [[]]
+    mock_conn.cursor.return_value = mock_cursor
+    return mock_conn, mock_cursor
+
+def test_booking_date_range_overlap():
+    """Test that date_from/date_to select bookings overlapping the range."""
+    export = parse_export_args({"date_from": "2023-01-01", "date_to": "2023-01-31"}, "booking")
+    query, params = build_export_query(export)
+    assert query == "SELECT * FROM booking WHERE date_to >= %s AND date_from <= %s ORDER BY booking_id"
+    assert params == (date(2023, 1, 1), date(2023, 1, 31))
+
+def test_export_fields():
+    """Test that ?fields= narrows the exported columns."""
+    query, _ = build_export_query(parse_export_args({"fields": "reg_number,model_code"}, "vehicle"))
+    assert query == "SELECT reg_number, model_code FROM vehicle ORDER BY reg_number"
+
+@pytest.mark.parametrize("table,args", [
+    ("booking", {"format": "xml"}),
+    ("booking", {"date_from": "01/01/2023"}),
+    ("booking", {"date_from": "2023-02-01", "date_to": "2023-01-01"}),
+    ("vehicle", {"date_from": "2023-01-01"}),
+])
+def test_invalid_export_args(table, args):
+    """Test that unsupported formats and bad date filters are rejected."""
+    with pytest.raises(ExportError):
+        parse_export_args(args, table)
+
+def test_stream_csv_in_chunks():
+    """Test that CSV output is a header followed by one chunk per fetchmany."""
+    conn, cursor = make_conn(("reg_number", "model_code"), [[("A1", "M1"), ("A2", "M2")], [("A3", "M3")]])
+    chunks = list(stream_export(conn, parse_export_args({"format": "csv"}, "vehicle"), json.dumps, chunk_size=2))
+    assert chunks == ["reg_number,model_code\r\n", "A1,M1\r\nA2,M2\r\n", "A3,M3\r\n"]
+    cursor.fetchmany.assert_called_with(2)
+    cursor.close.assert_called_once()
+
+def test_stream_ndjson():
+    """Test that NDJSON output has one JSON object per row."""
+    conn, _ = make_conn(("booking_id", "date_from"), [[(1, "2023-01-01"), (2, "2023-01-02")]])
+    body = "".join(stream_export(conn, parse_export_args({}, "booking"), json.dumps))
+    lines = body.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"booking_id": 1, "date_from": "2023-01-01"},
+        {"booking_id": 2, "date_from": "2023-01-02"},
+    ]
+
+def test_abandoned_stream_closes_cursor():
+    """Test that closing the generator early still closes the cursor."""
+    conn, cursor = make_conn(("reg_number",), [[("A1",)], [("A2",)]])
+    chunks = stream_export(conn, parse_export_args({}, "vehicle"), json.dumps)
+    next(chunks)
+    chunks.close()
+    cursor.close.assert_called_once()
+
+if __name__ == "__main__":
+    pytest.main()
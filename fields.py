@@ -0,0 +1,43 @@
+# Sparse fieldsets: ?fields=reg_number,model_code on GET routes. The
+# requested columns are checked against each table's whitelist and turned
+# into the SELECT list, so columns nobody asked for are never read.
+
+FIELDS = {
+    "customer": ("customer_id", "customer_name", "email_address", "phone_number", "address"),
+    "vehicle": ("reg_number", "model_code", "current_mileage", "engine_size", "vehicle_category_description"),
+    "booking": ("booking_id", "date_from", "date_to", "booking_status_code", "Customer_customer_id", "Vehicle_reg_number"),
+    "booking_status": ("status_code", "description"),
+}
+
+
+class FieldsError(ValueError):
+    pass
+
+
+# Parse ?fields= into a tuple of column names, or None for all columns.
+# `allowed` narrows the whitelist for routes that return fewer columns.
+def parse_fields(args, table, allowed=None):
+    value = args.get("fields")
+    if value is None:
+        return None
+    allowed = allowed or FIELDS[table]
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    if not fields:
+        raise FieldsError("fields must name at least one field")
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise FieldsError(f"Unknown field(s): {', '.join(unknown)}. fields must be among: {', '.join(allowed)}")
+    return fields
+
+# SELECT list for the requested fields plus the columns the query itself
+# needs (keys for cursors), or * when no fields were requested
+def select_list(fields, required=()):
+    if fields is None:
+        return "*"
+    return ", ".join(dict.fromkeys((*fields, *required)))
+
+# Drop the columns that were only selected for the query's own use
+def project(row, fields):
+    if fields is None or row is None:
+        return row
+    return {name: row[name] for name in fields}
@@ -0,0 +1,78 @@
+from datetime import datetime
+from conn import BOOKING_CONFIG
+
+# Server-side filters for list endpoints. Each query parameter maps to one
+# parameterized predicate; predicates are ANDed together and with the
+# keyset condition of the page. Every filter has an index in schema.py
+# that turns it into a range scan (checked by filters_test.py).
+
+
+class FilterError(ValueError):
+    pass
+
+
+def _integer(value, name):
+    try:
+        return int(value)
+    except ValueError:
+        raise FilterError(f"{name} must be an integer")
+
+def _text(value, name):
+    if not value:
+        raise FilterError(f"{name} must not be empty")
+    return value
+
+def _date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise FilterError(f"{name} must be a date in YYYY-MM-DD format")
+
+# LIKE pattern matching values that start with `value`, with the
+# wildcards in it escaped
+def _prefix(value, name):
+    if not value:
+        raise FilterError(f"{name} must not be empty")
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%"
+
+# table -> (query parameter, SQL predicate, value parser)
+FILTERS = {
+    "booking": (
+        ("Customer_customer_id", "Customer_customer_id = %s", _integer),
+        ("Vehicle_reg_number", "Vehicle_reg_number = %s", _text),
+        ("booking_status_code", "booking_status_code = %s", _text),
+    ),
+    "customer": (
+        ("email_prefix", "email_address LIKE %s ESCAPE '!'", _prefix),
+    ),
+}
+
+# Tables filtered by ?date_from=&date_to=, which select the rows whose
+# rental period overlaps the range. No booking is longer than max_days,
+# so one that ends on or after date_from also starts after date_from -
+# max_days; stating that bound makes the test a range on date_from, as in
+# find_conflicts (conflicts.py).
+PERIOD_TABLES = ("booking",)
+PERIOD_PREDICATE = "date_from BETWEEN DATE_SUB(%s, INTERVAL %s DAY) AND %s AND date_to >= %s"
+
+# Parse the filter parameters of a list endpoint into a (predicates,
+# params) pair; both are empty when no filter was given.
+def parse_filters(args, table):
+    predicates = []
+    params = []
+    for name, predicate, parse in FILTERS.get(table, ()):
+        value = args.get(name)
+        if value is not None:
+            predicates.append(predicate)
+            params.append(parse(value.strip(), name))
+
+    if table in PERIOD_TABLES and ("date_from" in args or "date_to" in args):
+        if "date_from" not in args or "date_to" not in args:
+            raise FilterError("date_from and date_to must be given together")
+        date_from = _date(args["date_from"], "date_from")
+        date_to = _date(args["date_to"], "date_to")
+        if date_from > date_to:
+            raise FilterError("date_from must not be after date_to")
+        predicates.append(PERIOD_PREDICATE)
+        params.extend([date_from, BOOKING_CONFIG["max_days"], date_to, date_from])
+    return tuple(predicates), tuple(params)
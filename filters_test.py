@@ -0,0 +1,128 @@
+import itertools
+import pytest
+from datetime import date, timedelta
+from unittest.mock import MagicMock
+from filters import FILTERS, PERIOD_TABLES, PERIOD_PREDICATE, FilterError, parse_filters
+from pagination import parse_page_args, fetch_page, count_rows, TABLES
+from storage import SQLiteStorage
+
+# Selective values, as filters are used in practice: one customer, one
+# vehicle, the open bookings among years of completed ones, a short
+# window. For a filter matching most of the table a scan is the better
+# plan, and both SQLite and MySQL rightly choose it.
+SAMPLE = {
+    "Customer_customer_id": "7",
+    "Vehicle_reg_number": "V0042",
+    "booking_status_code": "PENDING",
+    "email_prefix": "user1",
+}
+# Sorts checked with the filters: all customer sorts, and bookings by id
+# or date. Sorting a status-filtered list by customer or vehicle walks
+# that index in order instead, checking each row's status.
+SORTS = {"booking": ("booking_id", "date_from", "date_to"), "customer": TABLES["customer"]["sort"]}
+PERIOD = {"date_from": "2027-06-01", "date_to": "2027-06-10"}
+
+@pytest.fixture(scope="module")
+def db():
+    """Embedded database holding ten years of bookings."""
+    storage = SQLiteStorage()
+    conn = storage.connect()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO booking_status (status_code, description) VALUES ('COMPLETED', 'Completed')")
+    cursor.executemany(
+        "INSERT INTO customer (customer_name, email_address) VALUES (%s, %s)",
+        [(f"Customer {i}", f"user{i}@example.com") for i in range(2000)]
+    )
+    cursor.executemany(
+        "INSERT INTO vehicle (reg_number, model_code, vehicle_category_description) VALUES (%s, %s, %s)",
+        [(f"V{i:04d}", "M1", "SUV") for i in range(500)]
+    )
+    start = date(2023, 1, 1)
+    cursor.executemany(
+        "INSERT INTO booking (date_from, date_to, booking_status_code, Customer_customer_id, Vehicle_reg_number) "
+        "VALUES (%s, %s, %s, %s, %s)",
+        [(start + timedelta(days=i // 10), start + timedelta(days=i // 10 + i % 14), "PENDING" if i % 50 == 0 else "COMPLETED",
+          i % 2000 + 1, f"V{i % 500:04d}") for i in range(36500)]
+    )
+    cursor.execute("ANALYZE")
+    conn.commit()
+    yield conn
+    conn.close()
+    storage.close()
+
+def plan(conn, sql, params):
+    cursor = conn.cursor()
+    cursor.execute("EXPLAIN " + sql, params)
+    details = [row[-1] for row in cursor.fetchall()]
+    cursor.close()
+    return details
+
+def statements(table, args):
+    """SQL of a page query and its count query, without running them."""
+    page = parse_page_args({**args, "total": "exact", "limit": "50"}, table)
+    cursor = MagicMock()
+    cursor.fetchall.return_value = []
+    cursor.fetchone.return_value = {"total": 0}
+    fetch_page(cursor, page)
+    count_rows(cursor, page)
+    return [c.args for c in cursor.execute.call_args_list]
+
+def combinations(table):
+    names = [name for name, _, _ in FILTERS[table]]
+    periods = ({}, PERIOD) if table in PERIOD_TABLES else ({},)
+    for size in range(len(names) + 1):
+        for combination in itertools.combinations(names, size):
+            for period in periods:
+                args = {**{name: SAMPLE[name] for name in combination}, **period}
+                if args:
+                    yield args
+
+@pytest.mark.parametrize("table", FILTERS)
+def test_no_filter_combination_scans_the_table(db, table):
+    """Test through EXPLAIN that every filter combination, under every sort, is an index search."""
+    for args in combinations(table):
+        for sort in SORTS[table]:
+            for direction in ("", "-"):
+                for sql, params in statements(table, {**args, "sort": direction + sort}):
+                    details = plan(db, sql, params)
+                    assert not [d for d in details if d.startswith("SCAN")], (sql, details)
+
+def test_filters_to_predicates():
+    """Test the predicates and parameters built from query arguments."""
+    assert parse_filters({}, "booking") == ((), ())
+    predicates, params = parse_filters({"Customer_customer_id": "7", "date_from": "2024-03-01", "date_to": "2024-03-05"}, "booking")
+    assert predicates == ("Customer_customer_id = %s", PERIOD_PREDICATE)
+    assert params == (7, date(2024, 3, 1), 365, date(2024, 3, 5), date(2024, 3, 1))
+    assert parse_filters({"email_prefix": "50%_off!"}, "customer") == (
+        ("email_address LIKE %s ESCAPE '!'",), ("50!%!_off!!%",)
+    )
+
+@pytest.mark.parametrize("args", [
+    {"Customer_customer_id": "seven"},
+    {"date_from": "03/01/2024"},
+    {"date_from": "2024-03-10", "date_to": "2024-03-01"},
+    {"date_from": "2024-03-01"},
+    {"Vehicle_reg_number": ""},
+])
+def test_invalid_filters(args):
+    """Test that malformed filter values are rejected."""
+    with pytest.raises(FilterError):
+        parse_filters(args, "booking")
+
+def test_filtered_results(db):
+    """Test that the filters select the same bookings and customers as filtering every row."""
+    cursor = db.cursor(dictionary=True)
+    cursor.execute("SELECT * FROM booking")
+    bookings = cursor.fetchall()
+    page = parse_page_args({"booking_status_code": "PENDING", "date_from": "2025-03-01", "date_to": "2025-03-31", "limit": "1000"}, "booking")
+    rows, _ = fetch_page(cursor, page)
+    assert rows == [b for b in bookings if b["booking_status_code"] == "PENDING"
+                    and b["date_to"] >= date(2025, 3, 1) and b["date_from"] <= date(2025, 3, 31)]
+
+    page = parse_page_args({"email_prefix": "USER199", "limit": "100"}, "customer")
+    rows, _ = fetch_page(cursor, page)
+    assert len(rows) == 11
+    assert count_rows(cursor, page) == 11
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,95 @@
+from conn import AVAILABILITY_CONFIG, PAGE_CONFIG
+from pagination import PaginationError, decode_cursor, encode_cursor
+
+# A customer's booking history, newest first, with each booking's vehicle
+# and status description embedded.
+#
+# One page is one query: the customer's bookings are a range of the
+# (Customer_customer_id, booking_id) index, walked backwards from the
+# `after` cursor, and each is joined to its vehicle and status by primary
+# key. The client no longer fetches the customer's bookings and then each
+# vehicle in turn.
+
+SORT = "-booking_id"
+
+FIRST_PAGE = (
+    "SELECT b.booking_id, b.date_from, b.date_to, b.booking_status_code, b.Vehicle_reg_number,"
+    " s.description AS status_description, v.model_code, v.current_mileage, v.engine_size, v.vehicle_category_description"
+    " FROM booking b"
+    " JOIN vehicle v ON v.reg_number = b.Vehicle_reg_number"
+    " JOIN booking_status s ON s.status_code = b.booking_status_code"
+    " WHERE b.Customer_customer_id = %s ORDER BY b.booking_id DESC LIMIT %s"
+)
+
+NEXT_PAGE = (
+    "SELECT b.booking_id, b.date_from, b.date_to, b.booking_status_code, b.Vehicle_reg_number,"
+    " s.description AS status_description, v.model_code, v.current_mileage, v.engine_size, v.vehicle_category_description"
+    " FROM booking b"
+    " JOIN vehicle v ON v.reg_number = b.Vehicle_reg_number"
+    " JOIN booking_status s ON s.status_code = b.booking_status_code"
+    " WHERE b.Customer_customer_id = %s AND b.booking_id < %s ORDER BY b.booking_id DESC LIMIT %s"
+)
+
+VEHICLE = ("model_code", "current_mileage", "engine_size", "vehicle_category_description")
+
+
+# Parse ?limit=&after=&summary= for the history endpoint
+def parse_history_args(args):
+    limit = args.get("limit", PAGE_CONFIG["default_limit"])
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be at least 1")
+    after = args.get("after")
+    return {
+        "limit": min(limit, PAGE_CONFIG["max_limit"]),
+        "after": decode_cursor(after, SORT)[1] if after else None,
+        "summary": args.get("summary") in ("1", "true"),
+    }
+
+def _booking(row, customer_id):
+    return {
+        "booking_id": row["booking_id"],
+        "date_from": row["date_from"],
+        "date_to": row["date_to"],
+        "Customer_customer_id": customer_id,
+        "booking_status_code": row["booking_status_code"],
+        "Vehicle_reg_number": row["Vehicle_reg_number"],
+        "status": {"status_code": row["booking_status_code"], "description": row["status_description"]},
+        "vehicle": {"reg_number": row["Vehicle_reg_number"], **{name: row[name] for name in VEHICLE}},
+    }
+
+# One page of the customer's bookings and the cursor for the next one.
+# `cursor` must return dict rows.
+def fetch_history(cursor, customer_id, page):
+    if page["after"] is None:
+        cursor.execute(FIRST_PAGE, (customer_id, page["limit"] + 1))
+    else:
+        cursor.execute(NEXT_PAGE, (customer_id, page["after"], page["limit"] + 1))
+    rows = cursor.fetchall()
+    next_token = None
+    if len(rows) > page["limit"]:
+        rows = rows[:page["limit"]]
+        last = rows[-1]["booking_id"]
+        next_token = encode_cursor(SORT, [last, last])
+    return [_booking(row, customer_id) for row in rows], next_token
+
+# Counts over all of the customer's bookings. Rental days leave out
+# bookings in an inactive status (cancelled ones, by default).
+def history_summary(cursor, customer_id):
+    inactive = AVAILABILITY_CONFIG["inactive_statuses"]
+    cursor.execute(
+        "SELECT booking_status_code, COUNT(*) AS bookings, SUM(DATEDIFF(date_to, date_from) + 1) AS rental_days"
+        " FROM booking WHERE Customer_customer_id = %s GROUP BY booking_status_code",
+        (customer_id,)
+    )
+    summary = {"bookings": 0, "rental_days": 0, "by_status": {}}
+    for row in cursor.fetchall():
+        count = int(row["bookings"])
+        summary["bookings"] += count
+        summary["by_status"][row["booking_status_code"]] = count
+        if row["booking_status_code"] not in inactive:
+            summary["rental_days"] += int(row["rental_days"])
+    return summary
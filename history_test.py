@@ -0,0 +1,50 @@
+import pytest
+from datetime import date
+from unittest.mock import MagicMock
+from history import FIRST_PAGE, NEXT_PAGE, parse_history_args, fetch_history, history_summary
+from pagination import PaginationError, encode_cursor
+
+def row(booking_id, status="PENDING"):
+    return {
+        "booking_id": booking_id, "date_from": date(2030, 1, 1), "date_to": date(2030, 1, 2),
+        "booking_status_code": status, "Vehicle_reg_number": "AAA111", "status_description": status.title(),
+        "model_code": "M1", "current_mileage": 10, "engine_size": 1600, "vehicle_category_description": "SUV",
+    }
+
+def test_parse_history_args():
+    """Test the defaults, the cap on limit and the summary flag."""
+    page = parse_history_args({"limit": "999999", "summary": "true"})
+    assert (page["limit"], page["after"], page["summary"]) == (1000, None, True)
+    token = encode_cursor("-booking_id", [7, 7])
+    assert parse_history_args({"after": token})["after"] == 7
+
+@pytest.mark.parametrize("args", [{"limit": "0"}, {"limit": "ten"}, {"after": encode_cursor("booking_id", [7, 7])}])
+def test_invalid_history_args(args):
+    """Test that bad paging parameters, and a cursor from another list, are rejected."""
+    with pytest.raises(PaginationError):
+        parse_history_args(args)
+
+def test_fetch_history_is_one_query_per_page():
+    """Test that a page is one JOIN query and that the cursor continues below the last ID."""
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [row(9), row(5), row(2)]
+    bookings, next_token = fetch_history(cursor, 1, {"limit": 2, "after": None})
+    cursor.execute.assert_called_once_with(FIRST_PAGE, (1, 3))
+    assert [b["booking_id"] for b in bookings] == [9, 5]
+    assert bookings[0]["vehicle"]["engine_size"] == 1600 and bookings[0]["Customer_customer_id"] == 1
+
+    cursor.reset_mock()
+    fetch_history(cursor, 1, parse_history_args({"limit": "2", "after": next_token}))
+    cursor.execute.assert_called_once_with(NEXT_PAGE, (1, 5, 3))
+
+def test_summary_leaves_out_inactive_rental_days():
+    """Test that cancelled bookings are counted but their days are not."""
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [
+        {"booking_status_code": "CANCELLED", "bookings": 2, "rental_days": 9},
+        {"booking_status_code": "PENDING", "bookings": 3, "rental_days": 4},
+    ]
+    assert history_summary(cursor, 1) == {"bookings": 5, "rental_days": 4, "by_status": {"CANCELLED": 2, "PENDING": 3}}
+
+if __name__ == "__main__":
+    pytest.main()
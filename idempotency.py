@@ -0,0 +1,318 @@
+import hashlib
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from conn import IDEMPOTENCY_CONFIG
+
+# Idempotency-Key support for create endpoints.
+#
+# The first request with a key runs the handler; its response is kept for
+# `ttl` seconds, in a bounded in-process map and in the idempotency_key
+# table, and a retry with the same key gets the stored response without
+# the handler running again. A retry that arrives while the first request
+# is still running waits for it: in the same worker on an event, in
+# another worker by polling the table row the first request claimed.
+# Responses with a 5xx status are not kept, so the retry runs again.
+
+log = logging.getLogger(__name__)
+
+PENDING = 0
+
+# Bodies longer than this are kept zlib-compressed
+COMPRESS_OVER = 512
+
+
+class IdempotencyError(Exception):
+    pass
+
+
+class KeyReused(IdempotencyError):
+    """The key was first used with a different request."""
+
+
+class InProgress(IdempotencyError):
+    """The first request with the key is still running."""
+
+
+# SHA-256 hex digest of the parts, for keys and request fingerprints
+def digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class StoredResponse:
+    """A kept response: status, content type and the (maybe compressed) body."""
+
+    __slots__ = ("fingerprint", "status", "content_type", "data", "compressed", "expires")
+
+    def __init__(self, fingerprint, status, content_type, body, expires):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.content_type = content_type
+        self.compressed = len(body) > COMPRESS_OVER
+        self.data = zlib.compress(body, 1) if self.compressed else body
+        self.expires = expires
+
+    @property
+    def body(self):
+        return zlib.decompress(self.data) if self.compressed else self.data
+
+    @property
+    def size(self):
+        return len(self.data) + len(self.content_type or "") + 200
+
+
+class DurableKeys:
+    """The idempotency_key table, through connections from `connect`.
+
+    In the API `connect` returns the request's connection, which the
+    handler also uses: the key is claimed before the handler starts and
+    completed after it has committed. Expiry times are Unix timestamps, so
+    they compare the same way on every backend and in every worker.
+    """
+
+    def __init__(self, connect, lease=None, poll_interval=0.05, purge_interval=60.0):
+        self.connect = connect
+        self.lease = IDEMPOTENCY_CONFIG["lease"] if lease is None else lease
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self._purged_at = 0.0
+
+    # Claim `key` for this request. Returns a StoredResponse if another
+    # request with the key already finished, None once claimed. Waits up
+    # to `timeout` seconds for a request still running elsewhere; a claim
+    # older than the lease is taken over, since its request has died.
+    def claim(self, key, fingerprint, timeout):
+        deadline = time.monotonic() + timeout
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            while True:
+                now = time.time()
+                cursor.execute(
+                    "INSERT IGNORE INTO idempotency_key (key_hash, fingerprint, status, expires_at) VALUES (%s, %s, %s, %s)",
+                    (key, fingerprint, PENDING, int(now + self.lease))
+                )
+                claimed = cursor.rowcount == 1
+                row = None
+                if not claimed:
+                    cursor.execute(
+                        "SELECT fingerprint, status, content_type, body, expires_at FROM idempotency_key WHERE key_hash = %s",
+                        (key,)
+                    )
+                    row = cursor.fetchone()
+                conn.commit()
+                if claimed:
+                    return None
+                if row is None:
+                    continue
+                stored_fingerprint, status, content_type, body, expires_at = row
+                if expires_at <= now:
+                    cursor.execute("DELETE FROM idempotency_key WHERE key_hash = %s AND expires_at = %s", (key, expires_at))
+                    conn.commit()
+                    continue
+                if stored_fingerprint != fingerprint:
+                    raise KeyReused(key)
+                if status != PENDING:
+                    return StoredResponse(fingerprint, status, content_type, bytes(body or b""), time.monotonic() + expires_at - now)
+                if time.monotonic() >= deadline:
+                    raise InProgress(key)
+                time.sleep(self.poll_interval)
+        finally:
+            cursor.close()
+            conn.close()
+
+    def complete(self, key, response, ttl):
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "UPDATE idempotency_key SET status = %s, content_type = %s, body = %s, expires_at = %s WHERE key_hash = %s",
+                (response.status, response.content_type, response.body, int(time.time() + ttl), key)
+            )
+            conn.commit()
+            self._purge(conn, cursor)
+        finally:
+            cursor.close()
+            conn.close()
+
+    def release(self, key):
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM idempotency_key WHERE key_hash = %s AND status = %s", (key, PENDING))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    # Expired rows are deleted every purge_interval seconds by whichever
+    # request completes then
+    def _purge(self, conn, cursor):
+        if time.monotonic() - self._purged_at < self.purge_interval:
+            return
+        self._purged_at = time.monotonic()
+        cursor.execute("DELETE FROM idempotency_key WHERE expires_at < %s", (int(time.time()),))
+        conn.commit()
+
+
+class IdempotencyStore:
+    """Stored responses by idempotency key, with in-flight requests collapsed.
+
+    The in-process map holds at most `max_entries` responses and
+    `max_bytes` bytes of them, evicting the least recently used; `durable`,
+    a DurableKeys or None, keeps them across workers and restarts.
+    """
+
+    def __init__(self, ttl=None, max_entries=None, max_bytes=None, wait_timeout=None, durable=None):
+        self.ttl = IDEMPOTENCY_CONFIG["ttl"] if ttl is None else ttl
+        self.max_entries = IDEMPOTENCY_CONFIG["max_entries"] if max_entries is None else max_entries
+        self.max_bytes = IDEMPOTENCY_CONFIG["max_bytes"] if max_bytes is None else max_bytes
+        self.wait_timeout = IDEMPOTENCY_CONFIG["wait_timeout"] if wait_timeout is None else wait_timeout
+        self.durable = durable
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # key -> (fingerprint, Event set when the running request finishes)
+        self._running = {}
+        self.counters = {
+            "executed": 0, "replayed": 0, "durable_replayed": 0, "collapsed": 0, "key_reused": 0,
+            "in_progress": 0, "evictions": 0, "expirations": 0, "durable_errors": 0,
+        }
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            self._remove(key)
+            self.counters["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _keep(self, key, entry):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if entry.size > self.max_bytes or not self.max_entries:
+                return
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+
+    # Run `handler` for the first request with `key`, or return the
+    # response it gave. `handler` returns (status, content_type, body
+    # bytes). Returns (status, content_type, body, replayed). Raises
+    # KeyReused when the key came with a different `fingerprint`, and
+    # InProgress when the first request is still running after
+    # wait_timeout seconds.
+    def execute(self, key, fingerprint, handler):
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            with self._lock:
+                entry = self._lookup(key)
+                running = self._running.get(key)
+                if entry is None and running is None:
+                    done = threading.Event()
+                    self._running[key] = (fingerprint, done)
+                    break
+                stored_fingerprint = entry.fingerprint if entry is not None else running[0]
+                if stored_fingerprint != fingerprint:
+                    self.counters["key_reused"] += 1
+                    raise KeyReused(key)
+                if entry is not None:
+                    self.counters["replayed"] += 1
+                    return entry.status, entry.content_type, entry.body, True
+                self.counters["collapsed"] += 1
+            # Another request with this key is running in this worker
+            if not running[1].wait(max(deadline - time.monotonic(), 0)):
+                with self._lock:
+                    self.counters["in_progress"] += 1
+                raise InProgress(key)
+
+        try:
+            return self._execute(key, fingerprint, handler, deadline)
+        finally:
+            with self._lock:
+                del self._running[key]
+            done.set()
+
+    def _execute(self, key, fingerprint, handler, deadline):
+        durable = self.durable
+        if durable is not None:
+            try:
+                stored = durable.claim(key, fingerprint, max(deadline - time.monotonic(), 0))
+            except KeyReused:
+                with self._lock:
+                    self.counters["key_reused"] += 1
+                raise
+            except InProgress:
+                with self._lock:
+                    self.counters["in_progress"] += 1
+                raise
+            except Exception:
+                # Without the table the key still holds within this worker
+                log.exception("Could not claim idempotency key")
+                with self._lock:
+                    self.counters["durable_errors"] += 1
+                durable = None
+            else:
+                if stored is not None:
+                    self._keep(key, stored)
+                    with self._lock:
+                        self.counters["durable_replayed"] += 1
+                    return stored.status, stored.content_type, stored.body, True
+
+        try:
+            status, content_type, body = handler()
+        except BaseException:
+            # An exception is answered like a 5xx: the retry runs again,
+            # instead of waiting for a claim nobody will complete
+            if durable is not None:
+                try:
+                    durable.release(key)
+                except Exception:
+                    log.exception("Could not release idempotency key")
+            raise
+        with self._lock:
+            self.counters["executed"] += 1
+        try:
+            if status >= 500:
+                if durable is not None:
+                    durable.release(key)
+            else:
+                entry = StoredResponse(fingerprint, status, content_type, body, time.monotonic() + self.ttl)
+                self._keep(key, entry)
+                if durable is not None:
+                    durable.complete(key, entry, self.ttl)
+        except Exception:
+            log.exception("Could not store idempotent response")
+            with self._lock:
+                self.counters["durable_errors"] += 1
+        return status, content_type, body, False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "running": len(self._running),
+                "ttl": self.ttl,
+                "durable": self.durable is not None,
+            })
+        return stats
@@ -0,0 +1,140 @@
+import threading
+import time
+import pytest
+from idempotency import IdempotencyStore, DurableKeys, StoredResponse, KeyReused, InProgress, digest
+from storage import SQLiteStorage
+
+def created(body=b'{"success": true}', status=201):
+    calls = []
+    def handler():
+        calls.append(1)
+        return status, "application/json", body
+    return handler, calls
+
+def test_retry_is_replayed():
+    """Test that a retry gets the first response without running the handler."""
+    store = IdempotencyStore(ttl=60, max_entries=10, max_bytes=10000, wait_timeout=1)
+    handler, calls = created()
+    assert store.execute("k", "f", handler) == (201, "application/json", b'{"success": true}', False)
+    assert store.execute("k", "f", handler) == (201, "application/json", b'{"success": true}', True)
+    assert len(calls) == 1 and store.stats()["replayed"] == 1
+
+def test_key_reused_with_another_request():
+    """Test that the same key with a different fingerprint is rejected."""
+    store = IdempotencyStore(ttl=60, max_entries=10, max_bytes=10000, wait_timeout=1)
+    store.execute("k", "f", created()[0])
+    with pytest.raises(KeyReused):
+        store.execute("k", "other", created()[0])
+
+def test_server_errors_are_not_kept():
+    """Test that a 5xx response lets the retry run again."""
+    store = IdempotencyStore(ttl=60, max_entries=10, max_bytes=10000, wait_timeout=1)
+    handler, calls = created(status=500)
+    store.execute("k", "f", handler)
+    assert store.execute("k", "f", handler)[3] is False and len(calls) == 2
+
+def test_expired_response_runs_again():
+    """Test that a response older than the TTL is dropped."""
+    store = IdempotencyStore(ttl=0, max_entries=10, max_bytes=10000, wait_timeout=1)
+    handler, calls = created()
+    store.execute("k", "f", handler)
+    store.execute("k", "f", handler)
+    assert len(calls) == 2 and store.stats()["expirations"] == 1
+
+def test_concurrent_duplicates_run_once():
+    """Test that requests with the same key arriving together run the handler once."""
+    store = IdempotencyStore(ttl=60, max_entries=10, max_bytes=10000, wait_timeout=5)
+    calls = []
+    def handler():
+        calls.append(1)
+        time.sleep(0.1)
+        return 201, "application/json", b"{}"
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.execute("k", "f", handler))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert sorted(r[3] for r in results) == [False, True, True, True, True]
+    assert store.stats()["collapsed"] == 4
+
+def test_wait_timeout_raises_in_progress():
+    """Test that a duplicate gives up once the first request runs past wait_timeout."""
+    store = IdempotencyStore(ttl=60, max_entries=10, max_bytes=10000, wait_timeout=0.05)
+    started, finish = threading.Event(), threading.Event()
+    def slow():
+        started.set()
+        finish.wait(5)
+        return 201, "application/json", b"{}"
+    t = threading.Thread(target=store.execute, args=("k", "f", slow))
+    t.start()
+    started.wait(5)
+    with pytest.raises(InProgress):
+        store.execute("k", "f", created()[0])
+    finish.set()
+    t.join()
+
+def test_memory_is_bounded():
+    """Test eviction by entry count and by bytes, least recently used first."""
+    store = IdempotencyStore(ttl=60, max_entries=2, max_bytes=100000, wait_timeout=1)
+    for key in "abc":
+        store.execute(key, "f", created()[0])
+    assert store.stats()["size"] == 2 and store.stats()["evictions"] == 1
+    assert store.execute("a", "f", created()[0])[3] is False
+
+    store = IdempotencyStore(ttl=60, max_entries=100, max_bytes=1000, wait_timeout=1)
+    for key in "abcdef":
+        store.execute(key, "f", created(body=bytes(range(256)) * 2)[0])
+    stats = store.stats()
+    assert 0 < stats["bytes"] <= 1000 and stats["size"] < 6
+
+def test_large_bodies_are_compressed():
+    """Test that a large body is kept compressed and read back unchanged."""
+    body = b'{"data": [' + b'{"reg_number": "AAA111"}, ' * 200 + b"]}"
+    entry = StoredResponse("f", 201, "application/json", body, 0)
+    assert entry.compressed and entry.size < len(body) and entry.body == body
+
+@pytest.fixture
+def storage():
+    storage = SQLiteStorage()
+    yield storage
+    storage.close()
+
+def test_durable_keys_replay_across_workers(storage):
+    """Test that a second store, as in another worker, replays from the table."""
+    first = IdempotencyStore(ttl=60, max_entries=10, max_bytes=10000, wait_timeout=1, durable=DurableKeys(storage.connect))
+    second = IdempotencyStore(ttl=60, max_entries=10, max_bytes=10000, wait_timeout=1, durable=DurableKeys(storage.connect))
+    handler, calls = created()
+    key = digest("POST", "/api/booking", "admin", "abc")
+    first.execute(key, "f", handler)
+    assert second.execute(key, "f", handler) == (201, "application/json", b'{"success": true}', True)
+    assert len(calls) == 1 and second.stats()["durable_replayed"] == 1
+    third = IdempotencyStore(ttl=60, max_entries=10, max_bytes=10000, wait_timeout=1, durable=DurableKeys(storage.connect))
+    with pytest.raises(KeyReused):
+        third.execute(key, "g", handler)
+
+def test_handler_exception_releases_key(storage):
+    """Test that a handler that raises leaves the key free for the retry."""
+    store = IdempotencyStore(ttl=60, max_entries=10, max_bytes=10000, wait_timeout=0.05, durable=DurableKeys(storage.connect))
+    def failing():
+        raise ValueError("bad body")
+    with pytest.raises(ValueError):
+        store.execute("k", "f", failing)
+    handler, calls = created()
+    assert store.execute("k", "f", handler)[3] is False and len(calls) == 1
+
+def test_durable_claim_waits_then_takes_over_expired_lease(storage):
+    """Test that a pending claim blocks other workers until its lease runs out."""
+    keys = DurableKeys(storage.connect, lease=60, poll_interval=0.01)
+    assert keys.claim("k", "f", 0) is None
+    with pytest.raises(InProgress):
+        keys.claim("k", "f", 0.03)
+
+    keys.release("k")
+    short = DurableKeys(storage.connect, lease=-1, poll_interval=0.01)
+    assert short.claim("k", "f", 0) is None
+    assert keys.claim("k", "f", 0) is None
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,339 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from mysql.connector import errorcode
+from mysql.connector.errors import DataError, IntegrityError
+from conn import IMPORT_CONFIG
+from validation import customer_error, vehicle_error, booking_error
+from reports import record_bookings
+from availability import to_day
+from conflicts import is_blocking_status, lock_vehicle, find_conflicts
+from versions import bump_table_version
+
+# Streaming import of legacy CSV / NDJSON dumps.
+#
+# The file is read line by line and parsed one record at a time, valid rows
+# are inserted with one executemany per chunk, and the transaction is
+# committed every `commit_every` rows, so memory stays flat whatever the
+# file size. Each commit also stores the byte offset reached in the
+# import_checkpoint table, inside the same transaction: after a crash the
+# import resumes from the last commit and no row is loaded twice. The
+# checkpoint of a finished job stays at the end of the file, so running
+# the same job again is a no-op. The import_checkpoint table is created by
+# the migrations (see schema.py).
+
+# Bookings are added to the daily summary in the transaction that inserts
+# them; values are in the order of IMPORT_TABLES["booking"]["columns"].
+def _record_bookings(cursor, rows, categories):
+    record_bookings(cursor, [values[2:6] for values in rows], categories)
+
+# IDs of the bookings that a booking row would overlap, as create_booking
+# checks: active bookings of the vehicle in the table, and earlier rows of
+# the same chunk, `pending`, which are not inserted yet (named by row number
+# when they have no booking_id). The vehicle stays locked until the commit.
+def _booking_conflicts(cursor, values, pending):
+    booking_id, _, reg_number, date_from, date_to, status = values
+    if not is_blocking_status(status) or not lock_vehicle(cursor, reg_number):
+        # An unknown vehicle fails the insert on its foreign key
+        return []
+    conflicts = find_conflicts(cursor, reg_number, date_from, date_to, exclude=booking_id)
+    start, end = to_day(date_from), to_day(date_to)
+    for row, other in pending:
+        if other[2] == reg_number and is_blocking_status(other[5]) and to_day(other[3]) <= end and to_day(other[4]) >= start:
+            conflicts.append(other[0] if other[0] is not None else f"row {row}")
+    return conflicts
+
+IMPORT_TABLES = {
+    "customer": {
+        "validate": customer_error,
+        "columns": ("customer_id", "customer_name", "email_address", "phone_number", "address"),
+        "defaults": {"customer_id": None, "phone_number": "", "address": ""},
+    },
+    "vehicle": {
+        "validate": vehicle_error,
+        "columns": ("reg_number", "model_code", "current_mileage", "engine_size", "vehicle_category_description"),
+        "defaults": {"current_mileage": 0, "engine_size": 0},
+    },
+    "booking": {
+        "validate": booking_error,
+        "columns": ("booking_id", "Customer_customer_id", "Vehicle_reg_number", "date_from", "date_to", "booking_status_code"),
+        "defaults": {"booking_id": None, "booking_status_code": "PENDING"},
+        "record": _record_bookings,
+        "conflicts": _booking_conflicts,
+    },
+}
+
+FORMATS = ("csv", "ndjson")
+
+class ImporterError(ValueError):
+    pass
+
+
+class _Lines:
+    """Iterates the lines of a binary stream, tracking the bytes consumed."""
+
+    def __init__(self, stream, offset=0):
+        self.stream = stream
+        self.offset = offset
+        self.encoding = "utf-8-sig" if offset == 0 else "utf-8"
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.stream.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        text = line.decode(self.encoding)
+        self.encoding = "utf-8"
+        return text
+
+
+# Yields (offset, record) for each record in `stream`, a binary file
+# object; `offset` is the byte position just after the record. A line that
+# is not valid JSON is yielded as an ImporterError. To resume, pass the
+# offset of a previous record as `start`: CSV headers are read from the top
+# of the file first, so the stream must be seekable.
+def read_records(stream, fmt, start=0):
+    if fmt not in FORMATS:
+        raise ImporterError(f"format must be one of: {', '.join(FORMATS)}")
+    lines = _Lines(stream)
+    if fmt == "csv":
+        header = next(csv.reader(lines), None)
+        if header is None:
+            return
+        header = [name.strip() for name in header]
+    if start > lines.offset:
+        stream.seek(start)
+        lines = _Lines(stream, start)
+
+    if fmt == "csv":
+        for row in csv.reader(lines):
+            if row:
+                yield lines.offset, dict(zip(header, row))
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = ImporterError(f"Invalid JSON: {e}")
+        yield lines.offset, record
+
+
+# CSV gives every value as a string; empty strings mean "not set"
+def _prepare(spec, record):
+    record = {k: v for k, v in record.items() if v is not None and v != ""}
+    error = spec["validate"](record)
+    if error:
+        return error, None
+    return None, tuple(record.get(column, spec["defaults"].get(column)) for column in spec["columns"])
+
+
+class Importer:
+    """Loads records into one table in chunks, with periodic commits.
+
+    `progress`, if given, is called with a copy of the stats after every
+    commit. Rows that fail validation or hit a duplicate key are counted
+    and skipped; the first `max_errors` of them are kept in stats["errors"].
+    """
+
+    def __init__(self, conn, table, chunk_size=None, commit_every=None, max_errors=None, job=None, progress=None):
+        if table not in IMPORT_TABLES:
+            raise ImporterError(f"table must be one of: {', '.join(IMPORT_TABLES)}")
+        self.conn = conn
+        self.table = table
+        self.spec = IMPORT_TABLES[table]
+        self.chunk_size = chunk_size or IMPORT_CONFIG["chunk_size"]
+        self.commit_every = max(commit_every or IMPORT_CONFIG["commit_every"], self.chunk_size)
+        self.max_errors = IMPORT_CONFIG["max_errors"] if max_errors is None else max_errors
+        self.job = job
+        self.progress = progress
+        columns = self.spec["columns"]
+        self.insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        self.stats = {"read": 0, "inserted": 0, "invalid": 0, "duplicate": 0, "errors": []}
+        self._record = self.spec.get("record")
+        self._conflicts = self.spec.get("conflicts")
+        self._categories = {}
+        self.offset = 0
+        self._started = None
+        self._resumed_rows = 0
+
+    # Returns the byte offset to resume from, restoring the stats of the
+    # interrupted run; 0 for a new job.
+    def resume(self):
+        if not self.job:
+            return 0
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("SELECT byte_offset, stats FROM import_checkpoint WHERE job = %s", (self.job,))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+        if not row:
+            return 0
+        self.offset = int(row[0])
+        self.stats.update(json.loads(row[1]))
+        self._resumed_rows = self.stats["read"]
+        return self.offset
+
+    # `row` is the record's 1-based position in the file
+    def _record_error(self, row, error):
+        self.stats["invalid"] += 1
+        if len(self.stats["errors"]) < self.max_errors:
+            self.stats["errors"].append({"row": row, "error": error})
+
+    def _insert_one_by_one(self, cursor, rows):
+        inserted = []
+        for row, values in rows:
+            try:
+                cursor.execute(self.insert, values)
+                self.stats["inserted"] += 1
+                inserted.append(values)
+            except IntegrityError as e:
+                if e.errno == errorcode.ER_DUP_ENTRY:
+                    self.stats["duplicate"] += 1
+                else:
+                    self._record_error(row, e.msg)
+            except DataError as e:
+                self._record_error(row, e.msg)
+        if self._record and inserted:
+            self._record(cursor, inserted, self._categories)
+
+    # Rows that would double-book a vehicle are counted as invalid
+    def _without_conflicts(self, cursor, rows):
+        accepted = []
+        for row, values in rows:
+            conflicts = self._conflicts(cursor, values, accepted)
+            if conflicts:
+                self._record_error(row, f"Vehicle is already booked for these dates: {', '.join(map(str, conflicts))}")
+            else:
+                accepted.append((row, values))
+        return accepted
+
+    # A failed statement only undoes itself, so the rows already inserted
+    # in this transaction survive a bad chunk.
+    def _flush(self, cursor, rows):
+        if rows and self._conflicts:
+            rows = self._without_conflicts(cursor, rows)
+        if not rows:
+            return
+        try:
+            cursor.executemany(self.insert, [values for _, values in rows])
+        except (IntegrityError, DataError):
+            self._insert_one_by_one(cursor, rows)
+            return
+        self.stats["inserted"] += len(rows)
+        if self._record:
+            self._record(cursor, [values for _, values in rows], self._categories)
+
+    def _commit(self, cursor):
+        if self.job:
+            cursor.execute(
+                "REPLACE INTO import_checkpoint (job, byte_offset, stats) VALUES (%s, %s, %s)",
+                (self.job, self.offset, json.dumps(self.stats))
+            )
+        self.conn.commit()
+        if self.progress:
+            self.progress(self.report())
+
+    def report(self):
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        rows = self.stats["read"] - self._resumed_rows
+        return {**self.stats, "errors": list(self.stats["errors"]), "elapsed": round(elapsed, 3),
+                "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0}
+
+    # Import `records`, an iterable of (offset, record) as produced by
+    # read_records. Returns the final report.
+    def run(self, records):
+        self._started = time.perf_counter()
+        cursor = self.conn.cursor()
+        try:
+            rows = []
+            uncommitted = 0
+            for offset, record in records:
+                self.stats["read"] += 1
+                row = self.stats["read"]
+                uncommitted += 1
+                if isinstance(record, ImporterError):
+                    self._record_error(row, str(record))
+                elif not isinstance(record, dict):
+                    self._record_error(row, "Record must be an object")
+                else:
+                    error, values = _prepare(self.spec, record)
+                    if error:
+                        self._record_error(row, error)
+                    else:
+                        rows.append((row, values))
+                self.offset = offset
+                if len(rows) >= self.chunk_size:
+                    self._flush(cursor, rows)
+                    rows = []
+                if uncommitted >= self.commit_every:
+                    self._flush(cursor, rows)
+                    rows = []
+                    self._commit(cursor)
+                    uncommitted = 0
+            self._flush(cursor, rows)
+            self._commit(cursor)
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        return self.report()
+
+
+def _print_progress(report):
+    print(
+        f"{report['read']:>12,} read {report['inserted']:>12,} inserted "
+        f"{report['invalid']:>8,} invalid {report['duplicate']:>8,} duplicate "
+        f"{report['rows_per_sec']:>10,.0f} rows/s",
+        file=sys.stderr
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a CSV or NDJSON dump into the car hire database.")
+    parser.add_argument("table", choices=sorted(IMPORT_TABLES))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CONFIG["chunk_size"])
+    parser.add_argument("--commit-every", type=int, default=IMPORT_CONFIG["commit_every"])
+    parser.add_argument("--job", help="checkpoint name (default: table and absolute path); an interrupted job resumes where it stopped")
+    parser.add_argument("--no-resume", action="store_true", help="start from the top of the file even if the job has a checkpoint")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    job = args.job or f"{args.table}:{os.path.abspath(args.path)}"
+
+    from api import connect_db
+    conn = connect_db()
+    try:
+        importer = Importer(conn, args.table, args.chunk_size, args.commit_every, job=job, progress=_print_progress)
+        start = 0 if args.no_resume else importer.resume()
+        if start:
+            print(f"Resuming {job} at byte {start:,} ({importer.stats['read']:,} rows done)", file=sys.stderr)
+        try:
+            with open(args.path, "rb") as stream:
+                report = importer.run(read_records(stream, fmt, start))
+        finally:
+            # New rows, including chunks committed before a failure, change
+            # the table's list and item ETags. Rows are only inserted, so no
+            # cached entity is stale; the API workers' indexes pick the rows
+            # up within their max age.
+            if importer.stats["inserted"]:
+                bump_table_version(conn, args.table)
+    finally:
+        conn.close()
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import io
+import json
+import pytest
+from unittest.mock import MagicMock
+from mysql.connector import errorcode
+from mysql.connector.errors import IntegrityError
+from importer import ImporterError, Importer, read_records
+
+CSV = (
+    "reg_number,model_code,current_mileage,engine_size,vehicle_category_description\n"
+    "A1,M,100,1600,SUV\n"
+    "A2,M,,,\"Small, city\"\n"
+    "A3,,0,0,SUV\n"
+    "A4,M,5,1400,SUV\n"
+).encode()
+
+def test_read_csv_records():
+    """Test CSV parsing, including quoted commas and the byte offsets."""
+    records = list(read_records(io.BytesIO(CSV), "csv"))
+    assert [record["reg_number"] for _, record in records] == ["A1", "A2", "A3", "A4"]
+    assert records[1][1]["vehicle_category_description"] == "Small, city"
+    assert records[-1][0] == len(CSV)
+
+def test_read_csv_resumes_after_header():
+    """Test that resuming at an offset still applies the header."""
+    offset = list(read_records(io.BytesIO(CSV), "csv"))[1][0]
+    records = list(read_records(io.BytesIO(CSV), "csv", start=offset))
+    assert [record["reg_number"] for _, record in records] == ["A3", "A4"]
+
+def test_read_ndjson_reports_bad_lines():
+    """Test that a line that is not JSON is yielded as an error."""
+    data = b'{"reg_number": "A1"}\n\nnot json\n{"reg_number": "A2"}\n'
+    records = [record for _, record in read_records(io.BytesIO(data), "ndjson")]
+    assert records[0] == {"reg_number": "A1"}
+    assert isinstance(records[1], ImporterError)
+    assert records[2] == {"reg_number": "A2"}
+
+def test_import_chunks_and_commits():
+    """Test executemany per chunk, periodic commits and the checkpoint."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    progress = []
+    importer = Importer(conn, "vehicle", chunk_size=1, commit_every=2, job="job", progress=progress.append)
+    report = importer.run(read_records(io.BytesIO(CSV), "csv"))
+
+    assert (report["read"], report["inserted"], report["invalid"]) == (4, 3, 1)
+    assert report["errors"][0]["row"] == 3
+    rows = [c.args[1] for c in cursor.executemany.call_args_list]
+    assert rows[0] == [("A1", "M", "100", "1600", "SUV")]
+    assert rows[1] == [("A2", "M", 0, 0, "Small, city")]
+    assert conn.commit.call_count == 3
+    checkpoint = [c.args[1] for c in cursor.execute.call_args_list if "import_checkpoint (job" in c.args[0]]
+    assert checkpoint[-1][:2] == ("job", len(CSV))
+    assert [p["read"] for p in progress] == [2, 4, 4]
+
+def test_import_falls_back_to_single_rows():
+    """Test that a chunk hitting a duplicate key is retried row by row."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.executemany.side_effect = IntegrityError(errno=errorcode.ER_DUP_ENTRY)
+    cursor.execute.side_effect = [None, IntegrityError(errno=errorcode.ER_DUP_ENTRY), None]
+    report = Importer(conn, "vehicle").run(read_records(io.BytesIO(CSV), "csv"))
+    assert (report["inserted"], report["duplicate"], report["invalid"]) == (2, 1, 1)
+
+def test_resume_restores_checkpoint():
+    """Test that resume returns the stored offset and restores the stats."""
+    conn = MagicMock()
+    conn.cursor.return_value.fetchone.return_value = (120, json.dumps({"read": 2, "inserted": 2}))
+    importer = Importer(conn, "booking", job="job")
+    assert importer.resume() == 120
+    assert importer.stats["read"] == 2
+
+def test_booking_rows_use_api_validation():
+    """Test that bookings are checked with the same rules as create_booking."""
+    conn = MagicMock()
+    data = "\n".join(json.dumps(r) for r in [
+        {"Customer_customer_id": 1, "Vehicle_reg_number": "A1", "date_from": "2024-01-01", "date_to": "2024-01-05"},
+        {"Customer_customer_id": 1, "Vehicle_reg_number": "A1", "date_from": "2024-13-01", "date_to": "2024-01-05"},
+        {"Customer_customer_id": 1, "Vehicle_reg_number": "A1", "date_from": "2024-01-05", "date_to": "2024-01-01"},
+    ]).encode()
+    report = Importer(conn, "booking").run(read_records(io.BytesIO(data), "ndjson"))
+    assert (report["inserted"], report["invalid"]) == (1, 2)
+    assert report["errors"][0]["error"] == "Invalid booking data"
+
+def test_overlapping_bookings_are_invalid():
+    """Test that bookings clashing with stored bookings or earlier rows are rejected, as on create."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.fetchall.side_effect = [[(7,)], [], [], []]
+    data = "\n".join(json.dumps({"Customer_customer_id": 1, "Vehicle_reg_number": reg, "date_from": f, "date_to": t, **extra})
+                     for reg, f, t, extra in [
+        ("A1", "2024-01-01", "2024-01-05", {}),
+        ("A1", "2024-02-01", "2024-02-05", {}),
+        ("A1", "2024-02-05", "2024-02-06", {}),
+        ("A1", "2024-02-05", "2024-02-06", {"booking_status_code": "CANCELLED"}),
+        ("A2", "2024-02-05", "2024-02-06", {}),
+    ]).encode()
+    report = Importer(conn, "booking").run(read_records(io.BytesIO(data), "ndjson"))
+    assert (report["inserted"], report["invalid"]) == (3, 2)
+    assert [e["error"] for e in report["errors"]] == [
+        "Vehicle is already booked for these dates: 7",
+        "Vehicle is already booked for these dates: row 2",
+    ]
+    assert [values[2:4] for values in cursor.executemany.call_args.args[1]] == [
+        ("A1", "2024-02-01"), ("A1", "2024-02-05"), ("A2", "2024-02-05"),
+    ]
+
+def test_unknown_table_or_format():
+    """Test that unsupported tables and formats are rejected."""
+    with pytest.raises(ImporterError):
+        Importer(MagicMock(), "payment")
+    with pytest.raises(ImporterError):
+        list(read_records(io.BytesIO(b""), "xml"))
+
+if __name__ == "__main__":
+    pytest.main()
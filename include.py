@@ -0,0 +1,58 @@
+from lookup import get_many
+
+# ?include=customer,vehicle,status on the booking endpoints. The records a
+# page refers to are fetched with one batched lookup per relation (see
+# lookup.py), never one query per booking, and returned once each in a
+# top-level "included" section, however many bookings share them.
+
+# relation -> (table, primary key, foreign key in booking)
+RELATIONS = {
+    "customer": ("customer", "customer_id", "Customer_customer_id"),
+    "vehicle": ("vehicle", "reg_number", "Vehicle_reg_number"),
+    "status": ("booking_status", "status_code", "booking_status_code"),
+}
+
+
+class IncludeError(ValueError):
+    pass
+
+
+# Parse ?include= into a tuple of relation names, or None
+def parse_include(args):
+    value = args.get("include")
+    if value is None:
+        return None
+    include = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    if not include:
+        raise IncludeError("include must name at least one relation")
+    unknown = [name for name in include if name not in RELATIONS]
+    if unknown:
+        raise IncludeError(f"Unknown relation(s): {', '.join(unknown)}. include must be among: {', '.join(RELATIONS)}")
+    return include
+
+# Tables an ?include= response also depends on, for its ETag. An invalid
+# value gives none; the handler rejects it.
+def included_tables(args):
+    try:
+        include = parse_include(args) or ()
+    except IncludeError:
+        return ()
+    return tuple(RELATIONS[name][0] for name in include)
+
+# The requested fields plus the foreign keys the included records are
+# matched by
+def with_foreign_keys(fields, include):
+    if fields is None or not include:
+        return fields
+    return tuple(dict.fromkeys((*fields, *(RELATIONS[name][2] for name in include))))
+
+# {relation: [record, ...]} for the records `rows` refer to, each once, in
+# order of first reference
+def fetch_included(cursor, rows, include, cache=None):
+    included = {}
+    for name in include:
+        table, pk, fk = RELATIONS[name]
+        keys = list(dict.fromkeys(row[fk] for row in rows if row.get(fk) is not None))
+        found = get_many(cursor, cache, table, pk, keys) if keys else {}
+        included[name] = [found[key] for key in keys if key in found]
+    return included
@@ -0,0 +1,48 @@
+import pytest
+from unittest.mock import MagicMock
+from include import IncludeError, parse_include, included_tables, with_foreign_keys, fetch_included
+
+BOOKINGS = [
+    {"booking_id": 1, "Customer_customer_id": 1, "Vehicle_reg_number": "A", "booking_status_code": "PENDING"},
+    {"booking_id": 2, "Customer_customer_id": 2, "Vehicle_reg_number": "A", "booking_status_code": "PENDING"},
+    {"booking_id": 3, "Customer_customer_id": 1, "Vehicle_reg_number": "B", "booking_status_code": "PENDING"},
+]
+
+def test_parse_include():
+    """Test parsing, de-duplication and the tables used for the ETag."""
+    assert parse_include({}) is None
+    assert parse_include({"include": "vehicle, status,vehicle"}) == ("vehicle", "status")
+    assert included_tables({"include": "customer,status"}) == ("customer", "booking_status")
+    assert included_tables({"include": "payments"}) == ()
+
+@pytest.mark.parametrize("value", ["", " , ", "vehicle,payments"])
+def test_invalid_include(value):
+    """Test that empty and unknown relations are rejected."""
+    with pytest.raises(IncludeError):
+        parse_include({"include": value})
+
+def test_foreign_keys_are_selected():
+    """Test that ?fields= keeps the keys the included records are matched by."""
+    assert with_foreign_keys(None, ("vehicle",)) is None
+    assert with_foreign_keys(("booking_id",), None) == ("booking_id",)
+    assert with_foreign_keys(("booking_id",), ("vehicle", "customer")) == \
+        ("booking_id", "Vehicle_reg_number", "Customer_customer_id")
+
+def test_one_query_per_relation_and_no_duplicates():
+    """Test that shared records are fetched and returned once."""
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [
+        [{"reg_number": "B"}, {"reg_number": "A"}],
+        [{"status_code": "PENDING", "description": "Pending"}],
+    ]
+    included = fetch_included(cursor, BOOKINGS, ("vehicle", "status"))
+    assert cursor.execute.call_count == 2
+    assert cursor.execute.call_args_list[0].args[1] == ["A", "B"]
+    assert included == {
+        "vehicle": [{"reg_number": "A"}, {"reg_number": "B"}],
+        "status": [{"status_code": "PENDING", "description": "Pending"}],
+    }
+    assert fetch_included(MagicMock(), [], ("customer",)) == {"customer": []}
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,121 @@
+import re
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fast JSON for API responses.
+#
+# jsonify() output must stay byte-for-byte what Flask's default provider
+# produces: sorted keys, compact separators, ASCII-only with \uXXXX
+# escapes, floats as repr() and dates in HTTP date format. With orjson
+# installed, compact responses are encoded by orjson and the few places
+# it differs are patched up or sent back to the standard encoder:
+#
+# * non-ASCII (and DEL) characters are escaped afterwards, as ensure_ascii
+#   would have;
+# * dates go through `default` (orjson would write ISO 8601); their HTTP
+#   form is cached, since the same days repeat across booking rows;
+# * anything orjson rejects (ints beyond 64 bits, non-string keys,
+#   subclasses of built-in types) and any output that may hold a float
+#   in exponent notation, which orjson writes differently from repr(),
+#   is encoded again by the standard library.
+#
+# One difference is left: NaN and infinity become null rather than the
+# invalid JSON tokens the standard encoder writes. Indented output (debug
+# mode) and other dumps() arguments always use the standard library.
+
+_ESCAPE = re.compile(r"[^\x00-\x7e]")
+# orjson writes exponents as e.g. 1e16 or 1.5e-7; the literal search is
+# much cheaper than the full pattern and rules out most responses.
+_EXPONENT_HINT = re.compile(rb"e[-0-9]")
+_EXPONENT = re.compile(rb"(?:^|[:,\[])-?\d+(?:\.\d+)?e")
+_COMPACT = (",", ":")
+_DATE_CACHE_SIZE = 65536
+
+
+def _escape_char(match):
+    n = ord(match.group())
+    if n < 0x10000:
+        return f"\\u{n:04x}"
+    n -= 0x10000
+    return f"\\u{0xd800 | (n >> 10):04x}\\u{0xdc00 | (n & 0x3ff):04x}"
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with an orjson fast path for compact output.
+
+    Also serializes bytes (as UTF-8 text), which mysql.connector returns
+    for binary and some text columns.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._http_dates = {}
+        self.fast_dumps = 0
+        self.fallbacks = 0
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (bytes, bytearray)):
+            return o.decode("utf-8", "replace")
+        return DefaultJSONProvider.default(o)
+
+    def _fast_default(self, o):
+        if type(o) is date:
+            text = self._http_dates.get(o)
+            if text is None:
+                if len(self._http_dates) >= _DATE_CACHE_SIZE:
+                    self._http_dates.clear()
+                text = self._http_dates[o] = http_date(o)
+            return text
+        if isinstance(o, datetime):
+            return http_date(o)
+        return self.default(o)
+
+    # Compact, Flask-identical bytes, or None if only the standard
+    # encoder can produce them.
+    def _fast(self, obj):
+        try:
+            data = orjson.dumps(obj, default=self._fast_default, option=(
+                orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_SUBCLASS
+            ))
+        except TypeError:
+            return None
+        if _EXPONENT_HINT.search(data) and _EXPONENT.search(data):
+            return None
+        if not data.isascii() or b"\x7f" in data:
+            data = _ESCAPE.sub(_escape_char, data.decode()).encode()
+        return data
+
+    def _fast_enabled(self):
+        return orjson is not None and self.ensure_ascii and self.sort_keys
+
+    def dumps(self, obj, **kwargs):
+        if self._fast_enabled() and kwargs == {"separators": _COMPACT}:
+            data = self._fast(obj)
+            if data is not None:
+                self.fast_dumps += 1
+                return data.decode()
+            self.fallbacks += 1
+        return super().dumps(obj, **kwargs)
+
+    # As DefaultJSONProvider.response, without the bytes -> str -> bytes
+    # round trip on the fast path.
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        data = self._fast(obj) if self._fast_enabled() else None
+        if data is not None:
+            self.fast_dumps += 1
+        else:
+            if self._fast_enabled():
+                self.fallbacks += 1
+            data = super().dumps(obj, separators=_COMPACT).encode()
+        return self._app.response_class(data + b"\n", mimetype=self.mimetype)
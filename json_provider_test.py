@@ -0,0 +1,92 @@
+import random
+import pytest
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from uuid import UUID
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+import json_provider
+from json_provider import FastJSONProvider
+
+@dataclass
+class Point:
+    x: int
+    y: float
+
+@pytest.fixture
+def apps():
+    default, fast = Flask("default"), Flask("fast")
+    fast.json = FastJSONProvider(fast)
+    return default, fast
+
+def encode(app, value):
+    with app.app_context():
+        return jsonify(value).get_data()
+
+def random_text(rng):
+    alphabet = "abcXYZ09 \"\\/\n\t\x00\x1f\x7f\x80é€ 😀\U0010ffff"
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+
+def random_value(rng, depth=0):
+    kind = rng.randrange(11 if depth < 3 else 9)
+    if kind == 0:
+        return rng.choice([None, True, False])
+    if kind == 1:
+        return rng.choice([0, -1, 2 ** 53, -2 ** 63, 2 ** 64 - 1, 2 ** 70, rng.randint(-10 ** 6, 10 ** 6)])
+    if kind == 2:
+        return rng.choice([0.1, -0.0, 1e15, 1e16, 1.5e-7, 0.0001, 2.5, 1 / 3, rng.uniform(-1e6, 1e6)])
+    if kind in (3, 4):
+        return random_text(rng)
+    if kind == 5:
+        return date(2020, 1, 1) + timedelta(days=rng.randint(0, 2000))
+    if kind == 6:
+        return rng.choice([datetime(2024, 2, 29, 13, 5, 9), datetime(2024, 2, 29, 13, 5, 9, tzinfo=timezone(timedelta(hours=2)))])
+    if kind == 7:
+        return rng.choice([Decimal("99.90"), Decimal("-1E+3"), UUID(int=rng.getrandbits(128))])
+    if kind == 8:
+        return Point(rng.randint(0, 9), 0.5)
+    if kind == 9:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 5))]
+    return {random_text(rng): random_value(rng, depth + 1) for _ in range(rng.randint(0, 5))}
+
+def test_fuzz_matches_flask(apps):
+    """Test that the fast provider gives Flask's exact bytes for random documents."""
+    default, fast = apps
+    rng = random.Random(14)
+    for _ in range(2000):
+        value = random_value(rng)
+        assert encode(fast, value) == encode(default, value), value
+
+def test_booking_rows_use_fast_path(apps):
+    """Test that typical list responses are encoded by orjson, not the fallback."""
+    if json_provider.orjson is None:
+        pytest.skip("orjson is not installed")
+    default, fast = apps
+    rows = [{"booking_id": i, "date_from": date(2024, 1, 1) + timedelta(days=i % 30), "date_to": date(2024, 2, 1),
+             "Vehicle_reg_number": "AB1E2CD", "booking_status_code": "C", "Customer_customer_id": i % 7}
+            for i in range(100)]
+    body = {"success": True, "data": rows, "next_cursor": None}
+    assert encode(fast, body) == encode(default, body)
+    assert (fast.json.fast_dumps, fast.json.fallbacks) == (1, 0)
+
+def test_fallbacks(apps):
+    """Test that values orjson cannot match are sent to the standard encoder."""
+    if json_provider.orjson is None:
+        pytest.skip("orjson is not installed")
+    default, fast = apps
+    for value in ({"n": 2 ** 64}, {1: "int key"}, [1e16], 1e-7):
+        assert encode(fast, value) == encode(default, value)
+    assert fast.json.fallbacks == 4
+
+def test_dumps_and_bytes(apps):
+    """Test app.json.dumps with other arguments, and bytes values."""
+    _, fast = apps
+    with fast.app_context():
+        assert fast.json.dumps({"b": 1, "a": [1, 2]}) == DefaultJSONProvider(fast).dumps({"b": 1, "a": [1, 2]})
+        assert fast.json.dumps({"a": b"caf\xc3\xa9"}, separators=(",", ":")) == '{"a":"caf\\u00e9"}'
+    fast.debug = True
+    assert encode(fast, {"a": 1}) == b'{\n  "a": 1\n}\n'
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,65 @@
+from cache import MISSING
+from conn import LOOKUP_CONFIG
+
+# Batched primary-key lookups. Keys already in the entity cache are served
+# from it; the rest are read with one `WHERE pk IN (...)` query per
+# chunk_size keys, so N rows cost N / chunk_size round trips instead of N.
+
+
+class KeyListError(ValueError):
+    pass
+
+
+def _check_count(keys):
+    if not keys:
+        raise KeyListError("At least one key is required")
+    if len(keys) > LOOKUP_CONFIG["max_keys"]:
+        raise KeyListError(f"At most {LOOKUP_CONFIG['max_keys']} keys per request")
+    return keys
+
+# Keys from a comma-separated query parameter, e.g. ?reg_number=A,B,C
+def split_keys(value):
+    return _check_count(list(dict.fromkeys(key.strip() for key in value.split(",") if key.strip())))
+
+# Integer keys from a JSON array, e.g. [1, 2, 3]
+def parse_ids(value):
+    if not isinstance(value, list) or any(isinstance(key, bool) or not isinstance(key, int) for key in value):
+        raise KeyListError("Request body must be a JSON array of integer IDs")
+    return _check_count(list(dict.fromkeys(value)))
+
+
+# Rows of `table` whose primary key `pk` is one of `keys`
+def fetch_by_keys(cursor, table, pk, keys, chunk_size=None):
+    chunk_size = chunk_size or LOOKUP_CONFIG["chunk_size"]
+    keys = list(keys)
+    rows = []
+    for i in range(0, len(keys), chunk_size):
+        chunk = keys[i:i + chunk_size]
+        cursor.execute(f"SELECT * FROM {table} WHERE {pk} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+# {key: row} for the keys that exist, reading through `cache` (an
+# EntityCache, or None). `cursor` must return dict rows.
+def get_many(cursor, cache, table, pk, keys):
+    found = {}
+    wanted = []
+    for key in dict.fromkeys(keys):
+        row = cache.get(table, key) if cache is not None else MISSING
+        if row is MISSING:
+            wanted.append(key)
+        else:
+            found[key] = row
+    if wanted:
+        generation = cache.generation if cache is not None else None
+        for row in fetch_by_keys(cursor, table, pk, wanted):
+            found[row[pk]] = row
+            if cache is not None:
+                cache.set(table, row[pk], row, generation)
+    return found
+
+# The rows for `keys`, in the order of `keys`, and the keys that matched
+# no row
+def lookup(cursor, cache, table, pk, keys):
+    found = get_many(cursor, cache, table, pk, keys)
+    return [found[key] for key in keys if key in found], [key for key in keys if key not in found]
@@ -0,0 +1,61 @@
+import pytest
+from unittest.mock import MagicMock
+from cache import EntityCache
+from conn import LOOKUP_CONFIG
+from lookup import KeyListError, fetch_by_keys, get_many, lookup, parse_ids, split_keys
+from storage import SQLiteStorage
+
+def test_fetch_by_keys_chunks():
+    """Test one IN query per chunk of keys."""
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [[{"reg_number": "A"}, {"reg_number": "B"}], [{"reg_number": "C"}]]
+    rows = fetch_by_keys(cursor, "vehicle", "reg_number", ["A", "B", "C"], chunk_size=2)
+    assert [row["reg_number"] for row in rows] == ["A", "B", "C"]
+    assert [c.args for c in cursor.execute.call_args_list] == [
+        ("SELECT * FROM vehicle WHERE reg_number IN (%s, %s)", ["A", "B"]),
+        ("SELECT * FROM vehicle WHERE reg_number IN (%s)", ["C"]),
+    ]
+
+def test_get_many_reads_through_the_cache():
+    """Test that cached keys are not queried and fetched rows are cached."""
+    cache = EntityCache(["vehicle"])
+    cache.set("vehicle", "A", {"reg_number": "A", "model_code": "cached"})
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [{"reg_number": "B", "model_code": "M1"}]
+    found = get_many(cursor, cache, "vehicle", "reg_number", ["A", "B", "A", "Z"])
+    assert found == {"A": {"reg_number": "A", "model_code": "cached"}, "B": {"reg_number": "B", "model_code": "M1"}}
+    cursor.execute.assert_called_once_with("SELECT * FROM vehicle WHERE reg_number IN (%s, %s)", ["B", "Z"])
+    assert cache.get("vehicle", "B") == {"reg_number": "B", "model_code": "M1"}
+
+def test_key_lists(monkeypatch):
+    """Test parsing, de-duplication and the cap on keys per request."""
+    assert split_keys(" A,B,,A ") == ["A", "B"]
+    assert parse_ids([3, 1, 3]) == [3, 1]
+    monkeypatch.setitem(LOOKUP_CONFIG, "max_keys", 2)
+    for bad in (lambda: split_keys(","), lambda: split_keys("A,B,C"), lambda: parse_ids([]),
+                lambda: parse_ids([1, "2"]), lambda: parse_ids([True]), lambda: parse_ids({"ids": [1]})):
+        with pytest.raises(KeyListError):
+            bad()
+
+def test_lookup_keeps_request_order():
+    """Test that found rows follow the requested order and missing keys are listed."""
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [{"booking_id": 1}, {"booking_id": 3}]
+    assert lookup(cursor, None, "booking", "booking_id", [3, 2, 1]) == ([{"booking_id": 3}, {"booking_id": 1}], [2])
+
+# booking_status is left out: it holds a few rows, and SQLite rightly
+# scans it instead
+@pytest.mark.parametrize("table, pk", [("customer", "customer_id"), ("vehicle", "reg_number"), ("booking", "booking_id")])
+def test_lookups_use_the_primary_key(table, pk):
+    """Test that the IN query is answered from the primary key."""
+    storage = SQLiteStorage()
+    conn = storage.connect()
+    cursor = conn.cursor()
+    cursor.execute(f"EXPLAIN SELECT * FROM {table} WHERE {pk} IN (%s, %s, %s)", (1, 2, 3))
+    plan = [row[-1] for row in cursor.fetchall()]
+    assert plan and not any(step.startswith("SCAN") for step in plan)
+    conn.close()
+    storage.close()
+
+if __name__ == "__main__":
+    pytest.main()
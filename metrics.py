@@ -0,0 +1,251 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+# Request and database metrics in the Prometheus text format.
+#
+# Each worker process keeps its own counters in memory; recording a value
+# is a dict update under an uncontended lock. With a `directory`, every
+# worker also writes a snapshot of its values there at most every
+# `flush_interval` seconds, and /metrics served by any worker merges all
+# snapshots: counters and histograms are summed over every process that
+# ever ran (so they never go backwards when a worker is replaced), gauges
+# over the processes still alive.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000, 100000000)
+
+# name -> (type, help, label names, buckets)
+METRICS = {
+    "carhire_http_request_duration_seconds": ("histogram", "Request latency by route and status", ("method", "route", "status"), LATENCY_BUCKETS),
+    "carhire_http_response_size_bytes": ("histogram", "Response body size by route, when known up front", ("method", "route"), SIZE_BUCKETS),
+    "carhire_http_requests_in_flight": ("gauge", "Requests being handled", (), None),
+    "carhire_db_connections_opened_total": ("counter", "Database connections opened", (), None),
+    "carhire_db_queries_total": ("counter", "Statements executed", (), None),
+    "carhire_db_query_seconds_total": ("counter", "Time spent in cursor.execute", (), None),
+    "carhire_db_rows_fetched_total": ("counter", "Rows fetched from cursors", (), None),
+}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Metrics:
+    """Metric values of one process, optionally shared through `directory`."""
+
+    def __init__(self, directory=None, flush_interval=1.0, enabled=True):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._token = uuid.uuid4().hex[:8]
+        self._flushed_at = 0.0
+        # name -> {label values: value}; histogram values are
+        # [count per bucket..., count in +Inf, sum]
+        self._values = {name: {} for name in METRICS}
+
+    # A forked worker starts from zero instead of re-counting its parent's
+    # values under a new file.
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def inc(self, name, value=1, labels=()):
+        self._check_pid()
+        with self._lock:
+            series = self._values[name]
+            series[labels] = series.get(labels, 0) + value
+
+    def observe(self, name, value, labels=()):
+        self._check_pid()
+        buckets = METRICS[name][3]
+        with self._lock:
+            series = self._values[name]
+            counts = series.get(labels)
+            if counts is None:
+                counts = series[labels] = [0] * (len(buckets) + 2)
+            counts[bisect_left(buckets, value)] += 1
+            counts[-1] += value
+
+    def snapshot(self):
+        self._check_pid()
+        with self._lock:
+            values = {name: [[list(labels), list(v) if isinstance(v, list) else v] for labels, v in series.items()]
+                      for name, series in self._values.items()}
+        return {"pid": self._pid, "values": values}
+
+    def _path(self):
+        return os.path.join(self.directory, f"metrics-{self._pid}-{self._token}.json")
+
+    # Write this process's snapshot for the other workers; at most once
+    # per flush_interval unless forced.
+    def flush(self, force=False):
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._flushed_at < self.flush_interval:
+            return
+        self._flushed_at = now
+        snapshot = self.snapshot()
+        path = self._path()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+
+    # Merged values of every process: {name: {label values: value}}
+    def collect(self):
+        snapshots = [self.snapshot()]
+        if self.directory:
+            self.flush(force=True)
+            own = self._path()
+            for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+                if path == own:
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        merged = {name: {} for name in METRICS}
+        for snapshot in snapshots:
+            live = snapshot["pid"] == os.getpid() or _pid_alive(snapshot["pid"])
+            for name, series in snapshot["values"].items():
+                if name not in METRICS or (METRICS[name][0] == "gauge" and not live):
+                    continue
+                target = merged[name]
+                for labels, value in series:
+                    labels = tuple(labels)
+                    if isinstance(value, list):
+                        current = target.get(labels)
+                        target[labels] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        target[labels] = target.get(labels, 0) + value
+        return merged
+
+    def render(self):
+        lines = []
+        for name, series in self.collect().items():
+            kind, help_text, label_names, buckets = METRICS[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind != "histogram":
+                if not series and not label_names:
+                    series = {(): 0}
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+                continue
+            for labels, counts in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = 'le="' + _number(bound) + '"'
+                    lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(label_names, labels)} {_number(counts[-1])}")
+                lines.append(f"{name}_count{_labels(label_names, labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class MeteredCursor:
+    """Cursor proxy counting statements, execute time and fetched rows.
+
+    With a `profiler` (see profiler.py), each statement is also recorded
+    there under its fingerprint.
+    """
+
+    def __init__(self, cursor, metrics, profiler=None):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._profiler = profiler
+
+    def _timed(self, method, operation, args, kwargs, many=False):
+        start = time.perf_counter()
+        try:
+            return method(operation, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            if self._metrics.enabled:
+                self._metrics.inc("carhire_db_queries_total")
+                self._metrics.inc("carhire_db_query_seconds_total", elapsed)
+            if self._profiler is not None:
+                params = None if many else (args[0] if args else kwargs.get("params")) or ()
+                self._profiler.record(operation, params, elapsed)
+
+    def execute(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.execute, operation, args, kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.executemany, operation, args, kwargs, many=True)
+
+    def _fetched(self, count):
+        if count and self._metrics.enabled:
+            self._metrics.inc("carhire_db_rows_fetched_total", count)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._fetched(row is not None)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._fetched(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._fetched(len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class MeteredConnection:
+    """Connection proxy whose cursors are metered."""
+
+    def __init__(self, conn, metrics, profiler=None):
+        self._conn = conn
+        self._metrics = metrics
+        self._profiler = profiler
+        metrics.inc("carhire_db_connections_opened_total")
+
+    def cursor(self, *args, **kwargs):
+        return MeteredCursor(self._conn.cursor(*args, **kwargs), self._metrics, self._profiler)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
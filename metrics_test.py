@@ -0,0 +1,75 @@
+import json
+import os
+import pytest
+from unittest.mock import MagicMock
+from metrics import Metrics, MeteredConnection
+
+def test_histogram_rendering():
+    """Test cumulative buckets, sum and count in the text format."""
+    metrics = Metrics()
+    metrics.observe("carhire_http_request_duration_seconds", 0.003, ("GET", "/api/vehicle", "200"))
+    metrics.observe("carhire_http_request_duration_seconds", 0.2, ("GET", "/api/vehicle", "200"))
+    text = metrics.render()
+    labels = 'method="GET",route="/api/vehicle",status="200"'
+    assert f'carhire_http_request_duration_seconds_bucket{{{labels},le="0.0025"}} 0' in text
+    assert f'carhire_http_request_duration_seconds_bucket{{{labels},le="0.005"}} 1' in text
+    assert f'carhire_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f'carhire_http_request_duration_seconds_count{{{labels}}} 2' in text
+    assert "# TYPE carhire_db_queries_total counter\ncarhire_db_queries_total 0\n" in text
+
+def test_label_values_are_escaped():
+    """Test that quotes in label values cannot break the exposition."""
+    metrics = Metrics()
+    metrics.observe("carhire_http_response_size_bytes", 10, ("GET", '/a"b'))
+    assert 'route="/a\\"b"' in metrics.render()
+
+def test_workers_are_merged(tmp_path):
+    """Test that counters add up across workers and dead workers' gauges are dropped."""
+    worker_a = Metrics(str(tmp_path))
+    worker_b = Metrics(str(tmp_path))
+    worker_a.inc("carhire_db_queries_total", 3)
+    worker_b.inc("carhire_db_queries_total", 4)
+    worker_b.inc("carhire_http_requests_in_flight")
+    worker_b.flush(force=True)
+
+    dead = {"pid": 2 ** 22 + 12345, "values": {
+        "carhire_db_queries_total": [[[], 10]],
+        "carhire_http_requests_in_flight": [[[], 5]],
+    }}
+    with open(os.path.join(tmp_path, "metrics-dead.json"), "w") as f:
+        json.dump(dead, f)
+
+    merged = worker_a.collect()
+    assert merged["carhire_db_queries_total"][()] == 17
+    assert merged["carhire_http_requests_in_flight"][()] == 1
+
+def test_metered_cursor_counts_queries_and_rows():
+    """Test the cursor proxy's counters."""
+    metrics = Metrics()
+    raw = MagicMock()
+    raw.cursor.return_value.fetchall.return_value = [(1,), (2,)]
+    conn = MeteredConnection(raw, metrics)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT 1")
+    cursor.fetchall()
+    conn.commit()
+
+    raw.cursor.assert_called_once_with(dictionary=True)
+    raw.commit.assert_called_once()
+    merged = metrics.collect()
+    assert merged["carhire_db_connections_opened_total"][()] == 1
+    assert merged["carhire_db_queries_total"][()] == 1
+    assert merged["carhire_db_rows_fetched_total"][()] == 2
+
+def test_metrics_endpoint_reports_routes():
+    """Test that requests show up at /metrics under their route."""
+    from api import app
+    client = app.test_client()
+    client.get("/")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    assert 'carhire_http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.get_data(as_text=True)
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,293 @@
+import argparse
+import ast
+import os
+import sys
+from conn import STORAGE_CONFIG
+from schema import INDEXES, FOREIGN_KEYS, SEED
+
+# Versioned schema migrations. Each migration is a numbered list of steps
+# over the definitions in schema.py; schema_migrations records the ones a
+# database has had, and migrate() applies the rest in order. Every step
+# checks whether its object already exists, so a database built by hand,
+# or a migration interrupted half way (MySQL commits each DDL statement),
+# is brought up to date by running migrate() again.
+#
+# On MySQL, indexes and foreign keys are added with ALGORITHM=INPLACE,
+# LOCK=NONE, so reads and writes continue while they build, and a named
+# lock keeps two deploys from migrating at once.
+
+MIGRATIONS_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT NOT NULL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB
+"""
+
+# (version, name, steps). Never edit an applied migration; add a new one.
+MIGRATIONS = (
+    (1, "Core tables and booking statuses", (
+        ("table", "booking_status"),
+        ("table", "customer"),
+        ("table", "vehicle"),
+        ("table", "booking"),
+        ("seed", "booking_status"),
+    )),
+    (2, "Foreign keys on booking", (
+        ("foreign_key", "fk_booking_status"),
+        ("foreign_key", "fk_booking_customer"),
+        ("foreign_key", "fk_booking_vehicle"),
+    )),
+    (3, "Table versions and import checkpoints", (
+        ("table", "table_version"),
+        ("table", "import_checkpoint"),
+    )),
+    (4, "Lookup and sort indexes", (
+        ("index", "idx_booking_vehicle_dates"),
+        ("index", "idx_booking_customer"),
+        ("index", "idx_booking_status"),
+        ("index", "idx_booking_date_from"),
+        ("index", "idx_booking_date_to"),
+        ("index", "idx_customer_name"),
+        ("index", "idx_customer_email"),
+        ("index", "idx_vehicle_model"),
+        ("index", "idx_vehicle_category"),
+        ("index", "idx_vehicle_mileage"),
+    )),
+    (5, "Status and date indexes for booking filters", (
+        ("index", "idx_booking_status_date_from"),
+        ("index", "idx_booking_status_date_to"),
+    )),
+    (6, "Daily booking summary", (
+        ("table", "booking_daily"),
+        ("backfill", "booking_daily"),
+    )),
+    (7, "Idempotency keys", (
+        ("table", "idempotency_key"),
+        ("index", "idx_idempotency_expires"),
+    )),
+)
+
+LOCK_NAME = "carhire_schema_migrations"
+LOCK_TIMEOUT = 600
+
+# Modules whose per-request statements must be answered from an index
+HOT_QUERY_MODULES = ("api.py", "conflicts.py", "versions.py", "reports.py", "history.py", "idempotency.py")
+
+
+class MigrationError(Exception):
+    pass
+
+
+def _index_exists(storage, cursor, name):
+    cursor.execute(storage.index_query)
+    return name in {row[0] for row in cursor.fetchall()}
+
+def _foreign_key_exists(cursor, name):
+    cursor.execute(
+        "SELECT 1 FROM information_schema.TABLE_CONSTRAINTS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND CONSTRAINT_TYPE = 'FOREIGN KEY' AND CONSTRAINT_NAME = %s",
+        (name,)
+    )
+    return cursor.fetchone() is not None
+
+def _add_index(storage, cursor, name):
+    table, columns = INDEXES[name]
+    if _index_exists(storage, cursor, name):
+        return
+    if storage.dialect == "mysql":
+        cursor.execute(f"ALTER TABLE {table} ADD INDEX {name} ({', '.join(columns)}), ALGORITHM=INPLACE, LOCK=NONE")
+    else:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+# SQLite tables are created with their foreign keys and cannot gain one
+# later, so this only ever does work on MySQL. Rows that would violate
+# the key are reported instead of being found by a failed ALTER; with
+# none, the key is added in place without re-checking every row.
+def _add_foreign_key(storage, cursor, name):
+    if storage.dialect != "mysql" or _foreign_key_exists(cursor, name):
+        return
+    table, column, ref_table, ref_column = FOREIGN_KEYS[name]
+    cursor.execute(
+        f"SELECT COUNT(*) FROM {table} t LEFT JOIN {ref_table} r ON r.{ref_column} = t.{column} "
+        f"WHERE r.{ref_column} IS NULL"
+    )
+    orphans = cursor.fetchone()[0]
+    if orphans:
+        raise MigrationError(f"{name}: {orphans} {table} rows reference a missing {ref_table}")
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    try:
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {ref_table} ({ref_column}), "
+            "ALGORITHM=INPLACE, LOCK=NONE"
+        )
+    finally:
+        cursor.execute("SET SESSION foreign_key_checks = 1")
+
+def _seed(cursor, table):
+    columns, rows = SEED[table]
+    cursor.executemany(
+        f"INSERT IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+        rows
+    )
+
+def apply_step(storage, cursor, step):
+    kind, name = step
+    if kind == "table":
+        cursor.execute(storage.tables[name])
+    elif kind == "index":
+        _add_index(storage, cursor, name)
+    elif kind == "foreign_key":
+        _add_foreign_key(storage, cursor, name)
+    elif kind == "seed":
+        _seed(cursor, name)
+    elif kind == "backfill":
+        # Summary tables are filled from the rows they summarise
+        from reports import backfill
+        backfill(cursor)
+    else:
+        raise MigrationError(f"Unknown migration step: {kind}")
+
+# Versions already applied to the database behind `cursor`
+def applied_versions(cursor):
+    cursor.execute(MIGRATIONS_TABLE_DDL)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+# Apply the migrations up to `target` (default: all) that the database
+# has not had yet. Returns the versions applied.
+def migrate(storage, conn, target=None):
+    cursor = conn.cursor()
+    locked = False
+    try:
+        if storage.dialect == "mysql":
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+            locked = cursor.fetchone()[0] == 1
+            if not locked:
+                raise MigrationError("Another process is migrating this database")
+        done = applied_versions(cursor)
+        applied = []
+        for version, name, steps in MIGRATIONS:
+            if version in done or (target is not None and version > target):
+                continue
+            for step in steps:
+                apply_step(storage, cursor, step)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+            applied.append(version)
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if locked:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchall()
+        cursor.close()
+
+# (version, name, applied) for every known migration
+def migration_status(conn):
+    cursor = conn.cursor()
+    try:
+        done = applied_versions(cursor)
+    finally:
+        cursor.close()
+    return [(version, name, version in done) for version, name, _ in MIGRATIONS]
+
+
+# SELECT, UPDATE and DELETE statements with a WHERE clause written in
+# `path`, as string literals. Interpolated parts of f-strings (column
+# lists, SET lists) are replaced by *.
+def hot_queries(path):
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            sql = node.value
+        elif isinstance(node, ast.JoinedStr):
+            sql = "".join(v.value if isinstance(v, ast.Constant) else "*" for v in node.values)
+        else:
+            continue
+        sql = " ".join(sql.split())
+        if sql[:6].upper() in ("SELECT", "UPDATE", "DELETE") and " WHERE " in sql.upper():
+            yield node.lineno, sql
+
+# The SELECT that finds the rows an UPDATE or DELETE would change
+def _as_select(sql):
+    upper = sql.upper()
+    where = upper.index(" WHERE ")
+    if upper.startswith("UPDATE "):
+        return f"SELECT 1 FROM {sql[7:upper.index(' SET ')]}{sql[where:]}"
+    if upper.startswith("DELETE FROM "):
+        return f"SELECT 1 FROM {sql[12:where]}{sql[where:]}"
+    return sql
+
+# Statements among `queries` whose plan reads a whole table, or that do
+# not run against the schema at all, as (query, plan) pairs. `conn` must be an SQLite connection with the
+# migrated schema; its tables, keys and indexes match MySQL's.
+def unsupported_queries(conn, queries):
+    unsupported = []
+    cursor = conn.cursor()
+    try:
+        for query in queries:
+            sql = _as_select(query)
+            try:
+                cursor.execute("EXPLAIN " + sql, (None,) * sql.count("%s"))
+                plan = [row[-1] for row in cursor.fetchall()]
+            except Exception as e:
+                plan = [f"cannot be planned: {e}"]
+            if any(step.startswith(("SCAN", "cannot")) for step in plan):
+                unsupported.append((query, plan))
+    finally:
+        cursor.close()
+    return unsupported
+
+# Run the hot-query check against a scratch in-memory database
+def check_hot_queries(directory=None):
+    from storage import SQLiteStorage
+    directory = directory or os.path.dirname(os.path.abspath(__file__))
+    queries = {}
+    for module in HOT_QUERY_MODULES:
+        for lineno, sql in hot_queries(os.path.join(directory, module)):
+            queries.setdefault(sql, f"{module}:{lineno}")
+    storage = SQLiteStorage()
+    conn = storage.connect()
+    try:
+        return [(queries[sql], sql, plan) for sql, plan in unsupported_queries(conn, queries)]
+    finally:
+        conn.close()
+        storage.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply the car hire schema migrations.")
+    parser.add_argument("--url", default=STORAGE_CONFIG["url"], help="storage URL (default: DB_BACKEND)")
+    parser.add_argument("--target", type=int, help="stop after this migration version")
+    parser.add_argument("--status", action="store_true", help="list migrations and whether each is applied")
+    parser.add_argument("--check", action="store_true", help="fail if a hot query has no supporting index")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        unsupported = check_hot_queries()
+        for location, sql, plan in unsupported:
+            print(f"{location}: {sql}\n    {'; '.join(plan)}", file=sys.stderr)
+        print(f"{len(unsupported)} hot queries without a supporting index")
+        return 1 if unsupported else 0
+
+    from storage import make_storage
+    storage = make_storage(args.url)
+    conn = storage.connect()
+    try:
+        if args.status:
+            for version, name, applied in migration_status(conn):
+                print(f"{version:4d}  {'applied' if applied else 'pending':8}  {name}")
+        else:
+            applied = migrate(storage, conn, args.target)
+            print(f"Applied {len(applied)} migration(s) to {storage!r}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
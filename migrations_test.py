@@ -0,0 +1,76 @@
+import pytest
+from migrations import MIGRATIONS, migrate, migration_status, check_hot_queries, hot_queries, unsupported_queries
+from schema import INDEXES, FOREIGN_KEYS, SEED
+from storage import SQLiteStorage
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "carhire.db"))
+    yield storage
+    storage.close()
+
+def index_names(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+    return {row[0] for row in cursor.fetchall()}
+
+def test_migrations_apply_in_order(storage):
+    """Test a partial migration, the rest, and a no-op re-run."""
+    conn = storage._open()
+    assert migrate(storage, conn, target=2) == [1, 2]
+    assert index_names(conn) == set()
+    assert [applied for _, _, applied in migration_status(conn)] == [True, True, False, False, False, False, False]
+
+    assert migrate(storage, conn) == [3, 4, 5, 6, 7]
+    assert index_names(conn) == set(INDEXES)
+    assert migrate(storage, conn) == []
+    conn.close()
+
+def test_adopts_hand_built_database(storage):
+    """Test that tables and indexes created outside the migrations are kept."""
+    conn = storage._open()
+    cursor = conn.cursor()
+    cursor.execute(storage.tables["customer"])
+    cursor.execute("INSERT INTO customer (customer_name, email_address) VALUES ('Ann', 'ann@example.com')")
+    cursor.execute("CREATE INDEX idx_customer_name ON customer (customer_name, customer_id)")
+    conn.commit()
+
+    assert migrate(storage, conn) == [version for version, _, _ in MIGRATIONS]
+    cursor.execute("SELECT COUNT(*) FROM customer")
+    assert cursor.fetchone()[0] == 1
+    conn.close()
+
+def test_every_schema_object_has_a_migration():
+    """Test that no index, foreign key or seed in schema.py is left out of the migrations."""
+    steps = {step for _, _, migration_steps in MIGRATIONS for step in migration_steps}
+    assert {("index", name) for name in INDEXES} <= steps
+    assert {("foreign_key", name) for name in FOREIGN_KEYS} <= steps
+    assert {("seed", table) for table in SEED} <= steps
+    versions = [version for version, _, _ in MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+def test_hot_queries_have_supporting_indexes():
+    """Test that every per-request statement in api.py and its helpers is an index lookup."""
+    assert check_hot_queries() == []
+
+def test_unindexed_query_is_reported(tmp_path):
+    """Test that the check catches a lookup on an unindexed column."""
+    module = tmp_path / "handlers.py"
+    module.write_text(
+        'cursor.execute(f"SELECT {columns} FROM customer WHERE phone_number = %s", (phone,))\n'
+        'cursor.execute("UPDATE vehicle SET current_mileage = %s WHERE reg_number = %s", values)\n'
+    )
+    queries = [sql for _, sql in hot_queries(str(module))]
+    assert queries == [
+        "SELECT * FROM customer WHERE phone_number = %s",
+        "UPDATE vehicle SET current_mileage = %s WHERE reg_number = %s",
+    ]
+    storage = SQLiteStorage()
+    conn = storage.connect()
+    unsupported = unsupported_queries(conn, queries)
+    assert [query for query, _ in unsupported] == ["SELECT * FROM customer WHERE phone_number = %s"]
+    conn.close()
+    storage.close()
+
+if __name__ == "__main__":
+    pytest.main()
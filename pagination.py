@@ -0,0 +1,154 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from conn import PAGE_CONFIG
+from fields import parse_fields, select_list, project
+from filters import parse_filters
+
+# Primary key and the columns a client may sort list endpoints by. Every
+# sort is made unique by falling back to the primary key.
+TABLES = {
+    "customer": {"pk": "customer_id", "sort": ("customer_id", "customer_name", "email_address")},
+    "vehicle": {"pk": "reg_number", "sort": ("reg_number", "model_code", "vehicle_category_description", "current_mileage")},
+    "booking": {"pk": "booking_id", "sort": ("booking_id", "date_from", "date_to", "Customer_customer_id", "Vehicle_reg_number")},
+    "booking_status": {"pk": "status_code", "sort": ("status_code",)},
+}
+
+TOTAL_MODES = ("exact", "estimate", "none")
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def _token_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+def encode_cursor(sort, values):
+    payload = json.dumps({"s": sort, "k": [_token_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(token, sort):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload["k"]
+        token_sort = payload["s"]
+    except (ValueError, TypeError, KeyError):
+        raise PaginationError("Invalid 'after' cursor")
+    if token_sort != sort or not isinstance(values, list) or len(values) != 2:
+        raise PaginationError("'after' cursor does not match the requested sort")
+    return values
+
+# Parse ?limit=&after=&sort=&total=&fields= and the table's filters (see
+# filters.py) for a list endpoint. A bad fields value raises FieldsError
+# and a bad filter FilterError.
+def parse_page_args(args, table):
+    spec = TABLES[table]
+
+    limit = args.get("limit", PAGE_CONFIG["default_limit"])
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be at least 1")
+    limit = min(limit, PAGE_CONFIG["max_limit"])
+
+    sort = args.get("sort", spec["pk"])
+    column = sort[1:] if sort.startswith("-") else sort
+    if column not in spec["sort"]:
+        raise PaginationError(f"sort must be one of: {', '.join(spec['sort'])}")
+
+    total = args.get("total", PAGE_CONFIG["total"])
+    if total not in TOTAL_MODES:
+        raise PaginationError(f"total must be one of: {', '.join(TOTAL_MODES)}")
+
+    after = args.get("after")
+    return {
+        "table": table,
+        "limit": limit,
+        "sort": sort,
+        "column": column,
+        "descending": sort.startswith("-"),
+        "after": decode_cursor(after, sort) if after else None,
+        "total": total,
+        "fields": parse_fields(args, table),
+        "filters": parse_filters(args, table),
+    }
+
+# Run one keyset page query. Fetches limit + 1 rows so the presence of a
+# next page is known without a second query. With ?fields=, only those
+# columns are selected, plus the sort key the next cursor is built from.
+def fetch_page(cursor, page):
+    pk = TABLES[page["table"]]["pk"]
+    column = page["column"]
+    fields = page.get("fields")
+    columns = select_list(fields, (column, pk))
+    op, direction = ("<", "DESC") if page["descending"] else (">", "ASC")
+
+    predicates, params = page.get("filters") or ((), ())
+    predicates, params = list(predicates), list(params)
+    if page["after"] is not None:
+        sort_value, pk_value = page["after"]
+        if column == pk:
+            predicates.append(f"{pk} {op} %s")
+            params.append(pk_value)
+        else:
+            predicates.append(f"({column} {op} %s OR ({column} = %s AND {pk} {op} %s))")
+            params.extend([sort_value, sort_value, pk_value])
+    where = " WHERE " + " AND ".join(predicates) if predicates else ""
+
+    order = f"{pk} {direction}" if column == pk else f"{column} {direction}, {pk} {direction}"
+    cursor.execute(
+        f"SELECT {columns} FROM {page['table']}{where} ORDER BY {order} LIMIT %s",
+        (*params, page["limit"] + 1)
+    )
+    rows = cursor.fetchall()
+
+    next_token = None
+    if len(rows) > page["limit"]:
+        rows = rows[:page["limit"]]
+        last = rows[-1]
+        next_token = encode_cursor(page["sort"], [last[column], last[pk]])
+    if fields is not None and not set((column, pk)) <= set(fields):
+        rows = [project(row, fields) for row in rows]
+    return rows, next_token
+
+# Total rows for the list. The table estimate cannot account for filters,
+# so filtered lists are always counted; their filters use an index.
+def count_rows(cursor, page):
+    predicates, params = page.get("filters") or ((), ())
+    if predicates:
+        cursor.execute(f"SELECT COUNT(*) AS total FROM {page['table']} WHERE {' AND '.join(predicates)}", params)
+    elif page["total"] == "exact":
+        cursor.execute(f"SELECT COUNT(*) AS total FROM {page['table']}")
+    else:
+        # InnoDB's row estimate from table statistics; no scan involved.
+        cursor.execute(
+            "SELECT TABLE_ROWS AS total FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (page["table"],)
+        )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return int(row["total"] if isinstance(row, dict) else row[0])
+
+# Build the list envelope: the original {success, data, total} plus the
+# cursor for the next page. `total` is left out when total=none.
+def page_response(cursor, page, rows, next_token):
+    body = {"success": True, "data": rows}
+    if page["total"] != "none":
+        if page["after"] is None and next_token is None:
+            body["total"] = len(rows)
+        else:
+            body["total"] = count_rows(cursor, page)
+    body["limit"] = page["limit"]
+    body["next"] = next_token
+    return body
@@ -0,0 +1,107 @@
+import pytest
+from datetime import date
+from unittest.mock import MagicMock
+from fields import FieldsError
+from pagination import PaginationError, parse_page_args, fetch_page, page_response, encode_cursor, decode_cursor
+
+def test_cursor_round_trip():
+    """Test that a next-page token decodes back to its key values."""
+    token = encode_cursor("-date_from", [date(2023, 1, 1), 7])
+    assert decode_cursor(token, "-date_from") == ["2023-01-01", 7]
+
+def test_cursor_rejects_other_sort():
+    """Test that a token issued for one sort cannot be replayed on another."""
+    token = encode_cursor("date_from", ["2023-01-01", 7])
+    with pytest.raises(PaginationError):
+        decode_cursor(token, "booking_id")
+
+def test_cursor_rejects_garbage():
+    """Test that a malformed token is rejected."""
+    with pytest.raises(PaginationError):
+        decode_cursor("not-a-token", "booking_id")
+
+def test_limit_is_capped():
+    """Test that the requested page size never exceeds the server maximum."""
+    page = parse_page_args({"limit": "999999"}, "booking")
+    assert page["limit"] == 1000
+
+@pytest.mark.parametrize("args", [{"limit": "0"}, {"limit": "ten"}, {"sort": "address"}, {"total": "maybe"}])
+def test_invalid_page_args(args):
+    """Test that invalid paging parameters raise PaginationError."""
+    with pytest.raises(PaginationError):
+        parse_page_args(args, "customer")
+
+def test_fetch_page_on_primary_key():
+    """Test that a primary-key page seeks past the cursor and fetches limit + 1 rows."""
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [{"booking_id": 11}, {"booking_id": 12}, {"booking_id": 13}]
+    page = parse_page_args({"limit": "2", "after": encode_cursor("booking_id", [10, 10])}, "booking")
+
+    rows, next_token = fetch_page(cursor, page)
+
+    cursor.execute.assert_called_once_with(
+        "SELECT * FROM booking WHERE booking_id > %s ORDER BY booking_id ASC LIMIT %s", (10, 3)
+    )
+    assert rows == [{"booking_id": 11}, {"booking_id": 12}]
+    assert decode_cursor(next_token, "booking_id") == [12, 12]
+
+def test_fetch_page_with_fields():
+    """Test that ?fields= becomes the SELECT list, keeping the sort key for the cursor."""
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [
+        {"model_code": "M1", "current_mileage": 10, "reg_number": "AAA111"},
+        {"model_code": "M2", "current_mileage": 20, "reg_number": "BBB222"},
+    ]
+    page = parse_page_args({"fields": "model_code", "sort": "current_mileage", "limit": "1"}, "vehicle")
+
+    rows, next_token = fetch_page(cursor, page)
+
+    cursor.execute.assert_called_once_with(
+        "SELECT model_code, current_mileage, reg_number FROM vehicle "
+        "ORDER BY current_mileage ASC, reg_number ASC LIMIT %s", (2,)
+    )
+    assert rows == [{"model_code": "M1"}]
+    assert decode_cursor(next_token, "current_mileage") == [10, "AAA111"]
+
+@pytest.mark.parametrize("value", ["", " , ", "model_code,password", "reg_number;DROP TABLE vehicle"])
+def test_invalid_fields(value):
+    """Test that fields outside the whitelist are rejected."""
+    with pytest.raises(FieldsError):
+        parse_page_args({"fields": value}, "vehicle")
+
+def test_fetch_page_on_descending_sort_key():
+    """Test that a non-unique sort key is tie-broken on the primary key."""
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [{"booking_id": 3, "date_from": date(2023, 1, 1)}]
+    page = parse_page_args({"sort": "-date_from", "after": encode_cursor("-date_from", ["2023-02-01", 9])}, "booking")
+
+    rows, next_token = fetch_page(cursor, page)
+
+    cursor.execute.assert_called_once_with(
+        "SELECT * FROM booking WHERE (date_from < %s OR (date_from = %s AND booking_id < %s)) "
+        "ORDER BY date_from DESC, booking_id DESC LIMIT %s",
+        ("2023-02-01", "2023-02-01", 9, 101)
+    )
+    assert next_token is None
+
+def test_single_page_total_needs_no_count():
+    """Test that a complete first page reports its own length as total."""
+    cursor = MagicMock()
+    page = parse_page_args({"total": "exact"}, "vehicle")
+    body = page_response(cursor, page, [{"reg_number": "A"}], None)
+    assert body["total"] == 1
+    cursor.execute.assert_not_called()
+
+def test_total_exact_and_omitted():
+    """Test that total=exact counts rows and total=none drops the key."""
+    cursor = MagicMock()
+    cursor.fetchone.return_value = {"total": 42}
+    page = parse_page_args({"total": "exact"}, "vehicle")
+    assert page_response(cursor, page, [], "token")["total"] == 42
+    cursor.execute.assert_called_once_with("SELECT COUNT(*) AS total FROM vehicle")
+
+    page = parse_page_args({"total": "none"}, "vehicle")
+    assert "total" not in page_response(cursor, page, [], "token")
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# A checked-out connection. Attribute access is forwarded to the driver
+# connection; close() hands it back to the pool instead of disconnecting.
+class PooledConnection:
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            self._pool.release(self)
+
+
+# A view of a checked-out connection whose close() does nothing; whoever
+# checked the connection out is responsible for releasing it.
+class BorrowedConnection:
+    def __init__(self, pooled):
+        self._pooled = pooled
+
+    def __getattr__(self, name):
+        return getattr(self._pooled, name)
+
+    def close(self):
+        pass
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of database connections.
+
+    `connect` is a zero-argument factory returning a new driver connection.
+    Connections are pinged on borrow once they have been idle longer than
+    `ping_after` seconds and are recycled after `max_uses` checkouts or
+    `max_lifetime` seconds. A pool inherited through fork() is reset in the
+    child so workers never share sockets with their parent.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=5.0, max_uses=1000,
+                 max_lifetime=1800.0, ping_after=30.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._open = 0
+        self._in_use = 0
+        self._counters = {
+            "created": 0,
+            "recycled": 0,
+            "discarded": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+
+    def _check_pid(self):
+        # Sockets and locks copied from the parent are unusable here; drop
+        # them without closing so the parent's connections stay intact.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def acquire(self, timeout=None):
+        self._check_pid()
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    pooled = None
+                    break
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._counters["timeouts"] += 1
+                    raise PoolTimeout(f"Timed out after {timeout}s waiting for a connection "
+                                      f"({self._in_use} of {self.max_size} in use)")
+                waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._counters["checkouts"] += 1
+            if waited:
+                elapsed = time.monotonic() - start
+                self._counters["waits"] += 1
+                self._counters["wait_time_total"] += elapsed
+                self._counters["wait_time_max"] = max(self._counters["wait_time_max"], elapsed)
+
+        try:
+            if pooled is not None and not self._is_usable(pooled):
+                # The slot stays checked out and is refilled below.
+                self._close_raw(pooled._raw)
+                pooled = None
+            if pooled is None:
+                pooled = PooledConnection(self, self._connect())
+                with self._cond:
+                    self._counters["created"] += 1
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        pooled.uses += 1
+        pooled.last_used = time.monotonic()
+        return pooled
+
+    def _is_usable(self, pooled):
+        now = time.monotonic()
+        if now - pooled.created_at >= self.max_lifetime or pooled.uses >= self.max_uses:
+            with self._cond:
+                self._counters["recycled"] += 1
+            return False
+        if now - pooled.last_used >= self.ping_after:
+            try:
+                pooled._raw.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._counters["discarded"] += 1
+                return False
+        return True
+
+    def release(self, pooled, discard=False):
+        raw = pooled._raw
+        if raw is None:
+            return
+        pooled._raw = None
+        if pooled._pool is not self or self._pid != os.getpid():
+            return
+
+        # Never hand the next borrower an open transaction or a half-read
+        # result set. Draining an abandoned stream could mean reading the
+        # rest of a table, so such connections are closed instead.
+        if getattr(raw, "unread_result", False):
+            discard = True
+        if not discard:
+            try:
+                if getattr(raw, "in_transaction", False):
+                    raw.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._open -= 1
+                self._counters["discarded"] += 1
+            else:
+                fresh = PooledConnection(self, raw)
+                fresh.created_at = pooled.created_at
+                fresh.last_used = time.monotonic()
+                fresh.uses = pooled.uses
+                self._idle.append(fresh)
+            self._cond.notify()
+        if discard:
+            self._close_raw(raw)
+
+    @staticmethod
+    def _close_raw(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        self._check_pid()
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for pooled in idle:
+            self._close_raw(pooled._raw)
+
+    def stats(self):
+        self._check_pid()
+        with self._cond:
+            stats = dict(self._counters)
+            stats.update({
+                "max_size": self.max_size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+            })
+        stats["wait_time_avg"] = stats["wait_time_total"] / stats["waits"] if stats["waits"] else 0.0
+        return stats
@@ -0,0 +1,112 @@
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from pool import ConnectionPool, PoolTimeout
+
+def make_pool(**kwargs):
+    """Pool whose factory hands out fresh MagicMock connections."""
+    created = []
+
+    def connect():
+        conn = MagicMock()
+        conn.unread_result = False
+        conn.in_transaction = False
+        created.append(conn)
+        return conn
+
+    return ConnectionPool(connect, **kwargs), created
+
+def test_release_reuses_connection():
+    """Test that a released connection is handed out again."""
+    pool, created = make_pool(max_size=2)
+    first = pool.acquire()
+    first.close()
+    second = pool.acquire()
+    assert second._raw is created[0]
+    assert len(created) == 1
+    assert pool.stats()["in_use"] == 1
+
+def test_close_after_release_is_ignored():
+    """Test that a stale handle cannot return a connection twice."""
+    pool, _ = make_pool(max_size=1)
+    conn = pool.acquire()
+    conn.close()
+    conn.close()
+    stats = pool.stats()
+    assert stats["idle"] == 1
+    assert stats["in_use"] == 0
+
+def test_acquire_times_out_when_exhausted():
+    """Test that a full pool raises PoolTimeout after the checkout timeout."""
+    pool, _ = make_pool(max_size=1, timeout=0.05)
+    pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+
+def test_waiter_gets_released_connection():
+    """Test that a blocked borrower is woken when a connection is released."""
+    pool, created = make_pool(max_size=1, timeout=2)
+    held = pool.acquire()
+    threading.Timer(0.05, held.close).start()
+    conn = pool.acquire()
+    assert conn._raw is created[0]
+    stats = pool.stats()
+    assert stats["waits"] == 1
+    assert stats["wait_time_max"] > 0
+
+def test_recycles_after_max_uses():
+    """Test that a connection is closed and replaced after max_uses checkouts."""
+    pool, created = make_pool(max_size=1, max_uses=2)
+    pool.acquire().close()
+    pool.acquire().close()
+    conn = pool.acquire()
+    assert conn._raw is created[1]
+    created[0].close.assert_called_once()
+    assert pool.stats()["recycled"] == 1
+
+def test_failed_ping_discards_connection():
+    """Test that a connection failing its liveness check is replaced."""
+    pool, created = make_pool(max_size=1, ping_after=0)
+    pool.acquire().close()
+    created[0].ping.side_effect = Exception("gone away")
+    conn = pool.acquire()
+    assert conn._raw is created[1]
+    assert pool.stats()["discarded"] == 1
+
+def test_release_rolls_back_open_transaction():
+    """Test that an open transaction is rolled back before reuse."""
+    pool, created = make_pool(max_size=1)
+    conn = pool.acquire()
+    created[0].in_transaction = True
+    conn.close()
+    created[0].rollback.assert_called_once()
+
+def test_release_discards_unread_result():
+    """Test that a connection with an unread result set is closed, not reused."""
+    pool, created = make_pool(max_size=1)
+    conn = pool.acquire()
+    created[0].unread_result = True
+    conn.close()
+    created[0].close.assert_called_once()
+    assert pool.stats()["open"] == 0
+
+def test_pool_resets_after_fork():
+    """Test that a pool used in a forked child does not reuse parent connections."""
+    pool, created = make_pool(max_size=1)
+    pool.acquire().close()
+    with patch("pool.os.getpid", return_value=-1):
+        conn = pool.acquire()
+        assert conn._raw is created[1]
+        assert pool.stats()["open"] == 1
+    created[0].close.assert_not_called()
+
+def test_connect_failure_frees_slot():
+    """Test that a failing connect does not leak a pool slot."""
+    pool = ConnectionPool(MagicMock(side_effect=Exception("refused")), max_size=1, timeout=0.05)
+    with pytest.raises(Exception):
+        pool.acquire()
+    assert pool.stats()["open"] == 0
+
+if __name__ == "__main__":
+    pytest.main()
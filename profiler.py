@@ -0,0 +1,200 @@
+import logging
+import re
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+# Statement profiling for the metered cursors (see metrics.py).
+#
+# Every statement is reduced to a fingerprint (literals and parameter
+# lists replaced by placeholders) and counted in a rolling window, which
+# gives the slowest and most frequent statement shapes over the last
+# `window` to 2 x `window` seconds. Statements slower than
+# `slow_threshold` are logged and, if `explain` is on, their plan is
+# captured once per fingerprint and window. While a request profile is
+# active on the current thread, each statement is also added to it.
+
+logger = logging.getLogger("carhire.slow_query")
+
+_COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBERS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PARAMS = re.compile(r"%s|\?")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    sql = _COMMENTS.sub(" ", sql)
+    sql = _STRINGS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _PARAMS.sub("?", sql)
+    sql = _LISTS.sub("(?+)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+def _plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode(errors="replace")
+    return value
+
+
+class RequestProfile:
+    """Statements run while handling one request."""
+
+    def __init__(self, max_statements=200):
+        self.max_statements = max_statements
+        self.started = time.perf_counter()
+        self.statements = []
+        self.count = 0
+        self.db_time = 0.0
+        # (fingerprint, sql, params) of slow statements awaiting EXPLAIN
+        self.pending_explains = []
+
+    def add(self, fp, elapsed):
+        self.count += 1
+        self.db_time += elapsed
+        if len(self.statements) < self.max_statements:
+            self.statements.append((fp, elapsed))
+
+    # Per-fingerprint totals, slowest first
+    def breakdown(self):
+        totals = {}
+        for fp, elapsed in self.statements:
+            entry = totals.setdefault(fp, {"fingerprint": fp, "count": 0, "time_ms": 0.0})
+            entry["count"] += 1
+            entry["time_ms"] += elapsed * 1000
+        for entry in totals.values():
+            entry["time_ms"] = round(entry["time_ms"], 3)
+        return sorted(totals.values(), key=lambda e: e["time_ms"], reverse=True)
+
+    def summary(self):
+        return {
+            "queries": self.count,
+            "db_time_ms": round(self.db_time * 1000, 3),
+            "total_time_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "statements": self.breakdown(),
+        }
+
+
+class QueryProfiler:
+    """Rolling per-fingerprint statement stats and the slow-query log."""
+
+    def __init__(self, top_n=20, slow_threshold=0.1, explain=False, window=300.0, max_fingerprints=1000):
+        self.top_n = top_n
+        self.slow_threshold = slow_threshold
+        self.explain = explain
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._window_started = time.monotonic()
+        # fingerprint -> [count, total seconds, max seconds]
+        self._current = {}
+        self._previous = {}
+        # fingerprint -> {"captured_at", "sql", "plan"}
+        self._plans = {}
+
+    def _rotate(self, now):
+        if now - self._window_started >= self.window:
+            self._previous = self._current if now - self._window_started < 2 * self.window else {}
+            self._current = {}
+            self._window_started = now
+            self._plans = {fp: plan for fp, plan in self._plans.items() if now - plan["captured_at"] < self.window}
+
+    # `params` is None for statements that cannot be explained on their
+    # own, such as executemany batches.
+    def record(self, sql, params, elapsed):
+        fp = fingerprint(sql)
+        now = time.monotonic()
+        with self._lock:
+            self._rotate(now)
+            stats = self._current.get(fp)
+            if stats is None:
+                if len(self._current) >= self.max_fingerprints:
+                    fp = "(other)"
+                stats = self._current.setdefault(fp, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            wants_plan = self.explain and params is not None and fp not in self._plans
+        profile = getattr(self._local, "profile", None)
+        if profile is not None:
+            profile.add(fp, elapsed)
+        if elapsed >= self.slow_threshold:
+            logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, fp)
+            if wants_plan and profile is not None and sql.lstrip()[:6].upper() == "SELECT" and len(profile.pending_explains) < 5:
+                profile.pending_explains.append((fp, sql, params))
+
+    def begin_request(self):
+        self._local.profile = RequestProfile()
+        return self._local.profile
+
+    def current(self):
+        return getattr(self._local, "profile", None)
+
+    def end_request(self):
+        profile = getattr(self._local, "profile", None)
+        self._local.profile = None
+        return profile
+
+    # Run the EXPLAINs a request queued for its slow statements. Called
+    # once the request is done with `conn`, so no result set is pending.
+    def run_explains(self, profile, conn):
+        for fp, sql, params in profile.pending_explains:
+            with self._lock:
+                if fp in self._plans:
+                    continue
+            cursor = conn.cursor()
+            try:
+                cursor.execute("EXPLAIN " + sql, params)
+                columns = cursor.column_names
+                plan = [dict(zip(columns, (_plain(v) for v in row))) for row in cursor.fetchall()]
+            except Exception:
+                logger.exception("Could not EXPLAIN %s", fp)
+                continue
+            finally:
+                cursor.close()
+            with self._lock:
+                self._plans[fp] = {"captured_at": time.monotonic(), "sql": sql, "plan": plan}
+        profile.pending_explains = []
+
+    def top(self):
+        with self._lock:
+            self._rotate(time.monotonic())
+            merged = {}
+            for stats in (self._previous, self._current):
+                for fp, (count, total, longest) in stats.items():
+                    entry = merged.setdefault(fp, [0, 0.0, 0.0])
+                    entry[0] += count
+                    entry[1] += total
+                    entry[2] = max(entry[2], longest)
+            plans = {fp: plan["plan"] for fp, plan in self._plans.items()}
+
+        rows = [{
+            "fingerprint": fp,
+            "count": count,
+            "total_ms": round(total * 1000, 3),
+            "avg_ms": round(total / count * 1000, 3),
+            "max_ms": round(longest * 1000, 3),
+            "plan": plans.get(fp),
+        } for fp, (count, total, longest) in merged.items()]
+        return {
+            "window_seconds": self.window,
+            "slow_threshold_ms": self.slow_threshold * 1000,
+            "slowest": sorted(rows, key=lambda r: r["max_ms"], reverse=True)[:self.top_n],
+            "most_frequent": sorted(rows, key=lambda r: r["count"], reverse=True)[:self.top_n],
+            "most_time": sorted(rows, key=lambda r: r["total_ms"], reverse=True)[:self.top_n],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._current = {}
+            self._previous = {}
+            self._plans = {}
+            self._window_started = time.monotonic()
@@ -0,0 +1,75 @@
+import json
+import pytest
+from unittest.mock import patch
+import api
+from api import app
+from metrics import Metrics, MeteredConnection
+from pool import ConnectionPool
+from profiler import QueryProfiler, fingerprint
+from storage import SQLiteStorage
+
+def test_fingerprint_normalises_literals_and_lists():
+    """Test that statements differing only in values share a fingerprint."""
+    assert fingerprint("SELECT * FROM booking  WHERE booking_id = 42") == "SELECT * FROM booking WHERE booking_id = ?"
+    assert fingerprint("SELECT reg_number FROM vehicle WHERE reg_number IN (%s, %s, %s)") == \
+        fingerprint("SELECT reg_number FROM vehicle WHERE reg_number IN (%s, %s)")
+    assert fingerprint("SELECT * FROM customer WHERE email_address = 'a@b.c' -- lookup") == \
+        "SELECT * FROM customer WHERE email_address = ?"
+    assert fingerprint("SELECT Customer_customer_id FROM booking") == "SELECT Customer_customer_id FROM booking"
+
+def test_top_lists_and_rolling_window():
+    """Test the slowest / most frequent rankings and that old windows expire."""
+    profiler = QueryProfiler(window=60)
+    with patch("profiler.time.monotonic", return_value=1000.0):
+        profiler._window_started = 1000.0
+        for _ in range(3):
+            profiler.record("SELECT 1", (), 0.001)
+        profiler.record("SELECT * FROM booking", (), 0.5)
+        top = profiler.top()
+    assert top["slowest"][0]["fingerprint"] == "SELECT * FROM booking"
+    assert top["most_frequent"][0] == {"fingerprint": "SELECT ?", "count": 3, "total_ms": 3.0, "avg_ms": 1.0, "max_ms": 1.0, "plan": None}
+
+    with patch("profiler.time.monotonic", return_value=1070.0):
+        assert len(profiler.top()["slowest"]) == 2
+    with patch("profiler.time.monotonic", return_value=1140.0):
+        assert profiler.top()["slowest"] == []
+
+def test_request_profile_and_explain():
+    """Test that a slow SELECT is added to the request profile and explained."""
+    storage = SQLiteStorage()
+    profiler = QueryProfiler(slow_threshold=0, explain=True)
+    conn = MeteredConnection(storage.connect(), Metrics(), profiler)
+    profile = profiler.begin_request()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM booking WHERE Vehicle_reg_number = %s", ("AAA111",))
+    cursor.fetchall()
+    assert profiler.end_request() is profile
+
+    assert profile.summary()["queries"] == 1
+    profiler.run_explains(profile, conn)
+    plan = profiler.top()["slowest"][0]["plan"]
+    assert "idx_booking_vehicle_dates" in json.dumps(plan)
+    storage.close()
+
+def test_debug_header(monkeypatch):
+    """Test the per-request breakdown header, which is off by default."""
+    storage = SQLiteStorage()
+    monkeypatch.setattr(api, "storage", storage)
+    monkeypatch.setattr(api, "db_pool", ConnectionPool(api.connect_db))
+    monkeypatch.setitem(api.PROFILER_CONFIG, "debug_header", True)
+    client = app.test_client()
+
+    response = client.get("/api/vehicle", headers={"X-Debug-Queries": "1"})
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    statements = json.loads(response.headers["X-Query-Profile"])
+    assert "SELECT * FROM vehicle ORDER BY reg_number ASC LIMIT ?" in [s["fingerprint"] for s in statements]
+    assert "X-Query-Profile" not in client.get("/api/vehicle").headers
+
+    monkeypatch.setitem(api.PROFILER_CONFIG, "debug_header", False)
+    assert "X-Query-Profile" not in client.get("/api/vehicle", headers={"X-Debug-Queries": "1"}).headers
+    api.db_pool.close_all()
+    storage.close()
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,196 @@
+import argparse
+import sys
+from datetime import date
+from availability import to_day
+from conn import STORAGE_CONFIG
+
+# Daily booking summary for management reports.
+#
+# booking_daily holds, per (day, booking_status_code, vehicle category),
+# the bookings picked up and dropped off that day and the rental days of
+# those picked up. Booking writes apply their change to it as deltas in
+# the same transaction as the booking row, so the report endpoint reads a
+# few rows per day instead of grouping the booking table, and its cost
+# depends on the length of the window, not on the booking history.
+#
+# reconcile() compares the summary with a GROUP BY over the bookings, read
+# from one snapshot, and applies the difference as deltas too, so it can
+# run while bookings are being written.
+
+MEASURES = ("pickups", "dropoffs", "rental_days")
+
+UPSERT = (
+    "INSERT INTO booking_daily (day, booking_status_code, vehicle_category_description, pickups, dropoffs, rental_days)"
+    " VALUES (%s, %s, %s, %s, %s, %s)"
+    " ON DUPLICATE KEY UPDATE pickups = pickups + %s, dropoffs = dropoffs + %s, rental_days = rental_days + %s"
+)
+
+
+def _add(deltas, key, pickups, dropoffs, rental_days):
+    current = deltas.setdefault(key, [0, 0, 0])
+    current[0] += pickups
+    current[1] += dropoffs
+    current[2] += rental_days
+
+# Add the contribution of one booking, (date_from, date_to, status), to
+# `deltas`; sign is 1 to add the booking and -1 to take it away
+def _booking_deltas(deltas, category, booking, sign):
+    first, last = to_day(booking[0]), to_day(booking[1])
+    _add(deltas, (first, booking[2], category), sign, 0, sign * (last - first + 1))
+    _add(deltas, (last, booking[2], category), 0, sign, 0)
+
+# Apply {(day ordinal, status, category): [pickups, dropoffs, rental_days]}.
+# Rows are written in key order, so concurrent writers lock shared summary
+# rows in the same order and cannot deadlock on them.
+def _apply(cursor, deltas):
+    for (day, status, category), values in sorted(deltas.items()):
+        if any(values):
+            cursor.execute(UPSERT, (date.fromordinal(day), status, category, *values, *values))
+
+def _category(cursor, reg_number, lock=False):
+    cursor.execute(
+        "SELECT vehicle_category_description FROM vehicle WHERE reg_number = %s" + (" FOR UPDATE" if lock else ""),
+        (reg_number,)
+    )
+    row = cursor.fetchone()
+    if isinstance(row, dict):
+        row = (row.get("vehicle_category_description"),)
+    return row[0] if row else None
+
+# Record a booking write on `reg_number`, in the caller's transaction. `old`
+# and `new` are the booking's (date_from, date_to, booking_status_code)
+# before and after; None for a create or a delete.
+def record_booking(cursor, reg_number, old=None, new=None):
+    category = _category(cursor, reg_number)
+    if category is None:
+        return
+    deltas = {}
+    if old is not None:
+        _booking_deltas(deltas, category, old, -1)
+    if new is not None:
+        _booking_deltas(deltas, category, new, 1)
+    _apply(cursor, deltas)
+
+# Record bookings inserted in bulk, as (Vehicle_reg_number, date_from,
+# date_to, booking_status_code). `categories` maps reg_number to category
+# and is filled in from the vehicle table as new vehicles are seen.
+def record_bookings(cursor, bookings, categories):
+    deltas = {}
+    for reg_number, date_from, date_to, status in bookings:
+        if reg_number not in categories:
+            categories[reg_number] = _category(cursor, reg_number)
+        if categories[reg_number] is not None:
+            _booking_deltas(deltas, categories[reg_number], (date_from, date_to, status), 1)
+    _apply(cursor, deltas)
+
+# Move the bookings of `reg_number` to `category` before the vehicle is
+# updated, if that changes its category
+def move_vehicle(cursor, reg_number, category):
+    previous = _category(cursor, reg_number, lock=True)
+    if previous is None or previous == category:
+        return
+    cursor.execute("SELECT date_from, date_to, booking_status_code FROM booking WHERE Vehicle_reg_number = %s", (reg_number,))
+    deltas = {}
+    for booking in cursor.fetchall():
+        _booking_deltas(deltas, previous, booking, -1)
+        _booking_deltas(deltas, category, booking, 1)
+    _apply(cursor, deltas)
+
+
+# Rows of booking_daily for days date_from..date_to, optionally for one
+# status and one category, in (day, status, category) order. Rows whose
+# counts have all gone back to zero are left out.
+def daily_report(cursor, date_from, date_to, status=None, category=None):
+    query = (
+        "SELECT day, booking_status_code, vehicle_category_description, pickups, dropoffs, rental_days"
+        " FROM booking_daily WHERE day BETWEEN %s AND %s"
+    )
+    params = [date_from, date_to]
+    if status is not None:
+        query += " AND booking_status_code = %s"
+        params.append(status)
+    if category is not None:
+        query += " AND vehicle_category_description = %s"
+        params.append(category)
+    cursor.execute(query + " ORDER BY day, booking_status_code, vehicle_category_description", params)
+    return [
+        {"day": date.fromordinal(to_day(day)).isoformat(), "booking_status_code": row_status,
+         "vehicle_category_description": row_category, "pickups": int(pickups), "dropoffs": int(dropoffs),
+         "rental_days": int(rental_days)}
+        for day, row_status, row_category, pickups, dropoffs, rental_days in cursor.fetchall()
+        if pickups or dropoffs or rental_days
+    ]
+
+
+# What booking_daily should hold, from the booking and vehicle tables
+def _expected(cursor):
+    expected = {}
+    cursor.execute(
+        "SELECT b.date_from, b.booking_status_code, v.vehicle_category_description, COUNT(*),"
+        " SUM(DATEDIFF(b.date_to, b.date_from) + 1)"
+        " FROM booking b JOIN vehicle v ON v.reg_number = b.Vehicle_reg_number"
+        " GROUP BY b.date_from, b.booking_status_code, v.vehicle_category_description"
+    )
+    for day, status, category, pickups, rental_days in cursor.fetchall():
+        _add(expected, (to_day(day), status, category), int(pickups), 0, int(rental_days))
+    cursor.execute(
+        "SELECT b.date_to, b.booking_status_code, v.vehicle_category_description, COUNT(*)"
+        " FROM booking b JOIN vehicle v ON v.reg_number = b.Vehicle_reg_number"
+        " GROUP BY b.date_to, b.booking_status_code, v.vehicle_category_description"
+    )
+    for day, status, category, dropoffs in cursor.fetchall():
+        _add(expected, (to_day(day), status, category), 0, int(dropoffs), 0)
+    return expected
+
+# Fill a new, empty booking_daily (a migration step)
+def backfill(cursor):
+    _apply(cursor, _expected(cursor))
+
+# Bring booking_daily in line with the bookings. Returns the number of
+# rows checked and of rows that were wrong; with dry_run, nothing is
+# changed.
+def reconcile(conn, dry_run=False):
+    cursor = conn.cursor()
+    try:
+        # Both sides are read from the same snapshot; a booking write
+        # commits its booking and summary rows together, so any difference
+        # is drift, and applying it as deltas keeps later writes intact.
+        cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        deltas = _expected(cursor)
+        cursor.execute(f"SELECT day, booking_status_code, vehicle_category_description, {', '.join(MEASURES)} FROM booking_daily")
+        for day, status, category, *values in cursor.fetchall():
+            _add(deltas, (to_day(day), status, category), *(-int(value) for value in values))
+        wrong = {key: values for key, values in deltas.items() if any(values)}
+        if dry_run:
+            conn.rollback()
+        else:
+            _apply(cursor, wrong)
+            conn.commit()
+        return {"checked": len(deltas), "wrong": len(wrong)}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcile the daily booking summary with the booking table.")
+    parser.add_argument("--url", default=STORAGE_CONFIG["url"], help="storage URL (default: DB_BACKEND)")
+    parser.add_argument("--check", action="store_true", help="report differences without fixing them")
+    args = parser.parse_args(argv)
+
+    from storage import make_storage
+    storage = make_storage(args.url)
+    conn = storage.connect()
+    try:
+        result = reconcile(conn, dry_run=args.check)
+    finally:
+        conn.close()
+    action = "found" if args.check else "fixed"
+    print(f"Checked {result['checked']} summary rows, {action} {result['wrong']}")
+    return 1 if args.check and result["wrong"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
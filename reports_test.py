@@ -0,0 +1,119 @@
+import pytest
+from datetime import date
+from migrations import migrate
+from reports import daily_report, move_vehicle, reconcile, record_booking, record_bookings
+from storage import SQLiteStorage
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "carhire.db"))
+    yield storage
+    storage.close()
+
+def add_fleet(cursor):
+    cursor.execute("INSERT INTO customer (customer_name, email_address) VALUES ('Ann', 'ann@example.com')")
+    for reg, category in (("AAA111", "SUV"), ("BBB222", "Van")):
+        cursor.execute(
+            "INSERT INTO vehicle (reg_number, model_code, vehicle_category_description) VALUES (%s, 'M1', %s)",
+            (reg, category)
+        )
+
+def insert_booking(cursor, reg, date_from, date_to, status="PENDING"):
+    cursor.execute(
+        "INSERT INTO booking (Customer_customer_id, Vehicle_reg_number, date_from, date_to, booking_status_code)"
+        " VALUES (1, %s, %s, %s, %s)", (reg, date_from, date_to, status)
+    )
+
+def summary(cursor):
+    return {(row["day"], row["booking_status_code"], row["vehicle_category_description"]):
+            (row["pickups"], row["dropoffs"], row["rental_days"])
+            for row in daily_report(cursor, "2030-01-01", "2030-12-31")}
+
+def test_writes_apply_deltas(storage):
+    """Test the summary after a create, an update, a delete and a category change."""
+    conn = storage.connect()
+    cursor = conn.cursor()
+    add_fleet(cursor)
+    record_booking(cursor, "AAA111", new=("2030-01-01", "2030-01-03", "PENDING"))
+    record_booking(cursor, "BBB222", new=(date(2030, 1, 1), date(2030, 1, 1), "PENDING"))
+    assert summary(cursor) == {
+        ("2030-01-01", "PENDING", "SUV"): (1, 0, 3),
+        ("2030-01-03", "PENDING", "SUV"): (0, 1, 0),
+        ("2030-01-01", "PENDING", "Van"): (1, 1, 1),
+    }
+
+    record_booking(cursor, "AAA111", old=("2030-01-01", "2030-01-03", "PENDING"), new=("2030-01-02", "2030-01-03", "CANCELLED"))
+    record_booking(cursor, "BBB222", old=("2030-01-01", "2030-01-01", "PENDING"))
+    assert summary(cursor) == {
+        ("2030-01-02", "CANCELLED", "SUV"): (1, 0, 2),
+        ("2030-01-03", "CANCELLED", "SUV"): (0, 1, 0),
+    }
+
+    insert_booking(cursor, "AAA111", "2030-01-02", "2030-01-03", "CANCELLED")
+    move_vehicle(cursor, "AAA111", "Van")
+    assert summary(cursor) == {
+        ("2030-01-02", "CANCELLED", "Van"): (1, 0, 2),
+        ("2030-01-03", "CANCELLED", "Van"): (0, 1, 0),
+    }
+    assert daily_report(cursor, "2030-01-03", "2030-01-03", category="SUV") == []
+    conn.close()
+
+def test_record_bookings_looks_up_each_vehicle_once(storage):
+    """Test bulk recording, skipping unknown vehicles."""
+    conn = storage.connect()
+    cursor = conn.cursor()
+    add_fleet(cursor)
+    categories = {}
+    record_bookings(cursor, [
+        ("AAA111", "2030-01-01", "2030-01-02", "PENDING"),
+        ("AAA111", "2030-01-01", "2030-01-04", "PENDING"),
+        ("ZZZ999", "2030-01-01", "2030-01-04", "PENDING"),
+    ], categories)
+    assert categories == {"AAA111": "SUV", "ZZZ999": None}
+    assert summary(cursor)[("2030-01-01", "PENDING", "SUV")] == (2, 0, 6)
+    conn.close()
+
+def test_reconcile_fixes_drift(storage):
+    """Test that a dry run only reports, and that a real run repairs the summary."""
+    conn = storage.connect()
+    cursor = conn.cursor()
+    add_fleet(cursor)
+    insert_booking(cursor, "AAA111", "2030-01-01", "2030-01-03")
+    insert_booking(cursor, "BBB222", "2030-01-05", "2030-01-06", "CANCELLED")
+    cursor.execute(
+        "INSERT INTO booking_daily (day, booking_status_code, vehicle_category_description, pickups, dropoffs, rental_days)"
+        " VALUES ('2030-02-01', 'PENDING', 'SUV', 4, 0, 9)"
+    )
+    conn.commit()
+
+    assert reconcile(conn, dry_run=True) == {"checked": 5, "wrong": 5}
+    assert reconcile(conn) == {"checked": 5, "wrong": 5}
+    assert reconcile(conn, dry_run=True) == {"checked": 5, "wrong": 0}
+    assert summary(cursor) == {
+        ("2030-01-01", "PENDING", "SUV"): (1, 0, 3),
+        ("2030-01-03", "PENDING", "SUV"): (0, 1, 0),
+        ("2030-01-05", "CANCELLED", "Van"): (1, 0, 2),
+        ("2030-01-06", "CANCELLED", "Van"): (0, 1, 0),
+    }
+    conn.close()
+
+def test_migration_backfills_existing_bookings(storage):
+    """Test that migrating a database with bookings fills the new table."""
+    conn = storage._open()
+    migrate(storage, conn, target=5)
+    cursor = conn.cursor()
+    add_fleet(cursor)
+    insert_booking(cursor, "AAA111", "2030-01-01", "2030-01-01")
+    insert_booking(cursor, "AAA111", "2030-01-01", "2030-01-02")
+    conn.commit()
+
+    assert migrate(storage, conn, target=6) == [6]
+    assert summary(cursor) == {
+        ("2030-01-01", "PENDING", "SUV"): (2, 1, 3),
+        ("2030-01-02", "PENDING", "SUV"): (0, 1, 0),
+    }
+    assert reconcile(conn, dry_run=True)["wrong"] == 0
+    conn.close()
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,176 @@
+# Table definitions for the storage backends (see storage.py), applied by
+# the migrations in migrations.py. Both dialects get the same tables, keys
+# and indexes, so queries that run on SQLite locally hit the same access
+# paths they would on MySQL.
+
+MYSQL_TABLES = {
+    "booking_status": """
+        CREATE TABLE IF NOT EXISTS booking_status (
+            status_code VARCHAR(20) NOT NULL PRIMARY KEY,
+            description VARCHAR(255) NOT NULL
+        ) ENGINE=InnoDB""",
+    "customer": """
+        CREATE TABLE IF NOT EXISTS customer (
+            customer_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            customer_name VARCHAR(100) NOT NULL,
+            email_address VARCHAR(255) NOT NULL,
+            phone_number VARCHAR(30) NOT NULL DEFAULT '',
+            address VARCHAR(255) NOT NULL DEFAULT ''
+        ) ENGINE=InnoDB""",
+    "vehicle": """
+        CREATE TABLE IF NOT EXISTS vehicle (
+            reg_number VARCHAR(20) NOT NULL PRIMARY KEY,
+            model_code VARCHAR(20) NOT NULL,
+            current_mileage INT NOT NULL DEFAULT 0,
+            engine_size INT NOT NULL DEFAULT 0,
+            vehicle_category_description VARCHAR(100) NOT NULL
+        ) ENGINE=InnoDB""",
+    "booking": """
+        CREATE TABLE IF NOT EXISTS booking (
+            booking_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            date_from DATE NOT NULL,
+            date_to DATE NOT NULL,
+            booking_status_code VARCHAR(20) NOT NULL DEFAULT 'PENDING',
+            Customer_customer_id INT NOT NULL,
+            Vehicle_reg_number VARCHAR(20) NOT NULL,
+            CONSTRAINT fk_booking_status FOREIGN KEY (booking_status_code) REFERENCES booking_status (status_code),
+            CONSTRAINT fk_booking_customer FOREIGN KEY (Customer_customer_id) REFERENCES customer (customer_id),
+            CONSTRAINT fk_booking_vehicle FOREIGN KEY (Vehicle_reg_number) REFERENCES vehicle (reg_number)
+        ) ENGINE=InnoDB""",
+    "table_version": """
+        CREATE TABLE IF NOT EXISTS table_version (
+            table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+            version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB""",
+    "import_checkpoint": """
+        CREATE TABLE IF NOT EXISTS import_checkpoint (
+            job VARCHAR(255) NOT NULL PRIMARY KEY,
+            byte_offset BIGINT UNSIGNED NOT NULL,
+            stats TEXT NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB""",
+    "booking_daily": """
+        CREATE TABLE IF NOT EXISTS booking_daily (
+            day DATE NOT NULL,
+            booking_status_code VARCHAR(20) NOT NULL,
+            vehicle_category_description VARCHAR(100) NOT NULL,
+            pickups INT NOT NULL DEFAULT 0,
+            dropoffs INT NOT NULL DEFAULT 0,
+            rental_days INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, booking_status_code, vehicle_category_description)
+        ) ENGINE=InnoDB""",
+    "idempotency_key": """
+        CREATE TABLE IF NOT EXISTS idempotency_key (
+            key_hash CHAR(64) NOT NULL PRIMARY KEY,
+            fingerprint CHAR(64) NOT NULL,
+            status SMALLINT NOT NULL DEFAULT 0,
+            content_type VARCHAR(100),
+            body MEDIUMBLOB,
+            expires_at BIGINT NOT NULL
+        ) ENGINE=InnoDB""",
+}
+
+# INTEGER PRIMARY KEY is SQLite's rowid alias, its AUTO_INCREMENT. The
+# declared DATE and TIMESTAMP types let storage.py convert values back to
+# date and datetime, as mysql.connector does. email_address compares
+# case-insensitively, as under MySQL's default collation, which is also
+# what lets SQLite answer the email prefix filter's LIKE from its index.
+SQLITE_TABLES = {
+    "booking_status": """
+        CREATE TABLE IF NOT EXISTS booking_status (
+            status_code VARCHAR(20) NOT NULL PRIMARY KEY,
+            description VARCHAR(255) NOT NULL
+        )""",
+    "customer": """
+        CREATE TABLE IF NOT EXISTS customer (
+            customer_id INTEGER PRIMARY KEY,
+            customer_name VARCHAR(100) NOT NULL,
+            email_address VARCHAR(255) NOT NULL COLLATE NOCASE,
+            phone_number VARCHAR(30) NOT NULL DEFAULT '',
+            address VARCHAR(255) NOT NULL DEFAULT ''
+        )""",
+    "vehicle": """
+        CREATE TABLE IF NOT EXISTS vehicle (
+            reg_number VARCHAR(20) NOT NULL PRIMARY KEY,
+            model_code VARCHAR(20) NOT NULL,
+            current_mileage INT NOT NULL DEFAULT 0,
+            engine_size INT NOT NULL DEFAULT 0,
+            vehicle_category_description VARCHAR(100) NOT NULL
+        )""",
+    "booking": """
+        CREATE TABLE IF NOT EXISTS booking (
+            booking_id INTEGER PRIMARY KEY,
+            date_from DATE NOT NULL,
+            date_to DATE NOT NULL,
+            booking_status_code VARCHAR(20) NOT NULL DEFAULT 'PENDING' REFERENCES booking_status (status_code),
+            Customer_customer_id INT NOT NULL REFERENCES customer (customer_id),
+            Vehicle_reg_number VARCHAR(20) NOT NULL REFERENCES vehicle (reg_number)
+        )""",
+    "table_version": """
+        CREATE TABLE IF NOT EXISTS table_version (
+            table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )""",
+    "import_checkpoint": """
+        CREATE TABLE IF NOT EXISTS import_checkpoint (
+            job VARCHAR(255) NOT NULL PRIMARY KEY,
+            byte_offset BIGINT NOT NULL,
+            stats TEXT NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )""",
+    "booking_daily": """
+        CREATE TABLE IF NOT EXISTS booking_daily (
+            day DATE NOT NULL,
+            booking_status_code VARCHAR(20) NOT NULL,
+            vehicle_category_description VARCHAR(100) NOT NULL,
+            pickups INT NOT NULL DEFAULT 0,
+            dropoffs INT NOT NULL DEFAULT 0,
+            rental_days INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, booking_status_code, vehicle_category_description)
+        )""",
+    "idempotency_key": """
+        CREATE TABLE IF NOT EXISTS idempotency_key (
+            key_hash CHAR(64) NOT NULL PRIMARY KEY,
+            fingerprint CHAR(64) NOT NULL,
+            status SMALLINT NOT NULL DEFAULT 0,
+            content_type VARCHAR(100),
+            body BLOB,
+            expires_at BIGINT NOT NULL
+        )""",
+}
+
+# name -> (table, columns). Secondary indexes end with the primary key so
+# keyset pages sorted by the leading column are one range scan. Which
+# migration creates each one is in migrations.py.
+INDEXES = {
+    "idx_customer_name": ("customer", ("customer_name", "customer_id")),
+    "idx_customer_email": ("customer", ("email_address", "customer_id")),
+    "idx_vehicle_model": ("vehicle", ("model_code", "reg_number")),
+    "idx_vehicle_category": ("vehicle", ("vehicle_category_description", "reg_number")),
+    "idx_vehicle_mileage": ("vehicle", ("current_mileage", "reg_number")),
+    "idx_booking_vehicle_dates": ("booking", ("Vehicle_reg_number", "date_from", "date_to")),
+    "idx_booking_customer": ("booking", ("Customer_customer_id", "booking_id")),
+    "idx_booking_status": ("booking", ("booking_status_code", "booking_id")),
+    "idx_booking_status_date_from": ("booking", ("booking_status_code", "date_from", "booking_id")),
+    "idx_booking_status_date_to": ("booking", ("booking_status_code", "date_to", "booking_id")),
+    "idx_booking_date_from": ("booking", ("date_from", "booking_id")),
+    "idx_booking_date_to": ("booking", ("date_to", "booking_id")),
+    "idx_idempotency_expires": ("idempotency_key", ("expires_at", "key_hash")),
+}
+
+# name -> (table, column, referenced table, referenced column). Declared in
+# the CREATE TABLE statements above; listed here so a MySQL database built
+# by hand can have them added.
+FOREIGN_KEYS = {
+    "fk_booking_status": ("booking", "booking_status_code", "booking_status", "status_code"),
+    "fk_booking_customer": ("booking", "Customer_customer_id", "customer", "customer_id"),
+    "fk_booking_vehicle": ("booking", "Vehicle_reg_number", "vehicle", "reg_number"),
+}
+
+# Rows every database needs: the status create_booking defaults to and
+# the one AVAILABILITY_CONFIG treats as inactive by default.
+SEED = {
+    "booking_status": (("status_code", "description"), [("PENDING", "Pending"), ("CANCELLED", "Cancelled")]),
+}
@@ -0,0 +1,371 @@
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import islice, product
+from availability import stream_rows
+from conn import SEARCH_CONFIG
+
+_TOKEN = re.compile(r"[^\W\d_]+|\d+")
+
+# Match qualities; a result's score is the sum over the query terms
+EXACT, PREFIX, FUZZY = 3, 2, 1
+
+# Words of a query beyond this are ignored
+MAX_TERMS = 6
+
+
+# Lowercase words and digit runs of `text`, with accents removed, so
+# "Zoë O'Brien-Smith42" gives zoe, o, brien, smith, 42
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return _TOKEN.findall(text)
+
+# Tokens a customer is found by: the words of the name and of the local
+# part of the email address. The domain is left out; it is shared by too
+# many customers to narrow a search.
+def customer_tokens(name, email):
+    return tuple(dict.fromkeys(tokenize(name) + tokenize((email or "").partition("@")[0])))
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CustomerSearchIndex:
+    """In-process index of customer names and email addresses.
+
+    Query terms match indexed tokens exactly or as a prefix, found by
+    bisecting the sorted vocabulary; when that gives fewer than k results,
+    alphabetic terms also match words with similar trigrams, so a typo
+    still finds the customer.
+    """
+
+    def __init__(self, max_candidates=None, fuzzy_threshold=None):
+        self.max_candidates = SEARCH_CONFIG["max_candidates"] if max_candidates is None else max_candidates
+        self.fuzzy_threshold = SEARCH_CONFIG["fuzzy_threshold"] if fuzzy_threshold is None else fuzzy_threshold
+        self.lock = threading.RLock()
+        self.loaded_at = None
+        self.built = False
+        self._loading = False
+        self._pending = []
+        self._reset()
+
+    def _reset(self):
+        self.customers = {}
+        self.vocabulary = []
+        self.postings = {}
+        self.grams = {}
+
+    # Rebuild from (customer_id, customer_name, email_address) rows. As in
+    # AvailabilityIndex.load, the new structures are built aside and
+    # swapped in, and writes that land meanwhile are replayed onto them.
+    def load(self, rows):
+        self.begin_load()
+        fresh = CustomerSearchIndex(self.max_candidates, self.fuzzy_threshold)
+        try:
+            postings = fresh.postings
+            for customer_id, name, email in rows:
+                tokens = customer_tokens(name, email)
+                fresh.customers[customer_id] = (name, email, tokens)
+                for token in tokens:
+                    ids = postings.get(token)
+                    if ids is None:
+                        postings[token] = {customer_id}
+                    else:
+                        ids.add(customer_id)
+            fresh.vocabulary = sorted(postings)
+            for token in fresh.vocabulary:
+                fresh._add_grams(token)
+        except Exception:
+            self.abort_load()
+            raise
+        with self.lock:
+            self.customers = fresh.customers
+            self.vocabulary = fresh.vocabulary
+            self.postings = fresh.postings
+            self.grams = fresh.grams
+            self.built = True
+            self.loaded_at = time.monotonic()
+            self._replay()
+
+    # As in AvailabilityIndex: writes made between begin_load() and the end
+    # of load() are recorded and replayed onto the rebuilt index
+    def begin_load(self):
+        with self.lock:
+            if not self._loading:
+                self._loading = True
+                self._pending = []
+
+    def abort_load(self):
+        with self.lock:
+            self._loading = False
+            self._pending = []
+
+    def _replay(self):
+        self._loading = False
+        pending, self._pending = self._pending, []
+        for name, args in pending:
+            getattr(self, name)(*args)
+
+    # Only words are fuzzy-matched; a mistyped number is a different number
+    def _add_grams(self, token):
+        if token.isalpha():
+            for gram in trigrams(token):
+                self.grams.setdefault(gram, set()).add(token)
+
+    def _remove_grams(self, token):
+        if token.isalpha():
+            for gram in trigrams(token):
+                tokens = self.grams[gram]
+                tokens.discard(token)
+                if not tokens:
+                    del self.grams[gram]
+
+    def _written(self, name, *args):
+        if self._loading:
+            self._pending.append((name, args))
+
+    def is_stale(self, max_age=None):
+        max_age = SEARCH_CONFIG["max_age"] if max_age is None else max_age
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > max_age
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+
+    # Insert or replace a customer
+    def put(self, customer_id, name, email):
+        with self.lock:
+            self._written("put", customer_id, name, email)
+            self._remove(customer_id)
+            tokens = customer_tokens(name, email)
+            self.customers[customer_id] = (name, email, tokens)
+            for token in tokens:
+                ids = self.postings.get(token)
+                if ids is None:
+                    self.postings[token] = {customer_id}
+                    insort(self.vocabulary, token)
+                    self._add_grams(token)
+                else:
+                    ids.add(customer_id)
+
+    def remove(self, customer_id):
+        with self.lock:
+            self._written("remove", customer_id)
+            return self._remove(customer_id)
+
+    def _remove(self, customer_id):
+        entry = self.customers.pop(customer_id, None)
+        if entry is None:
+            return False
+        for token in entry[2]:
+            ids = self.postings[token]
+            ids.discard(customer_id)
+            if not ids:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+                self._remove_grams(token)
+        return True
+
+    # Indexed tokens starting with `term`, the exact match (if any) first.
+    # Numbers are only matched whole: the digits of "smith42" tell
+    # customers apart, and every number starting with 4 would be a tenth
+    # of the table.
+    def _completions(self, term):
+        if term.isdigit():
+            return [term] if term in self.postings else []
+        vocabulary = self.vocabulary
+        i = bisect_left(vocabulary, term)
+        j = bisect_left(vocabulary, term + "\U0010ffff", i)
+        return vocabulary[i:j]
+
+    # Indexed words sharing enough trigrams with `term` (Dice coefficient)
+    def _similar(self, term):
+        if not term.isalpha() or len(term) < 3:
+            return []
+        grams = trigrams(term)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.grams.get(gram, ()))
+        threshold = self.fuzzy_threshold
+        size = len(grams)
+        # Every word has at least three trigrams, which bounds the
+        # coefficient from above; most words fail the cheaper test
+        least = threshold * (size + 3) / 2
+        return [token for token, count in shared.items()
+                if count >= least and 2 * count / (size + len(token) + 2) >= threshold]
+
+    # Tokens a term matches, with the quality of each match. A term that
+    # completes no indexed word is taken to be misspelt and matched against
+    # similar words instead.
+    def _matches(self, term):
+        matches = dict.fromkeys(self._completions(term), PREFIX)
+        if term in matches:
+            matches[term] = EXACT
+        elif not matches:
+            matches = dict.fromkeys(self._similar(term), FUZZY)
+        return matches
+
+    # Customers matching every term of the query, best first, as
+    # (customer_id, customer_name, email_address, score); equal scores are
+    # ordered by customer_id (among max_candidates of them, if more tie).
+    def search(self, query, k=10):
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_TERMS]
+        if not terms:
+            return []
+        with self.lock:
+            results = self._search(terms, k)
+            customers = self.customers
+            return [(customer_id, customers[customer_id][0], customers[customer_id][1], score)
+                    for score, customer_id in results]
+
+    # Customers matched by the tokens in `matches`, counted only until the
+    # count passes `cap`
+    def _size(self, matches, cap):
+        postings = self.postings
+        size = 0
+        for token in matches:
+            size += len(postings[token])
+            if size > cap:
+                break
+        return size
+
+    # The customers that match a term, split by how well they match it;
+    # each customer is in the tier of its best match. With `candidates`,
+    # only those customers are kept; intersecting with a posting set costs
+    # the size of the smaller of the two. Otherwise the exact match is
+    # taken whole (it is a single posting set, used as it is) and the
+    # completions only until `limit` customers are gathered, so a term as
+    # common as a single letter costs no more than max_candidates.
+    def _tiers(self, matches, candidates=None, limit=None):
+        postings = self.postings
+        tiers = {}
+        gathered = 0
+        for quality in (EXACT, PREFIX, FUZZY):
+            tokens = [token for token, q in matches.items() if q == quality]
+            if not tokens:
+                continue
+            if candidates is not None:
+                ids = set().union(*(candidates.intersection(postings[token]) for token in tokens))
+            elif quality == EXACT:
+                ids = postings[tokens[0]]
+            else:
+                ids = set()
+                for token in tokens:
+                    ids.update(islice(postings[token], limit - gathered - len(ids)))
+                    if gathered + len(ids) >= limit:
+                        break
+            if tiers:
+                ids = ids.difference(*tiers.values())
+            if ids:
+                tiers[quality] = ids
+                gathered += len(ids)
+            if candidates is None and gathered >= limit:
+                break
+        return tiers
+
+    # Rough cost, in the same units, of intersecting `candidates` with the
+    # posting sets of `matches` and of checking each candidate's tokens
+    # instead
+    def _costs(self, matches, candidates):
+        postings = self.postings
+        n = len(candidates)
+        intersect = len(matches) * 8
+        for token in matches:
+            size = len(postings[token])
+            intersect += size if size < n else n
+        return intersect, n * 60
+
+    # Terms are applied from the one matching the fewest customers, so the
+    # candidate set only shrinks. A term completing to many tokens that
+    # together match many of the remaining customers ("ro" after "anthony")
+    # is cheaper to check per candidate than to intersect; such terms are
+    # deferred, and the candidates walked best first, stopping once no
+    # later one can make the top k.
+    def _search(self, terms, k):
+        expansions = [self._matches(term) for term in terms]
+        if not all(expansions):
+            return []
+        # Only the order matters, so no term is counted past the smallest
+        # count so far, nor past max_candidates
+        sizes = {}
+        smallest = self.max_candidates
+        for t in sorted(range(len(terms)), key=lambda t: len(expansions[t])):
+            sizes[t] = min(self._size(expansions[t], smallest), smallest + 1) if len(terms) > 1 else 0
+            smallest = min(smallest, sizes[t])
+        order = sorted(sizes, key=sizes.get)
+
+        tiers = [self._tiers(expansions[order[0]], limit=self.max_candidates)]
+        candidates = set().union(*tiers[0].values()) if len(terms) > 1 else None
+        deferred = []
+        for t in order[1:]:
+            matches = expansions[t]
+            intersect, check = self._costs(matches, candidates)
+            if intersect > check:
+                deferred.append(matches)
+                continue
+            tiers.append(self._tiers(matches, candidates))
+            candidates = set().union(*tiers[-1].values())
+            if not candidates:
+                return []
+
+        # Every combination of one tier per intersected term gives one
+        # score; walk the scores from the best, intersecting the tiers
+        # that reach each. A candidate can gain at most `bonus` from the
+        # deferred terms.
+        by_score = {}
+        for combination in product(*(tier.items() for tier in tiers)):
+            by_score.setdefault(sum(quality for quality, _ in combination), []).append(combination)
+        bonus = sum(max(matches.values()) for matches in deferred)
+        customers = self.customers
+        found = []
+        for score in sorted(by_score, reverse=True):
+            bound = score + bonus
+            certain = sum(1 for total, _ in found if total >= bound)
+            if certain >= k:
+                break
+            groups = [set.intersection(*(ids for _, ids in combination)) if len(combination) > 1 else combination[0][1]
+                      for combination in by_score[score]]
+            ids = groups[0] if len(groups) == 1 else set().union(*groups)
+            if not deferred:
+                # Ties beyond max_candidates are broken among a sample
+                best = heapq.nsmallest(k - certain, islice(ids, self.max_candidates))
+                found.extend((score, customer_id) for customer_id in best)
+                continue
+            for customer_id in sorted(ids):
+                total = score
+                tokens = customers[customer_id][2]
+                for matches in deferred:
+                    best = max([matches.get(token, 0) for token in tokens])
+                    if not best:
+                        break
+                    total += best
+                else:
+                    found.append((total, customer_id))
+                    if total == bound:
+                        certain += 1
+                        if certain == k:
+                            break
+        return heapq.nsmallest(k, found, key=lambda result: (-result[0], result[1]))
+
+    def __len__(self):
+        return len(self.customers)
+
+
+# Build `index` from the customer table
+def load_index(index, conn, chunk_size=10000):
+    cursor = conn.cursor()
+    index.begin_load()
+    try:
+        cursor.execute("SELECT customer_id, customer_name, email_address FROM customer")
+        index.load(stream_rows(cursor, chunk_size))
+    except Exception:
+        index.abort_load()
+        raise
+    finally:
+        cursor.close()
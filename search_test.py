@@ -0,0 +1,132 @@
+import pytest
+import random
+from unittest.mock import MagicMock
+from search import EXACT, PREFIX, FUZZY, CustomerSearchIndex, customer_tokens, load_index, tokenize
+
+CUSTOMERS = [
+    (1, "Ann Smith", "ann.smith@example.com"),
+    (2, "Annabel Smith", "annabel@example.com"),
+    (3, "Zoë O'Brien", "zoe42@example.com"),
+    (4, "Hannah Anderson", "h.anderson@example.com"),
+    (5, "Jonathan Smithers", "jsmithers@example.com"),
+]
+
+@pytest.fixture
+def index():
+    index = CustomerSearchIndex(max_candidates=1000, fuzzy_threshold=0.6)
+    index.load(CUSTOMERS)
+    return index
+
+def ids(results):
+    return [customer_id for customer_id, _, _, _ in results]
+
+def test_tokens():
+    """Test that names and email local parts are split, lowercased and unaccented."""
+    assert tokenize("Zoë O'Brien-Smith42") == ["zoe", "o", "brien", "smith", "42"]
+    assert customer_tokens("Ann Smith", "ann.smith@example.com") == ("ann", "smith")
+    assert customer_tokens("Zoë O'Brien", "zoe42@example.com") == ("zoe", "o", "brien", "42")
+
+def test_exact_matches_rank_above_prefix_matches(index):
+    """Test ranking: exact word before completions, then by customer_id."""
+    results = index.search("ann", k=10)
+    assert ids(results) == [1, 2]
+    assert [score for _, _, _, score in results] == [EXACT, PREFIX]
+    assert ids(index.search("smith ann")) == [1, 2]
+    assert ids(index.search("SMI")) == [1, 2, 5]
+    assert ids(index.search("smi", k=2)) == [1, 2]
+
+def test_all_terms_must_match(index):
+    """Test that a multi-term query returns customers matching every term."""
+    assert ids(index.search("ann jones")) == []
+    assert ids(index.search("jon smith")) == [5]
+    assert ids(index.search("zoe42")) == [3]
+
+def test_misspelt_words_match_similar_words(index):
+    """Test that a word completing nothing is matched by trigram similarity."""
+    results = index.search("andersen")
+    assert ids(results) == [4]
+    assert results[0][3] == FUZZY
+    assert ids(index.search("hanah andersen")) == [4]
+    assert ids(index.search("zzz")) == []
+
+def test_numbers_match_whole(index):
+    """Test that digits are not completed: 4 does not find zoe42."""
+    assert ids(index.search("42")) == [3]
+    assert ids(index.search("4")) == []
+
+def test_writes_keep_index_current(index):
+    """Test put and remove, including words that leave the vocabulary."""
+    index.put(6, "Annika Berg", "annika@example.com")
+    assert ids(index.search("annik")) == [6]
+    index.put(3, "Zoe Walsh", "zoe42@example.com")
+    assert ids(index.search("brien")) == []
+    assert ids(index.search("walsh")) == [3]
+    assert index.remove(6)
+    assert not index.remove(6)
+    assert "annika" not in index.vocabulary
+    assert ids(index.search("annik")) == []
+    assert sorted(index.vocabulary) == index.vocabulary
+
+def test_writes_during_load_are_kept(index):
+    """Test that a write made while rows are being read survives the swap."""
+    def rows():
+        yield from CUSTOMERS[:2]
+        index.put(6, "Bob Builder", "bob@example.com")
+        index.remove(1)
+        yield from CUSTOMERS[2:]
+    index.load(rows())
+    assert ids(index.search("bob")) == [6]
+    assert ids(index.search("ann")) == [2]
+    assert not index.is_stale()
+
+def test_candidate_budget(index):
+    """Test that a term matching only by prefix gathers at most max_candidates customers."""
+    index.max_candidates = 2
+    assert len(index.search("s", k=10)) == 2
+
+def brute_force(customers, query, k):
+    """Ranking by scoring every customer against every term."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    results = []
+    for customer_id, name, email in customers:
+        tokens = customer_tokens(name, email)
+        score = 0
+        for term in terms:
+            best = max([EXACT if token == term else PREFIX if token.startswith(term) and not term.isdigit() else 0
+                        for token in tokens])
+            if not best:
+                break
+            score += best
+        else:
+            results.append((-score, customer_id))
+    return [customer_id for _, customer_id in sorted(results)[:k]]
+
+@pytest.mark.parametrize("defer", [False, True])
+def test_ranking_matches_brute_force(monkeypatch, defer):
+    """Test intersected and per-candidate (deferred) terms against scoring every customer."""
+    if defer:
+        monkeypatch.setattr(CustomerSearchIndex, "_costs", lambda self, matches, candidates: (1, 0))
+    rng = random.Random(7)
+    first = ["ann", "anna", "bob", "bobby", "carl", "cara", "dan"]
+    last = ["smith", "smithson", "smyth", "jones", "jonas", "brown", "browning", "rossi"]
+    customers = [(i, f"{rng.choice(first)} {rng.choice(last)}", f"{rng.choice(first)}{rng.randint(1, 20)}@example.com")
+                 for i in range(1, 2001)]
+    index = CustomerSearchIndex(max_candidates=10000)
+    index.load(customers)
+    for query in ["ann", "an", "smith", "sm", "ann sm", "a s", "bob j", "b jones", "cara brown 7", "dan r", "jo ann"]:
+        assert ids(index.search(query, k=15)) == brute_force(customers, query, 15), query
+
+def test_load_index_reads_customer_table():
+    """Test that load_index streams the customer rows and marks the index fresh."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.fetchmany.side_effect = [CUSTOMERS[:3], CUSTOMERS[3:], []]
+    index = CustomerSearchIndex()
+    assert index.is_stale()
+    load_index(index, conn, chunk_size=3)
+    assert len(index) == 5
+    assert not index.is_stale()
+    cursor.close.assert_called_once()
+
+if __name__ == "__main__":
+    pytest.main()
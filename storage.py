@@ -0,0 +1,268 @@
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime
+from functools import lru_cache
+import mysql.connector
+from mysql.connector import errorcode
+from mysql.connector import errors as mysql_errors
+from conn import DB_CONFIG
+from schema import MYSQL_TABLES, SQLITE_TABLES
+from migrations import migrate
+
+# Storage backends. The app talks to the database through connections with
+# mysql.connector's interface: %s parameters, cursor(dictionary=True),
+# column_names, and mysql.connector errors carrying MySQL error numbers.
+# MySQLStorage returns mysql.connector connections as they are.
+# SQLiteStorage wraps sqlite3 in the same interface, translating the few
+# MySQL-only constructs the app uses. The handlers, their SQL and the
+# pool therefore run unchanged on an embedded database, which is what the
+# integration tests and offline benchmarks use.
+
+
+class MySQLStorage:
+    """The production backend: a MySQL server configured by DB_CONFIG."""
+
+    dialect = "mysql"
+    tables = MYSQL_TABLES
+    index_query = "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE()"
+
+    def __init__(self, config):
+        self.config = config
+
+    # use this if can't connect in database
+    # ALTER USER 'root'@'localhost' IDENTIFIED WITH mysql_native_password BY 'your_password'; FLUSH PRIVILEGES;
+    def connect(self):
+        return mysql.connector.connect(
+            **self.config,
+            auth_plugin='mysql_native_password'
+        )
+
+    def __repr__(self):
+        return f"MySQLStorage({self.config['host']}/{self.config['database']})"
+
+
+# MySQL-only SQL and its SQLite equivalent. Rewrites are cached per
+# statement text, so the regexes run once per distinct query.
+_LOCKING_READ = re.compile(r"\s+FOR UPDATE\s*$", re.I)
+_SHARED_READ = re.compile(r"\s+LOCK IN SHARE MODE\s*$", re.I)
+_REWRITES = (
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"DATE_SUB\(\?, INTERVAL \? DAY\)", re.I), "date(?, '-' || ? || ' days')"),
+    (re.compile(r"DATEDIFF\(([\w.]+), ([\w.]+)\)", re.I), r"CAST(julianday(\1) - julianday(\2) AS INTEGER)"),
+    (re.compile(r"^\s*START TRANSACTION WITH CONSISTENT SNAPSHOT\s*$", re.I), "BEGIN"),
+    (re.compile(r"^\s*INSERT IGNORE\b", re.I), "INSERT OR IGNORE"),
+    (re.compile(r"\bON DUPLICATE KEY UPDATE\b", re.I), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"\bENGINE=InnoDB\b", re.I), ""),
+    (re.compile(r"^\s*EXPLAIN\s+(?!QUERY\s+PLAN\b)", re.I), "EXPLAIN QUERY PLAN "),
+    # InnoDB's statistics row estimate becomes the one from ANALYZE
+    (re.compile(r"SELECT TABLE_ROWS AS total FROM information_schema\.TABLES\s+WHERE TABLE_SCHEMA = DATABASE\(\) AND TABLE_NAME = \?", re.I),
+     "SELECT CAST(stat AS INTEGER) AS total FROM sqlite_stat1 WHERE tbl = ? LIMIT 1"),
+)
+# Session settings with no SQLite counterpart
+_IGNORED = re.compile(r"^\s*SET\s+SESSION\b", re.I)
+
+@lru_cache(maxsize=1024)
+def translate(operation):
+    """Returns (sql, lock) for a MySQL statement; sql is None for a no-op."""
+    if _IGNORED.match(operation):
+        return None, False
+    lock = bool(_LOCKING_READ.search(operation))
+    sql = _SHARED_READ.sub("", _LOCKING_READ.sub("", operation))
+    for pattern, replacement in _REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql, lock
+
+_ERRNOS = (
+    ("UNIQUE constraint failed", errorcode.ER_DUP_ENTRY),
+    ("FOREIGN KEY constraint failed", errorcode.ER_NO_REFERENCED_ROW_2),
+    ("NOT NULL constraint failed", errorcode.ER_BAD_NULL_ERROR),
+)
+
+def _mysql_error(e):
+    if isinstance(e, sqlite3.IntegrityError):
+        message = str(e)
+        errno = next((n for prefix, n in _ERRNOS if message.startswith(prefix)), None)
+        return mysql_errors.IntegrityError(msg=message, errno=errno)
+    if isinstance(e, sqlite3.OperationalError):
+        return mysql_errors.OperationalError(msg=str(e))
+    return mysql_errors.DatabaseError(msg=str(e))
+
+
+class SQLiteCursor:
+    """sqlite3 cursor with the parts of the mysql.connector cursor API the app uses."""
+
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._cursor = connection._db.cursor()
+        self._dictionary = dictionary
+        self._empty = False
+
+    def execute(self, operation, params=()):
+        sql, lock = translate(operation)
+        self._empty = sql is None
+        if sql is None:
+            return
+        try:
+            if lock:
+                self._connection._begin_immediate()
+            self._cursor.execute(sql, tuple(params or ()))
+        except sqlite3.Error as e:
+            raise _mysql_error(e) from e
+
+    def executemany(self, operation, seq_params):
+        sql, _ = translate(operation)
+        self._empty = sql is None
+        if sql is None:
+            return
+        try:
+            self._cursor.executemany(sql, [tuple(params) for params in seq_params])
+        except sqlite3.Error as e:
+            raise _mysql_error(e) from e
+
+    @property
+    def column_names(self):
+        return tuple(d[0] for d in self._cursor.description or ())
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        return None if self._empty else self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [] if self._empty else [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [] if self._empty else [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the parts of the mysql.connector API the app and pool use."""
+
+    unread_result = False
+
+    def __init__(self, db):
+        self._db = db
+
+    # SELECT ... FOR UPDATE takes SQLite's write lock up front, so writers
+    # are serialised from the check onwards as they are by the row lock in
+    # MySQL.
+    def _begin_immediate(self):
+        if not self._db.in_transaction:
+            self._db.execute("BEGIN IMMEDIATE")
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteCursor(self, dictionary)
+
+    @property
+    def in_transaction(self):
+        return self._db.in_transaction
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def ping(self, reconnect=False, **kwargs):
+        try:
+            self._db.execute("SELECT 1")
+        except sqlite3.Error as e:
+            raise _mysql_error(e) from e
+
+    def is_connected(self):
+        try:
+            self._db.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._db.close()
+
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+
+class SQLiteStorage:
+    """Embedded backend, in a file or in memory (path ":memory:").
+
+    An in-memory database lives as long as the storage object and is
+    shared by all connections made from it. Pending migrations are
+    applied on first connect.
+    """
+
+    dialect = "sqlite"
+    tables = SQLITE_TABLES
+    index_query = "SELECT name FROM sqlite_master WHERE type = 'index'"
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        if path == ":memory:":
+            self._uri = f"file:carhire-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        else:
+            self._uri = f"file:{path}"
+        self._lock = threading.Lock()
+        self._keeper = None
+
+    def _open(self):
+        db = sqlite3.connect(self._uri, uri=True, timeout=30, check_same_thread=False,
+                             detect_types=sqlite3.PARSE_DECLTYPES)
+        db.execute("PRAGMA foreign_keys = ON")
+        if self.path != ":memory:":
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+        return SQLiteConnection(db)
+
+    def connect(self):
+        with self._lock:
+            if self._keeper is None:
+                self._keeper = self._open()
+                migrate(self, self._keeper)
+                # Creates sqlite_stat1, which ?total=estimate reads
+                self._keeper._db.execute("ANALYZE")
+        return self._open()
+
+    def close(self):
+        with self._lock:
+            if self._keeper is not None:
+                self._keeper.close()
+                self._keeper = None
+
+    def __repr__(self):
+        return f"SQLiteStorage({self.path})"
+
+
+# "mysql" or empty for the server in DB_CONFIG; sqlite:///path/to/file.db
+# or sqlite:///:memory: for an embedded database.
+def make_storage(url):
+    if not url or url == "mysql":
+        return MySQLStorage(DB_CONFIG)
+    if url.startswith("sqlite:///"):
+        return SQLiteStorage(url[len("sqlite:///"):] or ":memory:")
+    raise Exception(f"Unsupported storage backend: {url}")
@@ -0,0 +1,357 @@
+import jwt
+import pytest
+from datetime import date
+import api
+from api import app, JWT_SECRET
+from availability import AvailabilityIndex
+from cache import EntityCache
+from idempotency import IdempotencyStore, DurableKeys
+from search import CustomerSearchIndex
+from utilization import FleetArrays
+from pool import ConnectionPool
+from migrations import migrate
+from reports import reconcile
+from importer import main as import_main
+from storage import SQLiteStorage, make_storage, translate
+
+# Integration tests: the real handlers and SQL against an in-memory SQLite
+# database, instead of a mocked cursor.
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Fresh embedded database, with the app's pool and caches pointed at it."""
+    storage = SQLiteStorage()
+    monkeypatch.setattr(api, "db_pool", ConnectionPool(storage.connect, max_size=2))
+    monkeypatch.setattr(api, "entity_cache", EntityCache(["customer", "vehicle", "booking", "booking_status"]))
+    monkeypatch.setattr(api, "availability_index", AvailabilityIndex())
+    monkeypatch.setattr(api, "customer_index", CustomerSearchIndex())
+    monkeypatch.setattr(api, "fleet_arrays", FleetArrays())
+    monkeypatch.setattr(api, "idempotency_store", IdempotencyStore(durable=DurableKeys(api.get_db_connection)))
+    yield storage
+    api.db_pool.close_all()
+    storage.close()
+
+@pytest.fixture
+def client(storage):
+    with app.test_client() as client:
+        yield client
+
+@pytest.fixture
+def auth_headers():
+    token = jwt.encode({"username": "admin", "role": "admin"}, JWT_SECRET, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+def add_fleet(client, auth_headers):
+    client.post("/api/customer", headers=auth_headers, json={"customer_name": "Ann", "email_address": "ann@example.com"})
+    for reg, category in (("AAA111", "SUV"), ("BBB222", "SUV"), ("CCC333", "Van")):
+        client.post("/api/vehicle", json={"reg_number": reg, "model_code": "M1", "vehicle_category_description": category})
+
+def book(client, auth_headers, reg, date_from, date_to, status="PENDING"):
+    return client.post("/api/booking", headers=auth_headers, json={
+        "Customer_customer_id": 1, "Vehicle_reg_number": reg,
+        "date_from": date_from, "date_to": date_to, "booking_status_code": status,
+    })
+
+def test_translate_mysql_constructs():
+    """Test the rewrites of MySQL-only SQL."""
+    assert translate("SELECT reg_number FROM vehicle WHERE reg_number = %s FOR UPDATE") == \
+        ("SELECT reg_number FROM vehicle WHERE reg_number = ?", True)
+    sql, lock = translate("SELECT 1 FROM booking WHERE date_from >= DATE_SUB(%s, INTERVAL %s DAY) LOCK IN SHARE MODE")
+    assert sql == "SELECT 1 FROM booking WHERE date_from >= date(?, '-' || ? || ' days')" and not lock
+    assert translate("SET SESSION net_write_timeout = DEFAULT") == (None, False)
+    assert translate("SELECT SUM(DATEDIFF(b.date_to, b.date_from) + 1) FROM booking b")[0] == \
+        "SELECT SUM(CAST(julianday(b.date_to) - julianday(b.date_from) AS INTEGER) + 1) FROM booking b"
+    assert translate("START TRANSACTION WITH CONSISTENT SNAPSHOT") == ("BEGIN", False)
+
+def test_make_storage():
+    """Test backend selection from DB_BACKEND."""
+    assert make_storage("mysql").dialect == "mysql"
+    assert make_storage("sqlite:///:memory:").dialect == "sqlite"
+    with pytest.raises(Exception):
+        make_storage("postgres://localhost")
+
+def test_schema_is_idempotent(storage):
+    """Test that migrating an up-to-date database changes nothing."""
+    conn = storage.connect()
+    assert migrate(storage, conn) == []
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM booking_status")
+    assert cursor.fetchone()[0] == 2
+    conn.close()
+
+def test_booking_round_trip(client, auth_headers):
+    """Test that dates come back as dates, serialised as with MySQL."""
+    add_fleet(client, auth_headers)
+    assert book(client, auth_headers, "AAA111", "2030-01-01", "2030-01-05").status_code == 201
+    response = client.get("/api/booking/1", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json["data"]["date_from"] == app.json.dumps(date(2030, 1, 1)).strip('"')
+    assert response.json["data"]["Vehicle_reg_number"] == "AAA111"
+
+def test_double_booking_is_rejected(client, auth_headers):
+    """Test the locking overlap check against real rows."""
+    add_fleet(client, auth_headers)
+    assert book(client, auth_headers, "AAA111", "2030-01-01", "2030-01-05").status_code == 201
+    response = book(client, auth_headers, "AAA111", "2030-01-05", "2030-01-07")
+    assert response.status_code == 409
+    assert response.json["conflicts"] == [1]
+    assert book(client, auth_headers, "AAA111", "2030-01-05", "2030-01-07", "CANCELLED").status_code == 201
+    assert book(client, auth_headers, "AAA111", "2030-01-06", "2030-01-07").status_code == 201
+
+def test_pages_and_conditional_get(client, auth_headers):
+    """Test keyset pages and the table-version ETag."""
+    add_fleet(client, auth_headers)
+    first = client.get("/api/vehicle?limit=2&sort=-reg_number&total=exact")
+    assert [v["reg_number"] for v in first.json["data"]] == ["CCC333", "BBB222"]
+    assert first.json["total"] == 3
+    second = client.get(f"/api/vehicle?limit=2&sort=-reg_number&after={first.json['next']}")
+    assert [v["reg_number"] for v in second.json["data"]] == ["AAA111"]
+
+    etag = first.headers["ETag"]
+    assert client.get("/api/vehicle?limit=2&sort=-reg_number&total=exact", headers={"If-None-Match": etag}).status_code == 304
+    client.delete("/api/vehicle/CCC333")
+    assert client.get("/api/vehicle?limit=2&sort=-reg_number&total=exact", headers={"If-None-Match": etag}).status_code == 200
+
+def test_sparse_fieldsets(client, auth_headers):
+    """Test ?fields= on list and single-entity routes, cached or not."""
+    add_fleet(client, auth_headers)
+    page = client.get("/api/vehicle?fields=model_code&sort=-reg_number&limit=2")
+    assert page.json["data"] == [{"model_code": "M1"}, {"model_code": "M1"}]
+    assert client.get(f"/api/vehicle?fields=model_code&sort=-reg_number&limit=2&after={page.json['next']}").json["data"] == [{"model_code": "M1"}]
+
+    assert client.get("/api/vehicle/AAA111?fields=reg_number").json["data"] == {"reg_number": "AAA111"}
+    assert len(client.get("/api/vehicle/AAA111").json["data"]) == 5
+    assert client.get("/api/vehicle/AAA111?fields=vehicle_category_description").json["data"] == {"vehicle_category_description": "SUV"}
+    assert client.get("/api/customer/1?fields=customer_name", headers=auth_headers).json["data"] == {"customer_name": "Ann"}
+
+    response = client.get("/api/vehicle?fields=model_code,secret")
+    assert response.status_code == 400 and "secret" in response.json["error"]
+
+def test_include_related_records(client, auth_headers):
+    """Test ?include= on the booking routes: one copy of each record, and ETags that follow related writes."""
+    add_fleet(client, auth_headers)
+    book(client, auth_headers, "AAA111", "2030-01-01", "2030-01-05")
+    book(client, auth_headers, "AAA111", "2030-02-01", "2030-02-05")
+    book(client, auth_headers, "BBB222", "2030-03-01", "2030-03-05")
+
+    url = "/api/booking?include=vehicle,customer,status&fields=booking_id"
+    response = client.get(url, headers=auth_headers)
+    assert response.json["data"][0] == {"booking_id": 1, "Vehicle_reg_number": "AAA111", "Customer_customer_id": 1,
+                                        "booking_status_code": "PENDING"}
+    included = response.json["included"]
+    assert [v["reg_number"] for v in included["vehicle"]] == ["AAA111", "BBB222"]
+    assert [c["customer_name"] for c in included["customer"]] == ["Ann"]
+    assert included["status"] == [{"status_code": "PENDING", "description": "Pending"}]
+
+    etag = response.headers["ETag"]
+    assert client.get(url, headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+    client.put("/api/vehicle/BBB222", json={"model_code": "M2", "current_mileage": 0, "engine_size": 0,
+                                             "vehicle_category_description": "SUV"})
+    response = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.json["included"]["vehicle"][1]["model_code"] == "M2"
+
+    included = client.get("/api/booking/3?include=vehicle", headers=auth_headers).json["included"]
+    assert [v["reg_number"] for v in included["vehicle"]] == ["BBB222"] and list(included) == ["vehicle"]
+    assert client.get("/api/booking?include=payments", headers=auth_headers).status_code == 400
+
+def test_multi_get(client, auth_headers):
+    """Test vehicle and booking lookups by key list, cached or not."""
+    add_fleet(client, auth_headers)
+    book(client, auth_headers, "AAA111", "2030-01-01", "2030-01-05")
+    book(client, auth_headers, "BBB222", "2030-02-01", "2030-02-05")
+    client.get("/api/vehicle/CCC333")
+
+    response = client.get("/api/vehicle?reg_number=CCC333,ZZZ999,AAA111&fields=reg_number")
+    assert response.json["data"] == [{"reg_number": "CCC333"}, {"reg_number": "AAA111"}]
+    assert response.json["missing"] == ["ZZZ999"]
+    assert client.get("/api/vehicle?reg_number=,").status_code == 400
+
+    response = client.post("/api/booking/lookup?include=vehicle", headers=auth_headers, json=[2, 7, 1])
+    assert [b["booking_id"] for b in response.json["data"]] == [2, 1] and response.json["missing"] == [7]
+    assert [v["reg_number"] for v in response.json["included"]["vehicle"]] == ["BBB222", "AAA111"]
+    assert client.post("/api/booking/lookup", headers=auth_headers, json=["1"]).status_code == 400
+
+def test_idempotent_create(client, auth_headers):
+    """Test that a retried booking POST is replayed and books once."""
+    add_fleet(client, auth_headers)
+    headers = dict(auth_headers, **{"Idempotency-Key": "booking-1"})
+    booking = {"date_from": "2030-01-01", "date_to": "2030-01-05", "booking_status_code": "PENDING",
+               "Customer_customer_id": 1, "Vehicle_reg_number": "AAA111"}
+    first = client.post("/api/booking", headers=headers, json=booking)
+    retry = client.post("/api/booking", headers=headers, json=booking)
+    assert first.status_code == retry.status_code == 201 and retry.json == first.json
+    assert "Idempotent-Replayed" not in first.headers and retry.headers["Idempotent-Replayed"] == "true"
+    assert client.get("/api/booking?total=exact", headers=auth_headers).json["total"] == 1
+
+    assert client.post("/api/booking", headers=headers, json=dict(booking, Vehicle_reg_number="BBB222")).status_code == 422
+    assert client.post("/api/booking", headers=dict(auth_headers, **{"Idempotency-Key": ""}), json=booking).status_code == 400
+    stats = client.get("/api/admin/idempotency", headers=auth_headers).json["data"]
+    assert (stats["executed"], stats["replayed"], stats["key_reused"]) == (1, 1, 1)
+
+def test_idempotent_create_with_one_connection(client, auth_headers, storage, monkeypatch):
+    """Test that an idempotent create needs no second pooled connection."""
+    monkeypatch.setattr(api, "db_pool", ConnectionPool(storage.connect, max_size=1, timeout=0.5))
+    headers = dict(auth_headers, **{"Idempotency-Key": "customer-1"})
+    customer = {"customer_name": "Ann", "email_address": "ann@example.com"}
+    for _ in range(2):
+        assert client.post("/api/customer", headers=headers, json=customer).status_code == 201
+    stats = api.idempotency_store.stats()
+    assert (stats["executed"], stats["replayed"], stats["durable_errors"]) == (1, 1, 0)
+    assert api.db_pool.stats()["in_use"] == 0
+
+def test_list_filters(client, auth_headers):
+    """Test the booking and customer list filters end to end."""
+    add_fleet(client, auth_headers)
+    book(client, auth_headers, "AAA111", "2030-01-01", "2030-01-05")
+    book(client, auth_headers, "BBB222", "2030-02-01", "2030-02-05")
+    response = client.get("/api/booking?date_from=2030-01-04&date_to=2030-01-20&total=exact", headers=auth_headers)
+    assert [b["Vehicle_reg_number"] for b in response.json["data"]] == ["AAA111"]
+    assert client.get("/api/booking?Vehicle_reg_number=BBB222", headers=auth_headers).json["total"] == 1
+    assert client.get("/api/booking?date_from=2030-01-04", headers=auth_headers).status_code == 400
+    assert client.get("/api/customer?email_prefix=ANN@", headers=auth_headers).json["total"] == 1
+    assert client.get("/api/customer?email_prefix=bob", headers=auth_headers).json["data"] == []
+
+def test_customer_search_follows_writes(client, auth_headers):
+    """Test that search results reflect creates, updates and deletes."""
+    for name, email in (("Ann Smith", "ann@example.com"), ("Annabel Jones", "bel@example.com"), ("Bob Smithson", "bob@example.com")):
+        client.post("/api/customer", headers=auth_headers, json={"customer_name": name, "email_address": email})
+    response = client.get("/api/customer/search?q=ann", headers=auth_headers)
+    assert [c["customer_id"] for c in response.json["data"]] == [1, 2]
+
+    client.put("/api/customer/2", headers=auth_headers, json={"customer_name": "Belinda Jones"})
+    client.delete("/api/customer/1", headers=auth_headers)
+    assert client.get("/api/customer/search?q=ann", headers=auth_headers).json["data"] == []
+    response = client.get("/api/customer/search?q=smitson", headers=auth_headers)
+    assert [c["customer_name"] for c in response.json["data"]] == ["Bob Smithson"]
+    assert client.get("/api/customer/search?q=-", headers=auth_headers).status_code == 400
+
+def test_available_and_export(client, auth_headers):
+    """Test the availability search and a streamed export."""
+    add_fleet(client, auth_headers)
+    book(client, auth_headers, "AAA111", "2030-01-01", "2030-01-05")
+    response = client.get("/api/vehicle/available?from=2030-01-03&to=2030-01-04&category=SUV")
+    assert [v["reg_number"] for v in response.json["data"]] == ["BBB222"]
+
+    export = client.get("/api/booking/export?format=csv&from=2030-01-01", headers=auth_headers)
+    lines = export.get_data(as_text=True).splitlines()
+    assert lines[0].startswith("booking_id,") and len(lines) == 2
+
+def test_utilization_follows_writes(client, auth_headers):
+    """Test fleet utilization before and after booking writes."""
+    pytest.importorskip("numpy")
+    add_fleet(client, auth_headers)
+    book(client, auth_headers, "AAA111", "2030-01-01", "2030-01-05")
+    url = "/api/analytics/utilization?from=2030-01-01&to=2030-01-10"
+    response = client.get(url, headers=auth_headers)
+    assert response.json["data"]["fleet"]["booked_days"] == 5
+
+    book(client, auth_headers, "CCC333", "2030-01-09", "2030-01-12")
+    client.put("/api/booking/1", headers=auth_headers, json={"date_from": "2030-01-02", "date_to": "2030-01-03"})
+    response = client.get(url + "&category=SUV&by=vehicle&limit=1", headers=auth_headers)
+    assert [v["reg_number"] for v in response.json["vehicles"]] == ["AAA111"] and response.json["next"]
+    assert response.json["data"]["fleet"]["booked_days"] == 2
+    response = client.get(url, headers=auth_headers)
+    assert response.json["data"]["fleet"]["booked_days"] == 4
+    assert client.get(url + "&category=Truck", headers=auth_headers).status_code == 404
+    assert client.get("/api/analytics/utilization?from=2030-01-10&to=2030-01-01", headers=auth_headers).status_code == 400
+
+def test_customer_booking_history(client, auth_headers):
+    """Test the embedded vehicle and status, paging, the summary and an unknown customer."""
+    add_fleet(client, auth_headers)
+    client.post("/api/customer", headers=auth_headers, json={"customer_name": "Bob", "email_address": "bob@example.com"})
+    book(client, auth_headers, "AAA111", "2030-01-01", "2030-01-03")
+    book(client, auth_headers, "CCC333", "2030-01-05", "2030-01-05", "CANCELLED")
+    book(client, auth_headers, "BBB222", "2030-01-07", "2030-01-08")
+
+    response = client.get("/api/customer/1/bookings?limit=2&summary=true", headers=auth_headers)
+    assert [b["booking_id"] for b in response.json["data"]] == [3, 2]
+    first = response.json["data"][0]
+    assert first["vehicle"] == {"reg_number": "BBB222", "model_code": "M1", "current_mileage": 0,
+                                "engine_size": 0, "vehicle_category_description": "SUV"}
+    assert first["status"] == {"status_code": "PENDING", "description": "Pending"}
+    assert response.json["summary"] == {"bookings": 3, "rental_days": 5, "by_status": {"CANCELLED": 1, "PENDING": 2}}
+
+    response = client.get(f"/api/customer/1/bookings?limit=2&after={response.json['next']}", headers=auth_headers)
+    assert [b["booking_id"] for b in response.json["data"]] == [1]
+    assert response.json["next"] is None and "summary" not in response.json
+    assert client.get("/api/customer/2/bookings", headers=auth_headers).json["data"] == []
+    assert client.get("/api/customer/9/bookings", headers=auth_headers).status_code == 404
+    assert client.get("/api/customer/1/bookings?limit=0", headers=auth_headers).status_code == 400
+
+def test_daily_report_follows_writes(client, auth_headers, storage):
+    """Test the daily summary after booking, vehicle and import writes."""
+    add_fleet(client, auth_headers)
+    book(client, auth_headers, "AAA111", "2030-01-01", "2030-01-03")
+    book(client, auth_headers, "BBB222", "2030-01-02", "2030-01-02")
+    client.put("/api/booking/1", headers=auth_headers, json={"date_from": "2030-01-02", "date_to": "2030-01-04"})
+    client.delete("/api/booking/2", headers=auth_headers)
+    client.put("/api/vehicle/AAA111", json={"model_code": "M1", "current_mileage": 0, "engine_size": 0,
+                                             "vehicle_category_description": "Van"})
+    data = b'{"Customer_customer_id": 1, "Vehicle_reg_number": "CCC333", "date_from": "2030-01-04", "date_to": "2030-01-05"}\n'
+    client.post("/api/booking/import?format=ndjson", headers=auth_headers, data=data)
+
+    response = client.get("/api/reports/daily?from=2030-01-01&to=2030-01-04", headers=auth_headers)
+    assert [(r["day"], r["vehicle_category_description"], r["pickups"], r["dropoffs"], r["rental_days"])
+            for r in response.json["data"]] == [
+        ("2030-01-02", "Van", 1, 0, 3), ("2030-01-04", "Van", 1, 1, 2),
+    ]
+    assert response.json["totals"] == {"pickups": 2, "dropoffs": 1, "rental_days": 5}
+    conn = storage.connect()
+    assert reconcile(conn, dry_run=True)["wrong"] == 0
+    conn.close()
+    assert client.get("/api/reports/daily?from=2030-01-04&to=2030-01-01", headers=auth_headers).status_code == 400
+
+def test_bulk_and_import_report_duplicates(client, auth_headers):
+    """Test duplicate detection against the primary key."""
+    add_fleet(client, auth_headers)
+    response = client.post("/api/vehicle/bulk", json=[
+        {"reg_number": "AAA111", "model_code": "M1", "vehicle_category_description": "SUV"},
+        {"reg_number": "DDD444", "model_code": "M1", "vehicle_category_description": "SUV"},
+    ])
+    assert [r["status"] for r in response.json["results"]] == ["duplicate", "created"]
+
+    data = b"reg_number,model_code,vehicle_category_description\nDDD444,M1,SUV\nEEE555,M1,Van\n"
+    response = client.post("/api/vehicle/import?format=csv", headers=auth_headers, data=data)
+    assert (response.json["data"]["inserted"], response.json["data"]["duplicate"]) == (1, 1)
+
+def test_import_rejects_double_bookings(client, auth_headers):
+    """Test that imported bookings may not overlap stored bookings or each other."""
+    add_fleet(client, auth_headers)
+    book(client, auth_headers, "AAA111", "2030-01-01", "2030-01-05")
+    data = (b"Customer_customer_id,Vehicle_reg_number,date_from,date_to\n"
+            b"1,AAA111,2030-01-05,2030-01-06\n1,BBB222,2030-01-01,2030-01-03\n1,BBB222,2030-01-03,2030-01-04\n")
+    report = client.post("/api/booking/import?format=csv", headers=auth_headers, data=data).json["data"]
+    assert (report["inserted"], report["invalid"]) == (1, 2)
+    assert report["errors"][0]["error"].endswith(": 1")
+    assert client.get("/api/booking?total=exact", headers=auth_headers).json["total"] == 2
+
+def test_failed_import_still_changes_etag(client, auth_headers, monkeypatch):
+    """Test that rows committed before an import fails are reflected in ETags and indexes."""
+    import importer
+    monkeypatch.setitem(importer.IMPORT_CONFIG, "chunk_size", 1)
+    monkeypatch.setitem(importer.IMPORT_CONFIG, "commit_every", 1)
+    add_fleet(client, auth_headers)
+    etag = client.get("/api/vehicle").headers["ETag"]
+    client.get("/api/vehicle/available?from=2030-01-01&to=2030-01-02")
+    assert not api.availability_index.is_stale()
+
+    data = b"reg_number,model_code,vehicle_category_description\nDDD444,M1,SUV\n\xff\xfe,M1,SUV\n"
+    response = client.post("/api/vehicle/import?format=csv", headers=auth_headers, data=data)
+    assert response.status_code == 500
+    response = client.get("/api/vehicle", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and len(response.json["data"]) == 4
+    assert api.availability_index.is_stale()
+
+def test_cli_import_changes_etag(client, auth_headers, storage, monkeypatch, tmp_path):
+    """Test that rows loaded by the import CLI invalidate list ETags."""
+    add_fleet(client, auth_headers)
+    etag = client.get("/api/vehicle").headers["ETag"]
+    path = tmp_path / "vehicles.csv"
+    path.write_bytes(b"reg_number,model_code,vehicle_category_description\nDDD444,M1,SUV\n")
+    monkeypatch.setattr(api, "connect_db", storage.connect)
+    assert import_main(["vehicle", str(path)]) == 0
+    response = client.get("/api/vehicle", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and len(response.json["data"]) == 4
+
+if __name__ == "__main__":
+    pytest.main()
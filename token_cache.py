@@ -0,0 +1,126 @@
+import hashlib
+import threading
+import time
+import jwt
+from cache import MISSING, LRUCache, InvalidationFeed
+
+
+# Backend TTL, in seconds, for a revoked token without `exp`
+REVOKED_FOREVER = 10 * 365 * 86400
+
+
+class TokenCache:
+    """Cache of verified JWT claims, keyed by a SHA-256 digest of the token.
+
+    A miss runs the full `decode` (signature, exp and nbf checks) and caches
+    the claims for at most `ttl` seconds and never past the token's `exp`;
+    a hit re-checks `exp`. Revoked tokens are rejected even though their
+    signature is valid, until the token expires; a token without `exp`
+    stays revoked. With a shared cache backend, revocations are
+    stored there and published, so other workers evict the token within
+    `poll_interval` seconds. `max_entries=0` turns caching off.
+    """
+
+    def __init__(self, decode, max_entries=10000, ttl=300.0, backend=None, poll_interval=1.0):
+        self.decode_token = decode
+        self.ttl = ttl
+        self.claims = LRUCache(max_entries, ttl) if max_entries else None
+        self.backend = backend
+        self.feed = InvalidationFeed(backend, poll_interval) if backend is not None else None
+        # digest -> time.time() after which the token is expired anyway
+        self.revoked = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "revoked": 0}
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _sync(self):
+        if self.feed is None or self.claims is None:
+            return
+        try:
+            reset, keys = self.feed.poll()
+        except Exception:
+            return
+        if reset:
+            self.claims.clear()
+        for key in keys:
+            if key.startswith("token:"):
+                self.claims.delete(key[len("token:"):])
+
+    def _is_revoked(self, digest):
+        with self._lock:
+            expires = self.revoked.get(digest)
+            if expires is not None:
+                if expires > time.time():
+                    return True
+                del self.revoked[digest]
+        if self.backend is not None:
+            try:
+                expires = self.backend.get(f"revoked:{digest}")
+            except Exception:
+                return False
+            if expires is not MISSING and expires > time.time():
+                with self._lock:
+                    self.revoked[digest] = expires
+                return True
+        return False
+
+    def decode(self, token):
+        digest = self.digest(token)
+        if self.claims is not None:
+            self._sync()
+            claims = self.claims.get(digest)
+            if claims is not MISSING:
+                if "exp" in claims and claims["exp"] <= time.time():
+                    self.claims.delete(digest)
+                    self._count("expired")
+                    raise jwt.ExpiredSignatureError("Signature has expired")
+                self._count("hits")
+                return dict(claims)
+
+        if self._is_revoked(digest):
+            self._count("revoked")
+            raise jwt.InvalidTokenError("Token has been revoked")
+        self._count("misses")
+        claims = self.decode_token(token)
+        if self.claims is not None:
+            ttl = self.ttl
+            if "exp" in claims:
+                ttl = min(ttl, claims["exp"] - time.time())
+            self.claims.set(digest, claims, ttl)
+        return dict(claims)
+
+    # Reject `token`, whose verified claims are `claims`, from now on. The
+    # revocation is dropped once the token has expired; a token without
+    # `exp` never expires, so it stays revoked. Login tokens all have `exp`,
+    # so only tokens issued before that accumulate here.
+    def revoke(self, token, claims):
+        digest = self.digest(token)
+        now = time.time()
+        expires = claims.get("exp", float("inf"))
+        with self._lock:
+            self.revoked = {d: e for d, e in self.revoked.items() if e > now}
+            self.revoked[digest] = expires
+        if self.claims is not None:
+            self.claims.delete(digest)
+        if self.backend is not None:
+            try:
+                self.backend.set(f"revoked:{digest}", expires, min(expires - now, REVOKED_FOREVER))
+                self.backend.publish(f"token:{digest}")
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["revoked_size"] = len(self.revoked)
+        stats["size"] = len(self.claims) if self.claims is not None else 0
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
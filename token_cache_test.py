@@ -0,0 +1,104 @@
+import time
+import jwt
+import pytest
+from unittest.mock import MagicMock
+from cache import SQLiteBackend
+from token_cache import TokenCache
+
+SECRET = "test-secret-key-that-is-long-enough"
+
+def make_cache(**kwargs):
+    """TokenCache around a real HS256 decode, with the decode call counted."""
+    decode = MagicMock(side_effect=lambda token: jwt.decode(token, SECRET, algorithms=["HS256"]))
+    return TokenCache(decode, **kwargs), decode
+
+def make_token(**claims):
+    return jwt.encode({"username": "admin", "role": "admin", **claims}, SECRET, algorithm="HS256")
+
+def test_cached_token_skips_verification():
+    """Test that a reused token is verified once."""
+    cache, decode = make_cache()
+    token = make_token()
+    assert cache.decode(token)["role"] == "admin"
+    assert cache.decode(token)["role"] == "admin"
+    assert decode.call_count == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+def test_invalid_signature_is_never_cached():
+    """Test that a forged token fails on every request."""
+    cache, _ = make_cache()
+    forged = jwt.encode({"role": "admin"}, "another-secret-key-that-is-long-enough", algorithm="HS256")
+    for _ in range(2):
+        with pytest.raises(jwt.InvalidSignatureError):
+            cache.decode(forged)
+    assert cache.stats()["size"] == 0
+
+def test_cached_token_expires():
+    """Test that a cached token is rejected once exp has passed."""
+    cache, _ = make_cache()
+    token = make_token(exp=int(time.time()) + 60)
+    claims = cache.decode(token)
+    cache.claims.set(cache.digest(token), {**claims, "exp": int(time.time()) - 1})
+    with pytest.raises(jwt.ExpiredSignatureError):
+        cache.decode(token)
+
+def test_not_yet_valid_token_rejected():
+    """Test that nbf is enforced by the verifying decode."""
+    cache, _ = make_cache()
+    with pytest.raises(jwt.ImmatureSignatureError):
+        cache.decode(make_token(nbf=int(time.time()) + 3600))
+
+def test_revoked_token_rejected():
+    """Test that a revoked token is evicted and rejected."""
+    cache, _ = make_cache()
+    token = make_token()
+    claims = cache.decode(token)
+    cache.revoke(token, claims)
+    with pytest.raises(jwt.InvalidTokenError):
+        cache.decode(token)
+    assert cache.stats()["revoked"] == 1
+
+def test_revocation_expires():
+    """Test that a revocation ends with the token's exp."""
+    cache, _ = make_cache()
+    short = make_token(exp=int(time.time()) + 3600, jti="a")
+    cache.revoke(short, cache.decode(short))
+    cache.revoked[cache.digest(short)] = time.time() - 1
+    cache.claims.clear()
+    assert cache.decode(short)["jti"] == "a"
+    assert cache.digest(short) not in cache.revoked
+
+def test_token_without_exp_stays_revoked(monkeypatch):
+    """Test that a logged-out token without exp is still rejected days later."""
+    cache, _ = make_cache()
+    token = make_token()
+    cache.revoke(token, cache.decode(token))
+    later = time.time() + 2 * 86400
+    monkeypatch.setattr(time, "time", lambda: later)
+    cache.revoke(make_token(jti="other"), {})
+    cache.claims.clear()
+    with pytest.raises(jwt.InvalidTokenError):
+        cache.decode(token)
+
+def test_caching_disabled():
+    """Test that max_entries=0 verifies every request."""
+    cache, decode = make_cache(max_entries=0)
+    token = make_token()
+    cache.decode(token)
+    cache.decode(token)
+    assert decode.call_count == 2
+
+def test_revocation_reaches_other_workers(tmp_path):
+    """Test that a token revoked in one worker is rejected by another that cached it."""
+    path = str(tmp_path / "cache.db")
+    worker_a, _ = make_cache(backend=SQLiteBackend(path), poll_interval=0)
+    worker_b, _ = make_cache(backend=SQLiteBackend(path), poll_interval=0)
+    token = make_token()
+    worker_b.decode(token)
+
+    worker_a.revoke(token, worker_a.decode(token))
+    with pytest.raises(jwt.InvalidTokenError):
+        worker_b.decode(token)
+
+if __name__ == "__main__":
+    pytest.main()
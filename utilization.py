@@ -0,0 +1,431 @@
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from datetime import date
+from availability import stream_rows, to_day
+from conn import AVAILABILITY_CONFIG, UTILIZATION_CONFIG
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Fleet utilization over a date window, computed on columnar copies of the
+# vehicle and booking tables: one NumPy array per column, so a window over
+# millions of bookings is a handful of vectorized passes instead of a
+# Python loop per booking.
+#
+# Bookings are kept in two parts. Slots below `sorted_count` are grouped
+# into buckets by start day (bookings longer than LONG_SPAN days go in a
+# bucket of their own, first) and ordered by (vehicle, start day) within
+# each, so a window only reads the long bookings and the buckets that can
+# reach it. Later slots are a tail of recent writes in arrival order, merged
+# into the sorted part once it grows past a fraction of it. An updated
+# booking is moved to the tail and a deleted one is marked dead (vehicle
+# -1) in place.
+
+
+# Tail slots kept before they are merged into the sorted part, at least
+MIN_TAIL = 65536
+
+# Days of start dates per bucket, and the longest booking kept in one
+BUCKET_DAYS = 32
+LONG_SPAN = 31
+
+
+class UtilizationError(Exception):
+    pass
+
+
+def _require_numpy():
+    if np is None:
+        raise UtilizationError("The numpy package is required for utilization analytics")
+
+
+class FleetArrays:
+    """Columnar copy of vehicles and active bookings for utilization analytics.
+
+    Bookings whose status is listed in AVAILABILITY_CONFIG["inactive_statuses"]
+    do not occupy a vehicle, as in AvailabilityIndex. Until the first load
+    starts, writes are ignored: the load reads them from the database.
+    """
+
+    def __init__(self, inactive_statuses=None):
+        self.inactive_statuses = set(AVAILABILITY_CONFIG["inactive_statuses"] if inactive_statuses is None else inactive_statuses)
+        self.lock = threading.RLock()
+        self.loaded_at = None
+        self.built = False
+        self._loading = False
+        self._pending = []
+
+    # Rebuild from (reg_number, category) and (booking_id, reg_number,
+    # date_from, date_to, status) rows. As in AvailabilityIndex.load, the
+    # arrays are built aside and swapped in, and writes that land meanwhile
+    # are replayed onto them.
+    def load(self, vehicles, bookings):
+        _require_numpy()
+        self.begin_load()
+        try:
+            regs, vehicle_ids, categories, category_ids, vehicle_category = [], {}, [], {}, []
+            for reg_number, category in vehicles:
+                if category not in category_ids:
+                    category_ids[category] = len(categories)
+                    categories.append(category)
+                vehicle_ids[reg_number] = len(regs)
+                regs.append(reg_number)
+                vehicle_category.append(category_ids[category])
+
+            # Typed buffers take 4 or 8 bytes a booking where lists of ints
+            # would take 36
+            ids, vehicle, start, end = array("q"), array("i"), array("i"), array("i")
+            for booking_id, reg_number, date_from, date_to, status in bookings:
+                if status in self.inactive_statuses or reg_number not in vehicle_ids:
+                    continue
+                ids.append(booking_id)
+                vehicle.append(vehicle_ids[reg_number])
+                start.append(to_day(date_from))
+                end.append(to_day(date_to))
+            columns = (
+                np.frombuffer(ids, dtype=np.int64),
+                np.frombuffer(vehicle, dtype=np.int32),
+                np.frombuffer(start, dtype=np.int32),
+                np.frombuffer(end, dtype=np.int32),
+            )
+        except Exception:
+            self.abort_load()
+            raise
+        with self.lock:
+            self.regs = regs
+            self.vehicle_ids = vehicle_ids
+            self.categories = categories
+            self.category_ids = category_ids
+            self.vehicle_category = np.array(vehicle_category, dtype=np.int32)
+            self._by_reg = None
+            self._set_sorted(*columns)
+            self.built = True
+            self.loaded_at = time.monotonic()
+            self._replay()
+
+    # Replace the bookings with the given live columns, sorted
+    def _set_sorted(self, ids, vehicle, start, end):
+        bucket = np.where(end - start > LONG_SPAN, -1, start // BUCKET_DAYS)
+        order = np.lexsort((start, vehicle, bucket))
+        self.booking_id = ids[order]
+        self.vehicle = vehicle[order]
+        self.start = start[order]
+        self.end = end[order]
+        self.size = self.sorted_count = len(order)
+        self.buckets, offsets = np.unique(bucket[order], return_index=True)
+        self.bucket_offsets = np.append(offsets, len(order))
+        self.dead = 0
+        self.id_order = np.argsort(self.booking_id, kind="stable")
+        self.id_sorted = self.booking_id[self.id_order]
+        self.tail = {}
+
+    def _compact(self):
+        live = self.vehicle[:self.size] >= 0
+        self._set_sorted(*(column[:self.size][live] for column in (self.booking_id, self.vehicle, self.start, self.end)))
+
+    # As in AvailabilityIndex: writes made between begin_load() and the end
+    # of load() are recorded and replayed onto the rebuilt arrays
+    def begin_load(self):
+        with self.lock:
+            if not self._loading:
+                self._loading = True
+                self._pending = []
+
+    def abort_load(self):
+        with self.lock:
+            self._loading = False
+            self._pending = []
+
+    def _replay(self):
+        self._loading = False
+        pending, self._pending = self._pending, []
+        for name, args in pending:
+            getattr(self, name)(*args)
+
+    def _written(self, name, *args):
+        if self._loading:
+            self._pending.append((name, args))
+        return self.built
+
+    def is_stale(self, max_age=None):
+        max_age = UTILIZATION_CONFIG["max_age"] if max_age is None else max_age
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > max_age
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+
+    def put_vehicle(self, reg_number, category):
+        with self.lock:
+            if not self._written("put_vehicle", reg_number, category):
+                return
+            if category not in self.category_ids:
+                self.category_ids[category] = len(self.categories)
+                self.categories.append(category)
+            i = self.vehicle_ids.get(reg_number)
+            if i is None:
+                self.vehicle_ids[reg_number] = len(self.regs)
+                self.regs.append(reg_number)
+                self._by_reg = None
+                self.vehicle_category = np.append(self.vehicle_category, np.int32(self.category_ids[category]))
+            else:
+                self.vehicle_category[i] = self.category_ids[category]
+
+    def remove_vehicle(self, reg_number):
+        with self.lock:
+            if not self._written("remove_vehicle", reg_number):
+                return
+            i = self.vehicle_ids.get(reg_number)
+            if i is None or self.vehicle_category[i] < 0:
+                return
+            self.vehicle_category[i] = -1
+            bookings = self.vehicle[:self.size] == i
+            self.dead += int(np.count_nonzero(bookings))
+            self.vehicle[:self.size][bookings] = -1
+
+    # Slot of a live booking, or None
+    def _slot(self, booking_id):
+        slot = self.tail.get(booking_id)
+        if slot is None:
+            i = int(np.searchsorted(self.id_sorted, booking_id))
+            if i < len(self.id_sorted) and self.id_sorted[i] == booking_id:
+                slot = int(self.id_order[i])
+        if slot is None or self.vehicle[slot] < 0:
+            return None
+        return slot
+
+    # Insert or replace a booking. `reg_number` may be None on updates that
+    # do not move the booking to another vehicle.
+    def put_booking(self, booking_id, reg_number, date_from, date_to, status=None):
+        with self.lock:
+            if not self._written("put_booking", booking_id, reg_number, date_from, date_to, status):
+                return
+            previous = self._remove_booking(booking_id)
+            if reg_number is None:
+                if previous is None:
+                    self.loaded_at = None
+                    return
+                reg_number = previous
+            vehicle = self.vehicle_ids.get(reg_number)
+            if status in self.inactive_statuses or vehicle is None:
+                return
+            if self.size == len(self.vehicle):
+                self._grow()
+            slot = self.size
+            self.booking_id[slot] = booking_id
+            self.vehicle[slot] = vehicle
+            self.start[slot] = to_day(date_from)
+            self.end[slot] = to_day(date_to)
+            self.tail[booking_id] = slot
+            self.size += 1
+            if len(self.tail) > max(MIN_TAIL, self.sorted_count // 8):
+                self._compact()
+
+    # Returns the reg_number the booking was on, or None if it was unknown
+    def remove_booking(self, booking_id):
+        with self.lock:
+            if not self._written("remove_booking", booking_id):
+                return None
+            return self._remove_booking(booking_id)
+
+    def _remove_booking(self, booking_id):
+        slot = self._slot(booking_id)
+        if slot is None:
+            return None
+        previous = self.regs[self.vehicle[slot]]
+        self.vehicle[slot] = -1
+        self.tail.pop(booking_id, None)
+        self.dead += 1
+        if self.dead > self.size // 4:
+            self._compact()
+        return previous
+
+    # Double the capacity of the booking columns
+    def _grow(self):
+        capacity = max(1024, 2 * len(self.vehicle))
+        for name in ("booking_id", "vehicle", "start", "end"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    # (reg_numbers, vehicle indexes), both in reg_number order
+    def _reg_order(self):
+        if self._by_reg is None:
+            order = sorted(range(len(self.regs)), key=self.regs.__getitem__)
+            self._by_reg = ([self.regs[v] for v in order], order)
+        return self._by_reg
+
+    # Utilization of the fleet and of each category, or of one category,
+    # over the inclusive window [date_from, date_to]; see _measure for the
+    # figures. With `limit`, also up to that many vehicles in reg_number
+    # order after `after`, and whether more follow. None if `category` has
+    # no vehicles.
+    def utilization(self, date_from, date_to, category=None, after=None, limit=None):
+        _require_numpy()
+        first, last = to_day(date_from), to_day(date_to)
+        with self.lock:
+            if category is not None and category not in self.category_ids:
+                return None
+            result, booked, gaps, longest, in_scope = _measure(
+                self, first, last, None if category is None else self.category_ids[category]
+            )
+            if limit is None:
+                return result
+            regs, order = self._reg_order()
+            i = bisect_right(regs, after) if after is not None else 0
+            vehicles = []
+            while i < len(order) and len(vehicles) < limit:
+                v = order[i]
+                i += 1
+                if in_scope[v]:
+                    vehicles.append({
+                        "reg_number": regs[i - 1],
+                        "vehicle_category_description": self.categories[self.vehicle_category[v]],
+                        "booked_days": int(booked[v]),
+                        "utilization": round(int(booked[v]) / result["days"], 4),
+                        "idle_gaps": int(gaps[v]),
+                        "longest_idle_gap": int(longest[v]),
+                    })
+            result["vehicles"] = vehicles
+            result["has_more"] = bool(in_scope[order[i:]].any()) if i < len(order) else False
+            return result
+
+
+# (vehicle, start, end) of the live bookings overlapping days first..last:
+# the long ones, the buckets of bookings starting from LONG_SPAN days before
+# `first`, and the tail
+def _window(fleet, first, last):
+    buckets, offsets = fleet.buckets, fleet.bucket_offsets
+    lo = np.searchsorted(buckets, (first - LONG_SPAN) // BUCKET_DAYS)
+    hi = np.searchsorted(buckets, last // BUCKET_DAYS, side="right")
+    parts = [(offsets[lo], offsets[hi]), (fleet.sorted_count, fleet.size)]
+    if len(buckets) and buckets[0] < 0:
+        parts.append((0, offsets[1]))
+    columns = []
+    for column in (fleet.vehicle, fleet.start, fleet.end):
+        columns.append(np.concatenate([column[i:j] for i, j in parts]))
+    vehicle, start, end = columns
+    keep = np.flatnonzero((vehicle >= 0) & (start <= last) & (end >= first))
+    return vehicle.take(keep), start.take(keep), end.take(keep)
+
+
+def _summary(vehicles, days, booked, gaps, longest, peak, peak_day):
+    available = vehicles * days
+    return {
+        "vehicles": int(vehicles),
+        "available_days": int(available),
+        "booked_days": int(booked),
+        "utilization": round(float(booked) / available, 4) if available else 0.0,
+        "idle_gaps": int(gaps),
+        "longest_idle_gap": int(longest),
+        "peak_concurrent": int(peak),
+        "peak_date": date.fromordinal(int(peak_day)).isoformat() if peak else None,
+    }
+
+# Per-vehicle figures over days first..last, from the arrays of `fleet`
+# (whose lock the caller holds):
+#   booked days   days covered by at least one booking, overlaps counted once
+#   idle gaps     runs of consecutive unbooked days, and the longest one
+#   peak          most vehicles booked on one day, and the first such day
+# Within a vehicle, sorted by start, each booking only adds the days past
+# the latest end seen so far; a running maximum over keys offset by
+# vehicle computes that latest end for every vehicle in one pass.
+def _measure(fleet, first, last, category):
+    days = last - first + 1
+    n_vehicles = len(fleet.regs)
+    vehicle_category = fleet.vehicle_category
+    in_scope = vehicle_category >= 0 if category is None else vehicle_category == category
+
+    vehicle, start, end = _window(fleet, first, last)
+    if category is not None:
+        keep = np.flatnonzero(vehicle_category.take(vehicle) == category)
+        vehicle, start, end = vehicle.take(keep), start.take(keep), end.take(keep)
+    start = np.maximum(start, first) - first
+    end = np.minimum(end, last) - first
+
+    booked = np.zeros(n_vehicles, dtype=np.int64)
+    gaps = np.where(in_scope, 1, 0)
+    longest = np.where(in_scope, days, 0)
+    daily = np.zeros((len(fleet.categories), days + 1), dtype=np.int64)
+    if len(vehicle):
+        stride = days + 1
+        # The parts read are each ordered by (vehicle, start) but for the
+        # tail, and a stable sort merges such runs in close to linear time
+        offset = vehicle.astype(np.int64) * stride
+        order = np.argsort(offset + start, kind="stable")
+        vehicle, start, end, offset = vehicle.take(order), start.take(order), end.take(order), offset.take(order)
+        latest = np.maximum.accumulate(offset + end) - offset
+        opens = np.ones(len(vehicle), dtype=bool)
+        opens[1:] = vehicle[1:] != vehicle[:-1]
+        previous = np.empty_like(latest)
+        previous[0] = -1
+        previous[1:] = latest[:-1]
+        previous[opens] = -1
+
+        # Days each booking adds, from the day after the latest end so far
+        added_from = np.maximum(start, previous + 1)
+        added = np.maximum(end - added_from + 1, 0)
+        booked = np.bincount(vehicle, weights=added, minlength=n_vehicles).astype(np.int64)
+
+        # Gaps before each booking and after each vehicle's last one
+        before = np.maximum(start - previous - 1, 0)
+        segments = np.flatnonzero(opens)
+        closes = np.append(segments[1:] - 1, len(vehicle) - 1)
+        after = days - 1 - latest[closes]
+        booked_vehicles = vehicle[segments]
+        gaps[booked_vehicles] = np.add.reduceat((before > 0).astype(np.int64), segments) + (after > 0)
+        longest[booked_vehicles] = np.maximum(np.maximum.reduceat(before, segments), after)
+
+        # Vehicles booked per day and category, from the added stretches
+        # (which never overlap within a vehicle)
+        new = added > 0
+        categories = vehicle_category[vehicle[new]].astype(np.int64)
+        starts = categories * stride + added_from[new]
+        ends = categories * stride + end[new] + 1
+        cells = len(fleet.categories) * stride
+        daily = (np.bincount(starts, minlength=cells) - np.bincount(ends, minlength=cells)).reshape(-1, stride)
+    daily = np.cumsum(daily, axis=1)[:, :days]
+
+    scope = np.flatnonzero(in_scope)
+    scope_categories = vehicle_category[scope]
+    n_categories = len(fleet.categories)
+    counts = np.bincount(scope_categories, minlength=n_categories)
+    booked_days = np.bincount(scope_categories, weights=booked[scope], minlength=n_categories)
+    gap_counts = np.bincount(scope_categories, weights=gaps[scope], minlength=n_categories)
+    longest_gaps = np.zeros(n_categories, dtype=np.int64)
+    np.maximum.at(longest_gaps, scope_categories, longest[scope])
+    fleet_daily = daily.sum(axis=0)
+
+    summaries = [
+        {"vehicle_category_description": fleet.categories[c],
+         **_summary(counts[c], days, booked_days[c], gap_counts[c], longest_gaps[c], daily[c].max(initial=0), first + int(daily[c].argmax()))}
+        for c in range(n_categories) if counts[c]
+    ]
+    result = {
+        "days": days,
+        "fleet": _summary(len(scope), days, booked[scope].sum(), gaps[scope].sum(), longest[scope].max(initial=0),
+                          fleet_daily.max(initial=0), first + int(fleet_daily.argmax()) if days else first),
+        "categories": sorted(summaries, key=lambda summary: summary["vehicle_category_description"]),
+    }
+    return result, booked, gaps, longest, in_scope
+
+
+# Build `fleet` from the vehicle and booking tables
+def load_arrays(fleet, conn, chunk_size=10000):
+    cursor = conn.cursor()
+    fleet.begin_load()
+    try:
+        cursor.execute("SELECT reg_number, vehicle_category_description FROM vehicle")
+        vehicles = cursor.fetchall()
+        cursor.execute("SELECT booking_id, Vehicle_reg_number, date_from, date_to, booking_status_code FROM booking")
+        fleet.load(vehicles, stream_rows(cursor, chunk_size))
+    except Exception:
+        fleet.abort_load()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,160 @@
+import pytest
+import random
+from datetime import date, timedelta
+from unittest.mock import MagicMock
+
+np = pytest.importorskip("numpy")
+
+import utilization
+from utilization import FleetArrays, load_arrays
+
+VEHICLES = [("AAA111", "SUV"), ("BBB222", "SUV"), ("CCC333", "Van")]
+BOOKINGS = [
+    (1, "AAA111", "2030-01-01", "2030-01-05", "PENDING"),
+    (2, "AAA111", "2030-01-04", "2030-01-06", "CONFIRMED"),
+    (3, "AAA111", "2030-01-09", "2030-01-09", "PENDING"),
+    (4, "BBB222", "2030-01-03", "2030-01-04", "CANCELLED"),
+    (5, "CCC333", "2029-12-30", "2030-01-02", "PENDING"),
+]
+
+@pytest.fixture
+def fleet():
+    fleet = FleetArrays(inactive_statuses=["CANCELLED"])
+    fleet.load(VEHICLES, BOOKINGS)
+    return fleet
+
+def by_reg(result):
+    return {v["reg_number"]: (v["booked_days"], v["idle_gaps"], v["longest_idle_gap"]) for v in result["vehicles"]}
+
+def test_overlaps_are_counted_once(fleet):
+    """Test booked days, idle gaps and peaks over a window."""
+    result = fleet.utilization("2030-01-01", "2030-01-10", limit=10)
+    assert result["days"] == 10
+    assert by_reg(result) == {"AAA111": (7, 2, 2), "BBB222": (0, 1, 10), "CCC333": (2, 1, 8)}
+    assert result["fleet"] == {
+        "vehicles": 3, "available_days": 30, "booked_days": 9, "utilization": 0.3,
+        "idle_gaps": 4, "longest_idle_gap": 10, "peak_concurrent": 2, "peak_date": "2030-01-01",
+    }
+    assert [c["vehicle_category_description"] for c in result["categories"]] == ["SUV", "Van"]
+    assert result["categories"][0]["booked_days"] == 7
+    assert result["has_more"] is False
+
+def test_category_and_paging(fleet):
+    """Test the category filter, keyset paging and an unknown category."""
+    result = fleet.utilization("2030-01-01", "2030-01-10", "SUV", limit=1)
+    assert [v["reg_number"] for v in result["vehicles"]] == ["AAA111"] and result["has_more"]
+    assert result["fleet"]["vehicles"] == 2
+    result = fleet.utilization("2030-01-01", "2030-01-10", "SUV", after="AAA111", limit=1)
+    assert [v["reg_number"] for v in result["vehicles"]] == ["BBB222"] and not result["has_more"]
+    assert fleet.utilization("2030-01-01", "2030-01-10", "Truck") is None
+
+def test_writes_update_the_arrays(fleet):
+    """Test that booking and vehicle writes are reflected without a reload."""
+    fleet.put_booking(4, "BBB222", "2030-01-03", "2030-01-04", "CONFIRMED")
+    fleet.put_booking(1, None, "2030-01-02", "2030-01-02", "PENDING")
+    fleet.remove_booking(3)
+    fleet.put_vehicle("DDD444", "Van")
+    fleet.put_booking(6, "DDD444", "2030-01-10", "2030-01-12")
+    result = fleet.utilization("2030-01-01", "2030-01-10", limit=10)
+    assert by_reg(result) == {
+        "AAA111": (4, 3, 4), "BBB222": (2, 2, 6), "CCC333": (2, 1, 8), "DDD444": (1, 1, 9),
+    }
+    fleet.remove_vehicle("AAA111")
+    result = fleet.utilization("2030-01-01", "2030-01-10", limit=10)
+    assert "AAA111" not in by_reg(result) and result["fleet"]["vehicles"] == 3
+
+def test_writes_during_load_are_kept(fleet):
+    """Test that writes made while the tables are read are replayed onto the new arrays."""
+    def bookings():
+        yield BOOKINGS[0]
+        fleet.put_booking(6, "BBB222", "2030-01-01", "2030-01-02")
+        fleet.remove_booking(5)
+        yield from BOOKINGS[1:]
+    fleet.load(VEHICLES, bookings())
+    result = by_reg(fleet.utilization("2030-01-01", "2030-01-10", limit=10))
+    assert result["BBB222"][0] == 2 and result["CCC333"][0] == 0
+    assert not fleet.is_stale()
+
+def test_writes_before_first_load_are_ignored():
+    """Test that an unbuilt fleet stays empty until loaded."""
+    fleet = FleetArrays()
+    fleet.put_booking(1, "AAA111", "2030-01-01", "2030-01-02")
+    assert not fleet.built and fleet.is_stale()
+
+# Booked days, idle gaps and longest gap per vehicle, and the peak, by
+# walking every day of the window
+def brute_force(vehicles, bookings, first, last):
+    days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+    covered = {reg: set() for reg, _ in vehicles}
+    for _, reg, date_from, date_to, status in bookings:
+        if status != "CANCELLED" and reg in covered:
+            covered[reg].update(day for day in days if date_from <= day <= date_to)
+    figures = {}
+    for reg, booked in covered.items():
+        runs, run = [], 0
+        for day in days:
+            if day in booked:
+                runs.append(run)
+                run = 0
+            else:
+                run += 1
+        runs = [r for r in runs + [run] if r]
+        figures[reg] = (len(booked), len(runs), max(runs, default=0))
+    daily = [sum(day in booked for booked in covered.values()) for day in days]
+    return figures, max(daily)
+
+@pytest.mark.parametrize("min_tail", [utilization.MIN_TAIL, 4])
+def test_matches_brute_force(monkeypatch, min_tail):
+    """Test random windows after random writes, with and without compaction."""
+    monkeypatch.setattr(utilization, "MIN_TAIL", min_tail)
+    rng = random.Random(7)
+    start = date(2030, 1, 1)
+    vehicles = [(f"R{i:03d}", rng.choice(["SUV", "Van", "Sedan"])) for i in range(30)]
+
+    def random_booking(booking_id, reg):
+        date_from = start + timedelta(days=rng.randint(0, 150))
+        date_to = date_from + timedelta(days=rng.randint(0, 15) if rng.random() < 0.9 else rng.randint(32, 90))
+        return (booking_id, reg, date_from, date_to, rng.choice(["PENDING", "CONFIRMED", "CANCELLED"]))
+
+    bookings = {i: random_booking(i, rng.choice(vehicles)[0]) for i in range(1, 301)}
+    fleet = FleetArrays(inactive_statuses=["CANCELLED"])
+    fleet.load(vehicles, bookings.values())
+    for step in range(200):
+        choice = rng.random()
+        if choice < 0.4:
+            booking = random_booking(1000 + step, rng.choice(vehicles)[0])
+        elif choice < 0.7:
+            booking_id = rng.choice(list(bookings))
+            booking = random_booking(booking_id, bookings[booking_id][1])
+        elif choice < 0.95:
+            fleet.remove_booking(bookings.pop(rng.choice(list(bookings)))[0])
+            continue
+        else:
+            reg = vehicles.pop(rng.randrange(len(vehicles)))[0]
+            bookings = {i: b for i, b in bookings.items() if b[1] != reg}
+            fleet.remove_vehicle(reg)
+            continue
+        bookings[booking[0]] = booking
+        fleet.put_booking(*booking)
+
+        first = start + timedelta(days=rng.randint(-10, 160))
+        last = first + timedelta(days=rng.randint(0, 40))
+        result = fleet.utilization(first, last, limit=100)
+        figures, peak = brute_force(vehicles, bookings.values(), first, last)
+        assert by_reg(result) == figures
+        assert result["fleet"]["peak_concurrent"] == peak
+
+def test_load_arrays():
+    """Test loading from the vehicle and booking tables."""
+    cursor = MagicMock()
+    cursor.fetchall.return_value = VEHICLES
+    cursor.fetchmany.side_effect = [BOOKINGS, []]
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    fleet = FleetArrays(inactive_statuses=["CANCELLED"])
+    load_arrays(fleet, conn)
+    assert not fleet.is_stale()
+    assert fleet.utilization("2030-01-01", "2030-01-10")["fleet"]["booked_days"] == 9
+
+if __name__ == "__main__":
+    pytest.main()
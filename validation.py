@@ -0,0 +1,29 @@
+from datetime import datetime
+from conflicts import booking_period_error
+
+# Validation rules shared by the single-row handlers in api.py and the bulk
+# and import paths. The *_error functions return a message, or None when
+# the record is valid.
+
+# Validate date format
+def is_valid_date(date_str):
+    try:
+        datetime.strptime(date_str, '%Y-%m-%d')
+        return True
+    except (TypeError, ValueError):
+        return False
+
+def customer_error(data):
+    if not data or not data.get("customer_name") or not data.get("email_address"):
+        return "customer_name and email_address are required"
+    return None
+
+def vehicle_error(data):
+    if not data or not data.get("reg_number") or not data.get("model_code") or not data.get("vehicle_category_description"):
+        return "reg_number, model_code, and vehicle_category_description are required"
+    return None
+
+def booking_error(data):
+    if not data or not data.get("Customer_customer_id") or not data.get("Vehicle_reg_number") or not is_valid_date(data.get("date_from")) or not is_valid_date(data.get("date_to")):
+        return "Invalid booking data"
+    return booking_period_error(data["date_from"], data["date_to"])
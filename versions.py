@@ -0,0 +1,37 @@
+import hashlib
+from datetime import datetime
+
+# Per-table version counters backing list ETags. Every write handler bumps
+# its table's row after committing, so a client's ETag can be validated
+# with one primary-key lookup instead of re-reading the table. The
+# table_version table is created by the migrations (see schema.py).
+
+# Returns (version, updated_at); (0, None) for a table never written to
+def get_table_version(cursor, table):
+    cursor.execute("SELECT version, updated_at FROM table_version WHERE table_name = %s", (table,))
+    row = cursor.fetchone()
+    if not row:
+        return 0, None
+    if isinstance(row, dict):
+        row = (row["version"], row["updated_at"])
+    return int(row[0]), row[1] if isinstance(row[1], datetime) else None
+
+# Runs in its own short transaction after the data change has been
+# committed, so the hot counter row is only locked briefly.
+def bump_table_version(conn, table):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT INTO table_version (table_name, version, updated_at) VALUES (%s, 1, CURRENT_TIMESTAMP)"
+            " ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP",
+            (table,)
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+
+# Strong ETag for a list response: the table version plus the query string,
+# since every page, sort and filter combination is a different body.
+def list_etag(table, version, query_string):
+    digest = hashlib.sha1(query_string).hexdigest()[:16] if query_string else "all"
+    return f"{table}-{version}-{digest}"
@@ -0,0 +1,37 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+from versions import get_table_version, bump_table_version, list_etag
+
+def test_get_table_version_unwritten_table():
+    """Test that a table with no version row reports version 0."""
+    cursor = MagicMock()
+    cursor.fetchone.return_value = None
+    assert get_table_version(cursor, "vehicle") == (0, None)
+
+def test_get_table_version_row():
+    """Test reading the version and last write time."""
+    cursor = MagicMock()
+    cursor.fetchone.return_value = (7, datetime(2023, 1, 1, 12, 0))
+    assert get_table_version(cursor, "vehicle") == (7, datetime(2023, 1, 1, 12, 0))
+    cursor.execute.assert_called_with("SELECT version, updated_at FROM table_version WHERE table_name = %s", ("vehicle",))
+
+def test_bump_table_version_commits():
+    """Test that a bump upserts the counter row and commits it."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    bump_table_version(conn, "booking")
+    query, params = cursor.execute.call_args.args
+    assert "ON DUPLICATE KEY UPDATE version = version + 1" in query
+    assert params == ("booking",)
+    conn.commit.assert_called_once()
+    cursor.close.assert_called_once()
+
+def test_list_etag_depends_on_version_and_query():
+    """Test that the ETag changes with the table version and the query string."""
+    assert list_etag("vehicle", 3, b"") == "vehicle-3-all"
+    assert list_etag("vehicle", 3, b"limit=10") != list_etag("vehicle", 4, b"limit=10")
+    assert list_etag("vehicle", 3, b"limit=10") != list_etag("vehicle", 3, b"limit=20")
+
+if __name__ == "__main__":
+    pytest.main()